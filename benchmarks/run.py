@@ -0,0 +1,402 @@
+"""Benchmark suite for the LegalEase AI hot paths
+
+Runs offline against synthetic documents, embeddings and feature tables,
+writes machine-readable JSON results and compares them with a stored
+baseline. Usage, from the repository root:
+
+    python -m benchmarks.run --quick
+    python -m benchmarks.run --output bench.json --baseline benchmarks/baseline.json
+    python -m benchmarks.run --update-baseline
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Tuple
+import argparse
+import datetime
+import fnmatch
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+
+from benchmarks import synthetic
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+# Registered benchmarks: name -> function(quick) yielding (case, callable, ops per call)
+BENCHMARKS = {}
+
+Case = Tuple[str, Callable[[], object], int]
+
+
+def benchmark(name: str):
+    """Register a benchmark generator under a name"""
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def measure(fn: Callable[[], object], ops: int, repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """
+    Time a callable
+
+    Args:
+        fn: Callable performing ops operations per call
+        ops: Operations per call, used for throughput
+        repeat: Number of timed calls
+        warmup: Number of untimed calls first
+
+    Returns:
+        Timing statistics in milliseconds per call and operations per second
+    """
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000.0)
+    times = np.array(times)
+    median = float(np.median(times))
+    return {
+        "median_ms": median,
+        "p95_ms": float(np.percentile(times, 95)),
+        "min_ms": float(times.min()),
+        "repeat": repeat,
+        "ops_per_call": ops,
+        "ops_per_sec": ops / (median / 1000.0) if median > 0 else float("inf"),
+    }
+
+
+@benchmark("clause_splitter")
+def bench_clause_splitter(quick: bool) -> Iterator[Case]:
+    from src.utils.clause_splitter import ClauseSplitter
+
+    splitter = ClauseSplitter()
+    for n_clauses in ([200, 2000] if quick else [200, 2000, 20000]):
+        text = synthetic.legal_document(n_clauses)
+        yield f"split/{n_clauses}", lambda text=text: splitter.split(text), 1
+        yield f"iter_split/{n_clauses}", lambda text=text: sum(1 for _ in splitter.iter_split(io.StringIO(text))), 1
+
+
+@benchmark("document_parser")
+def bench_document_parser(quick: bool) -> Iterator[Case]:
+    from src.utils.document_parser import DocumentParser
+
+    parser = DocumentParser()
+    with tempfile.TemporaryDirectory(prefix="legalease-bench-") as tmp:
+        yield from _document_parser_cases(parser, Path(tmp), quick)
+
+
+def _document_parser_cases(parser, tmp: Path, quick: bool) -> Iterator[Case]:
+    pages = 20 if quick else 200
+    text_file = tmp / "contract.txt"
+    text_file.write_text("\f".join(synthetic.legal_document(40, seed=i) for i in range(pages)), encoding="utf-8")
+    yield f"text_pages/{pages}", lambda: sum(1 for _ in parser.iter_pages(str(text_file))), pages
+
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return
+    pdf_file = tmp / "contract.pdf"
+    synthetic.write_pdf(pdf_file, [f"Section {i} The Supplier shall indemnify the Customer" for i in range(pages)])
+    yield f"pdf_pages/{pages}", lambda: sum(1 for _ in parser.iter_pdf_pages(str(pdf_file))), pages
+    workers = min(os.cpu_count() or 1, 4)
+    if workers > 1:
+        yield (
+            f"pdf_pages_parallel/{pages}x{workers}",
+            lambda: sum(1 for _ in parser.iter_pdf_pages_parallel(str(pdf_file), workers=workers)),
+            pages,
+        )
+
+
+@benchmark("vector_search")
+def bench_vector_search(quick: bool) -> Iterator[Case]:
+    from src.rag.vector_store import VectorStore
+    from src.rag.ann_index import IVFIndex
+    from src.rag.quantization import ScalarQuantizer, ProductQuantizer
+
+    dim = 384
+    sizes = [1000, 10000] if quick else [1000, 10000, 100000, 500000]
+    queries = synthetic.embeddings(32, dim, seed=1)
+    for size in sizes:
+        store = VectorStore(embedding_dim=dim, initial_capacity=size)
+        store.add_documents([{"id": i} for i in range(size)], synthetic.embeddings(size, dim))
+        yield f"exact/{size}", lambda store=store: store.similarity_search(queries[0], k=10, exact=True), 1
+        yield f"exact_batch32/{size}", lambda store=store: store.similarity_search_batch(queries, k=10, exact=True), 32
+        if size >= 10000:
+            store.build_index(IVFIndex(n_lists=int(np.sqrt(size)), nprobe=8))
+            yield f"ivf_nprobe8/{size}", lambda store=store: store.similarity_search(queries[0], k=10), 1
+        if size == 100000:
+            for quantizer in (ScalarQuantizer(), ProductQuantizer(n_subvectors=48)):
+                quantized = VectorStore(embedding_dim=dim, initial_capacity=size)
+                quantized.add_documents([{"id": i} for i in range(size)], store.embeddings)
+                quantized.quantize(quantizer)
+                yield (f"{quantizer.kind}_rerank{quantizer.rerank_factor}/{size}",
+                       lambda quantized=quantized: quantized.similarity_search(queries[0], k=10), 1)
+        if size >= 100000:
+            # Amend 1% of the documents in batches of 100, then reclaim the replaced rows
+            amended = synthetic.embeddings(size // 100, dim, seed=2)
+            ids = np.arange(0, size, 100)
+
+            def upsert_and_compact(store=store, amended=amended, ids=ids):
+                for lo in range(0, len(ids), 100):
+                    store.upsert([{"id": int(i)} for i in ids[lo:lo + 100]], amended[lo:lo + 100])
+                store.compact()
+
+            yield f"upsert1pct_compact/{size}", upsert_and_compact, len(ids)
+
+
+@benchmark("sharded_search")
+def bench_sharded_search(quick: bool) -> Iterator[Case]:
+    from src.rag.sharded_store import ShardedVectorStore
+
+    dim = 384
+    size = 20000 if quick else 200000
+    documents = [{"id": i} for i in range(size)]
+    embeddings = synthetic.embeddings(size, dim)
+    queries = synthetic.embeddings(32, dim, seed=1)
+    for n_shards in sorted({1, os.cpu_count() or 1}):
+        with tempfile.TemporaryDirectory() as tmp, \
+                ShardedVectorStore.create(tmp, documents, embeddings, n_shards) as store:
+            yield f"shards{n_shards}/{size}", lambda store=store: store.similarity_search(queries[0], k=10), 1
+
+            def concurrent(store=store):
+                with ThreadPoolExecutor(max_workers=8) as pool:
+                    list(pool.map(lambda q: store.similarity_search(q, k=10), queries))
+
+            yield f"shards{n_shards}_concurrent32/{size}", concurrent, 32
+
+
+@benchmark("retriever")
+def bench_retriever(quick: bool) -> Iterator[Case]:
+    from src.rag.vector_store import VectorStore
+    from src.rag.retriever import Retriever
+    from src.rag.bm25_index import BM25Index
+
+    encoder = synthetic.HashingEncoder(dim=384)
+    size = 10000 if quick else 100000
+    store = VectorStore(embedding_dim=encoder.dim, initial_capacity=size)
+    store.add_documents([{"id": i} for i in range(size)], synthetic.embeddings(size, encoder.dim))
+    retriever = Retriever(store, encoder=encoder)
+    questions = synthetic.queries(32)
+    yield f"retrieve/{size}", lambda: retriever.retrieve(questions[0], k=5), 1
+    yield f"retrieve_many32/{size}", lambda: retriever.retrieve_many(questions, k=5), 32
+
+    cached = Retriever(store, encoder=encoder)
+    cached.enable_cache()
+    yield f"retrieve_cached/{size}", lambda: cached.retrieve(questions[0], k=5), 1
+
+    bodies = synthetic.CLAUSE_BODIES
+    texts = [f"{bodies[i % len(bodies)]} Schedule {i}." for i in range(size)]
+    hybrid_store = VectorStore(embedding_dim=encoder.dim, initial_capacity=size, lexical_index=BM25Index())
+    hybrid_store.add_documents([{"id": i, "text": t} for i, t in enumerate(texts)], store.embeddings[:size])
+    hybrid = Retriever(hybrid_store, encoder=encoder)
+    hybrid.enable_hybrid()
+    yield f"retrieve_hybrid/{size}", lambda: hybrid.retrieve(f"{questions[0]} Schedule 42", k=5), 1
+
+
+def _inference_fixture(root: Path, n_rows: int):
+    """Feature table, trained model and config for the inference pipeline under root"""
+    from sklearn.ensemble import RandomForestClassifier
+    from src.pipelines.model_registry import dump_model
+
+    df = synthetic.feature_table(n_rows)
+    (root / "features").mkdir()
+    df.iloc[:, :-1].to_csv(root / "features" / "features.csv", index=False)
+    model = RandomForestClassifier(n_estimators=50, max_depth=8, n_jobs=-1, random_state=0)
+    model.fit(df.iloc[:5000, :-1], df.iloc[:5000, -1])
+    (root / "models").mkdir()
+    dump_model(model, root / "models" / "model-v1.pkl")
+    config = {
+        "data": {
+            "features_path": str(root / "features"),
+            "predictions_path": str(root / "predictions"),
+            "chunk_size": 20000,
+        },
+        "model": {"name": "model-v1", "save_path": str(root / "models")},
+    }
+    return config, df
+
+
+@benchmark("inference_pipeline")
+def bench_inference_pipeline(quick: bool) -> Iterator[Case]:
+    from src.pipelines.inference_pipeline import InferencePipeline
+
+    n_rows = 20000 if quick else 200000
+    with tempfile.TemporaryDirectory(prefix="legalease-bench-") as tmp:
+        config, _ = _inference_fixture(Path(tmp), n_rows)
+        pipeline = InferencePipeline(config)
+        yield f"run/{n_rows}", pipeline.run, n_rows
+        yield f"run_streaming/{n_rows}", pipeline.run_streaming, n_rows
+
+
+def _concurrent_posts(client, path: str, payloads, concurrency: int):
+    """Post payloads with concurrency threads, raising on any non-200 response"""
+    def post(payload):
+        response = client.post(path, **payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.text}")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(post, payloads))
+
+
+@benchmark("api_predict")
+def bench_api_predict(quick: bool) -> Iterator[Case]:
+    concurrency = 16
+    requests = 64 if quick else 512
+    with tempfile.TemporaryDirectory(prefix="legalease-bench-") as tmp:
+        yield from _api_predict_cases(Path(tmp), concurrency, requests)
+
+
+def _api_predict_cases(tmp: Path, concurrency: int, requests: int) -> Iterator[Case]:
+    from fastapi.testclient import TestClient
+    from src.api import app as tabular_app
+    from src.pipelines.inference_pipeline import InferencePipeline
+    from src.pipelines.model_registry import ModelRegistry
+    from src.utils.batching import MicroBatcher
+
+    # Tabular /predict from src/api/app.py, wired up without reading config from disk
+    config, df = _inference_fixture(tmp, 5000)
+    tabular_app.pipeline = InferencePipeline(config)
+    tabular_app.model_registry = ModelRegistry(tabular_app.pipeline.model_file)
+    tabular_app.model_registry.load()
+    tabular_app.batcher = MicroBatcher(tabular_app.predict_batch, max_batch_size=256, max_wait_ms=2, item_size=len)
+    rows = df.iloc[:4, :-1].to_dict(orient="records")
+    client = TestClient(tabular_app.app)
+    payloads = [{"json": {"data": rows}}] * requests
+    try:
+        yield f"tabular_predict/c{concurrency}", lambda: _concurrent_posts(client, "/predict", payloads, concurrency), requests
+    finally:
+        tabular_app.batcher.close()
+
+    # Document /api/predict from src/api/routes.py, when its model modules are available
+    from src.api import routes
+    from src.api.main import app as document_app
+    from src.api.worker_pool import WorkerPool
+
+    try:
+        routes.clause_classifier = routes.load_model("clause_classifier")
+        routes.risk_scorer = routes.load_model("risk_scorer")
+        routes.ner_extractor = routes.load_model("ner_extractor")
+    except ImportError as e:
+        print(f"  skipping document_predict: {e}", file=sys.stderr)
+        return
+    routes.worker_pool = WorkerPool(max_workers=4, max_pending=requests)
+    document = synthetic.legal_document(50).encode("utf-8")
+    client = TestClient(document_app)
+    payloads = [{"files": {"document": ("contract.txt", document, "text/plain")}}] * requests
+    yield f"document_predict/c{concurrency}", lambda: _concurrent_posts(client, "/api/predict", payloads, concurrency), requests
+
+
+def run(quick: bool, pattern: str, repeat: int) -> Dict[str, Dict[str, float]]:
+    """
+    Run the registered benchmarks
+
+    Args:
+        quick: Use smaller corpora and documents
+        pattern: Glob over "benchmark/case" names
+        repeat: Timed calls per case
+
+    Returns:
+        Timing statistics by "benchmark/case" name
+    """
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        # The part of the pattern before the first slash selects benchmarks, the rest their cases
+        if not fnmatch.fnmatch(name, pattern.split("/")[0]):
+            continue
+        print(f"{name}", file=sys.stderr)
+        try:
+            for case, fn, ops in bench(quick):
+                key = f"{name}/{case}"
+                if not fnmatch.fnmatch(key, pattern) and not fnmatch.fnmatch(name, pattern):
+                    continue
+                results[key] = measure(fn, ops, repeat)
+                print(f"  {case:<40} {results[key]['median_ms']:>10.3f} ms  {results[key]['ops_per_sec']:>12.1f} ops/s", file=sys.stderr)
+        except ImportError as e:
+            print(f"  skipped: {e}", file=sys.stderr)
+    return results
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> Dict[str, float]:
+    """
+    Find benchmarks slower than the baseline
+
+    Args:
+        results: Current results by benchmark name
+        baseline: Baseline results by benchmark name
+        tolerance: Allowed relative slowdown of the median, e.g. 0.25 for 25%
+
+    Returns:
+        Median slowdown ratio by name for every regressed benchmark
+    """
+    regressions = {}
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None or previous["median_ms"] <= 0:
+            continue
+        ratio = current["median_ms"] / previous["median_ms"]
+        if ratio > 1.0 + tolerance:
+            regressions[key] = ratio
+    return regressions
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the LegalEase AI benchmark suite")
+    parser.add_argument("--quick", action="store_true", help="Smaller corpora and documents")
+    parser.add_argument("--only", default="*", help="Glob over benchmark/case names, e.g. 'vector_search/ivf*'")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per case")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before flagging")
+    parser.add_argument("--update-baseline", action="store_true", help="Overwrite the baseline with these results")
+    args = parser.parse_args(argv)
+
+    report = {
+        "environment": environment(),
+        "quick": args.quick,
+        "results": run(args.quick, args.only, args.repeat),
+    }
+
+    baseline_file = Path(args.baseline)
+    regressions = {}
+    if baseline_file.exists() and not args.update_baseline:
+        with open(baseline_file, "r") as f:
+            baseline = json.load(f)
+        if baseline.get("quick") != args.quick:
+            print("Baseline was recorded with a different --quick setting, not comparing", file=sys.stderr)
+        else:
+            regressions = compare(report["results"], baseline["results"], args.tolerance)
+        report["regressions"] = regressions
+        for key, ratio in sorted(regressions.items()):
+            print(f"REGRESSION {key}: {ratio:.2f}x slower than baseline", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        with open(baseline_file, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {baseline_file}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
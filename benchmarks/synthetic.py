@@ -0,0 +1,114 @@
+"""Synthetic legal documents, PDFs, embeddings and feature tables for benchmarks and tests"""
+from typing import List
+import zlib
+import numpy as np
+
+CLAUSE_BODIES = [
+    "The Supplier shall indemnify and hold harmless the Customer against all losses arising from any breach of this Agreement.",
+    "Either party may terminate this Agreement for convenience on thirty (30) days written notice to the other party.",
+    "The Customer shall pay all invoices within forty-five (45) days of receipt, failing which interest shall accrue at 2% per month.",
+    "Neither party shall disclose any Confidential Information of the other party without its prior written consent.",
+    "This Agreement shall be governed by and construed in accordance with the laws of England and Wales.",
+    "The total liability of the Supplier under this Agreement shall not exceed the fees paid in the preceding twelve months.",
+    "The Supplier must maintain professional indemnity insurance of not less than $5,000,000 for the term of this Agreement.",
+]
+
+HEADER_STYLES = ["{n}. ", "Section {n} ", "Article {n} ", "{letter}. "]
+
+
+def legal_document(n_clauses: int, seed: int = 0) -> str:
+    """
+    Generate a contract-like document with numbered, lettered, article and section headers
+
+    Args:
+        n_clauses: Number of clauses
+        seed: Random seed
+
+    Returns:
+        Document text
+    """
+    rng = np.random.default_rng(seed)
+    lines = ["MASTER SERVICES AGREEMENT", "between Acme Corp and Globex Ltd.", ""]
+    for n in range(1, n_clauses + 1):
+        header = HEADER_STYLES[n % len(HEADER_STYLES)].format(n=n, letter=chr(ord("A") + n % 26))
+        sentences = rng.choice(CLAUSE_BODIES, size=int(rng.integers(1, 4)))
+        lines.append(header + " ".join(sentences))
+        if rng.random() < 0.3:
+            lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def write_pdf(path, pages: List[str]):
+    """
+    Write a minimal PDF with one line of Helvetica text per page
+
+    Args:
+        path: Target file
+        pages: Text of each page, free of unbalanced parentheses and backslashes
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects)))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(pages))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def queries(n: int, seed: int = 0) -> List[str]:
+    """Short clause questions drawn from the clause bodies"""
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(n):
+        words = rng.choice(CLAUSE_BODIES).split()
+        start = int(rng.integers(0, max(len(words) - 4, 1)))
+        out.append(" ".join(words[start:start + 4]))
+    return out
+
+
+def embeddings(n: int, dim: int, seed: int = 0, n_topics: int = 256) -> np.ndarray:
+    """Clustered random float32 embeddings, closer to real text embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    out = centers[rng.integers(0, n_topics, n)]
+    out += 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    return out
+
+
+class HashingEncoder:
+    """Offline stand-in for a sentence embedding model"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                out[row, zlib.crc32(word.encode()) % self.dim] += 1.0
+        return out
+
+
+def feature_table(n_rows: int, n_features: int = 16, seed: int = 0):
+    """Numeric feature table with a binary target in the last column"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    X = rng.random((n_rows, n_features)).astype(np.float32)
+    df = pd.DataFrame(X, columns=[f"f{i}" for i in range(n_features)])
+    df["target"] = (X[:, 0] + X[:, 1] > 1.0).astype(np.int8)
+    return df
@@ -1,7 +1,6 @@
 import os
 import yaml
 import logging
-from pathlib import Path
 from src.pipelines.inference_pipeline import InferencePipeline
 
 def load_config(config_path: str):
@@ -21,13 +20,12 @@ def main():
     # Initialize inference pipeline
     pipeline = InferencePipeline(config)
     
-    # Run inference
-    predictions = pipeline.run()
-    
-    # Save predictions
-    output_path = Path(config['data']['predictions_path'])
-    output_path.mkdir(parents=True, exist_ok=True)
-    predictions.to_csv(output_path / 'predictions.csv', index=False)
+    # Run inference; the pipeline saves the predictions itself
+    inference_config = config.get('inference', {})
+    if inference_config.get('streaming', False):
+        pipeline.run_streaming(workers=inference_config.get('workers'))
+    else:
+        pipeline.run()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
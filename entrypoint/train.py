@@ -1,7 +1,6 @@
 import os
 import yaml
 import logging
-from pathlib import Path
 from src.pipelines.training_pipeline import TrainingPipeline
 
 def load_config(config_path: str):
@@ -25,9 +24,7 @@ def main():
     model = pipeline.run()
     
     # Save model
-    model_path = Path(config['model']['save_path'])
-    model_path.mkdir(parents=True, exist_ok=True)
-    model.save(model_path / f"{config['model']['name']}.pkl")
+    pipeline.save_model(model)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
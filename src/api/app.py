@@ -1,11 +1,13 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse
 from pydantic import BaseModel
 from pathlib import Path
+import asyncio
 import logging
 
-from src.pipelines.inference_pipeline import InferencePipeline
+from src.utils.batching import MicroBatcher
+from src.utils.metrics import metrics, CONTENT_TYPE
 
 
 class PredictRequest(BaseModel):
@@ -23,6 +25,15 @@ app = FastAPI(title="legalease-ai Inference API", version="0.1")
 # initialize global pipeline placeholder
 pipeline = None
 
+# process-wide model cache, loaded once at startup and hot-swapped on file change
+model_registry = None
+
+# server-side batcher merging concurrent /predict requests into one model call
+batcher = None
+
+# background task importing the pipeline and loading the model after startup
+loading_task = None
+
 # mount static UI
 BASE_DIR = Path(__file__).resolve().parent.parent.parent  # go up to project root
 static_dir = BASE_DIR / "frontend"
@@ -31,9 +42,9 @@ if static_dir.exists():
 
 
 @app.on_event("startup")
-def startup_event():
-    global pipeline
-    logging.info("Starting API and loading model...")
+async def startup_event():
+    global batcher, loading_task
+    logging.info("Starting API, loading model in the background...")
     # Load production config by default
     import yaml
 
@@ -44,12 +55,123 @@ def startup_event():
     with open(cfg_path, "r") as f:
         config = yaml.safe_load(f)
 
-    pipeline = InferencePipeline(config)
+    # pandas, sklearn and the model load off the event loop, so the server starts listening at once
+    loading_task = asyncio.create_task(asyncio.to_thread(load_model, config))
+
+    serving = config.get('serving', {})
+    batcher = MicroBatcher(
+        predict_batch,
+        max_batch_size=serving.get('max_batch_rows', 256),
+        max_wait_ms=serving.get('max_wait_ms', 5),
+        name="predict-batcher",
+        item_size=len,
+    )
+
+
+def load_model(config):
+    """Import the inference pipeline, load the model and warm it up with one prediction"""
+    global pipeline, model_registry
+    from src.pipelines.inference_pipeline import InferencePipeline
+    from src.pipelines.model_registry import ModelRegistry
+
+    inference = InferencePipeline(config)
+    model_registry = ModelRegistry(
+        inference.model_file,
+        mmap_mode=config['model'].get('mmap_mode', 'r'),
+        check_interval=config['model'].get('reload_check_seconds', 5.0),
+    )
+    # /predict serves requests once the pipeline is set; the registry loads on demand until then
+    pipeline = inference
+    try:
+        warm_up(model_registry.load())
+    except Exception:
+        logging.exception("Could not load model at startup, will retry on first request")
+
+
+def warm_up(model):
+    """Predict one all-zero row so lazily built model and pandas state exists before traffic"""
+    import pandas as pd
+
+    columns = getattr(model, 'feature_names_in_', None)
+    if columns is None:
+        columns = range(getattr(model, 'n_features_in_', 0))
+    if len(columns):
+        pipeline.make_predictions(model, pd.DataFrame([[0.0] * len(columns)], columns=columns))
+
+
+def model_ready() -> bool:
+    return model_registry is not None and model_registry.model is not None
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    if batcher is not None:
+        batcher.close()
+
+
+def predict_batch(requests):
+    """
+    Predict the rows of several requests with a single model call
+
+    Args:
+        requests: One list of rows per request
+
+    Returns:
+        One list of predictions per request, or the exception raised for it
+    """
+    import pandas as pd
+
+    model = model_registry.get()
+    try:
+        features = pd.DataFrame([row for rows in requests for row in rows])
+        metrics.histogram(
+            "batch_rows", "Rows per model call", buckets=(1, 4, 16, 64, 256, 1024, 4096)
+        ).observe(len(features))
+        with metrics.span("predict.model"):
+            preds = list(pipeline.make_predictions(model, features))
+    except Exception:
+        if len(requests) == 1:
+            raise
+        # Isolate the failing request instead of failing the whole batch
+        return [_predict_single(model, rows) for rows in requests]
+
+    results, start = [], 0
+    for rows in requests:
+        results.append(preds[start:start + len(rows)])
+        start += len(rows)
+    return results
+
+
+def _predict_single(model, rows):
+    import pandas as pd
+
+    try:
+        return list(pipeline.make_predictions(model, pd.DataFrame(rows)))
+    except Exception as e:
+        return e
 
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    loading = loading_task is not None and not loading_task.done()
+    return {
+        "status": "ok",
+        "ready": model_ready(),
+        "model": "ready" if model_ready() else "loading" if loading else "unavailable",
+        "version": model_registry.version if model_ready() else None,
+    }
+
+
+@app.get("/health/ready")
+def readiness():
+    if not model_ready():
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    return {"ready": True, "version": model_registry.version}
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -62,26 +184,21 @@ def ui_index():
 
 
 @app.post("/predict", response_model=PredictResponse)
-def predict(req: PredictRequest):
+async def predict(req: PredictRequest):
     global pipeline
-    if pipeline is None:
+    if pipeline is None or batcher is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
 
-    # Expecting JSON list of rows; convert to a DataFrame inside the pipeline
+    # Expecting JSON list of rows; concurrent requests are batched into one DataFrame
     try:
-        import pandas as pd
-
-        features = pd.DataFrame(req.data)
-        # Save a temp features file in the features path so pipeline.load_features can be reused if needed
-        # But we'll call pipeline.make_predictions directly if pipeline supports it
-        if hasattr(pipeline, "make_predictions"):
-            model = pipeline.load_model()
-            preds = pipeline.make_predictions(model, features)
-        else:
-            # Fallback: pipeline.run() if it expects to read CSVs
-            preds = pipeline.run()
-
-        return PredictResponse(predictions=preds.tolist() if hasattr(preds, 'tolist') else list(preds))
+        if not req.data:
+            return PredictResponse(predictions=[])
+        with metrics.in_flight("/predict"):
+            preds = await asyncio.wrap_future(batcher.submit(req.data))
+        if isinstance(preds, Exception):
+            raise preds
+
+        return PredictResponse(predictions=[p.item() if hasattr(p, 'item') else p for p in preds])
     except Exception as e:
         logging.exception("Error during prediction")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,53 +1,431 @@
-from fastapi import APIRouter, HTTPException, File, UploadFile
+from fastapi import APIRouter, HTTPException, File, UploadFile, Header, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
+from pathlib import Path
+from typing import Optional
 from src.api.schemas import PredictResponse
-from src.models.clause_classifier import ClauseClassifier
-from src.models.risk_scorer import RiskScorer
-from src.models.ner_extractor import NERExtractor
+from src.api.worker_pool import WorkerPool, PoolSaturated
+from src.pipelines.model_registry import file_digest
+from src.utils.cache import LRUCache, DiskCache, TieredCache
+from src.utils.clause_splitter import ClauseSplitter
+from src.utils.config import load_config
+from src.utils.metrics import metrics, CONTENT_TYPE
+from src.utils.profiling import RequestProfiler, NULL_SESSION
+import asyncio
+import hashlib
+import importlib
+import json
 import logging
+import time
+import uuid
 
 router = APIRouter()
 
+# Model classes, imported on first load so importing the API stays fast
+MODEL_CLASSES = {
+    "clause_classifier": ("src.models.clause_classifier", "ClauseClassifier"),
+    "risk_scorer": ("src.models.risk_scorer", "RiskScorer"),
+    "ner_extractor": ("src.models.ner_extractor", "NERExtractor"),
+}
+
+# Attributes of a loaded model naming the file its weights were read from
+MODEL_FILE_ATTRIBUTES = ("model_file", "model_path")
+
+# Short contract excerpt run through every model once loaded, to prime lazy initialisation and caches
+WARMUP_TEXT = (
+    "1. The Supplier shall indemnify the Customer against all losses arising from any breach.\n"
+    "2. Either party may terminate this Agreement on thirty (30) days written notice."
+)
+
 # Initialize models
 clause_classifier = None
 risk_scorer = None
 ner_extractor = None
 
+# Load state of each model: "loading", "warming", "ready" or "failed"
+model_state = {name: "loading" for name in MODEL_CLASSES}
+
+# Background task loading the models, so startup does not wait for them
+loading_task = None
+
+# RAG chain used by /rag/stream, built on startup from the rag config section, None until loaded
+rag_chain = None
+
+# Background task loading the RAG chain
+rag_loading_task = None
+
+# Bounded pool running the blocking model stages off the event loop
+worker_pool = None
+
+# Opt-in per-request stack sampler, None when profiling is not configured
+profiler = None
+
+# Analysis results keyed by content hash and model version, None when caching is disabled
+result_cache = None
+
+# Whether clauses are classified and scored one by one so unchanged clauses hit the cache
+per_clause_cache = False
+clause_splitter = ClauseSplitter()
+
+# Identifies the loaded models in cache keys, so results of older models are never served
+models_version = None
+
 @router.on_event("startup")
 async def startup_event():
-    global clause_classifier, risk_scorer, ner_extractor
+    global worker_pool, profiler, loading_task, rag_loading_task
+    if loading_task is not None:
+        # Handlers registered on an included router can fire more than once
+        return
+    try:
+        config = load_config()
+    except FileNotFoundError:
+        config = {}
+    api_config = config.get("api", {})
+    if config.get("profiling"):
+        try:
+            profiler = RequestProfiler.from_config(config["profiling"])
+        except OSError as e:
+            logging.error(f"Profiling disabled, cannot use profile directory: {str(e)}")
+    worker_pool = WorkerPool(
+        max_workers=api_config.get("workers", 4),
+        max_pending=api_config.get("max_pending", 32),
+    )
+    configure_result_cache(config.get("result_cache", {}))
+    loading_task = asyncio.create_task(load_models())
+    if config.get("rag", {}).get("store_path"):
+        rag_loading_task = asyncio.create_task(load_rag_chain(config["rag"]))
+
+def configure_result_cache(cache_config):
+    """
+    Set up the analysis result cache from the result_cache config section
+
+    Results are kept in an in-memory LRU tier and, when disk_path is set,
+    in a size-bounded SQLite tier shared across restarts.
+    """
+    global result_cache, per_clause_cache
+    if not cache_config.get("enabled", False):
+        result_cache = None
+        return
+    memory = LRUCache(
+        max_entries=cache_config.get("max_entries", 1024),
+        max_bytes=cache_config.get("max_bytes", 256 * 1024 * 1024),
+        ttl_seconds=cache_config.get("ttl_seconds"),
+    )
+    disk = None
+    if cache_config.get("disk_path"):
+        try:
+            disk = DiskCache(cache_config["disk_path"], max_bytes=cache_config.get("disk_max_bytes", 1 << 30))
+        except Exception as e:
+            logging.error(f"Result cache disk tier disabled: {str(e)}")
+    result_cache = TieredCache(memory, disk)
+    per_clause_cache = cache_config.get("per_clause", False)
+    metrics.register_cache("predict_results", memory)
+    if disk is not None:
+        metrics.register_cache("predict_results_disk", disk)
+
+def model_version(model) -> str:
+    """
+    Version of a loaded model, changing whenever its weights do
+
+    This is the SHA-256 of the model's weights file when it names one, else
+    its version attribute. A model exposing neither gets an id unique to
+    this load, so results cached under it are never served by another load.
+    """
+    for attribute in MODEL_FILE_ATTRIBUTES:
+        path = getattr(model, attribute, None)
+        if path is not None and Path(path).is_file():
+            return file_digest(Path(path))
+    version = getattr(model, "version", None)
+    if version is not None:
+        return str(version)
+    logging.warning(f"{type(model).__qualname__} has no weights file or version, its results are cached per load")
+    return f"{type(model).__qualname__}-{uuid.uuid4().hex}"
+
+def result_key(kind: str, content: bytes) -> str:
+    """Cache key of a document or clause under the loaded models"""
+    return f"{models_version}:{kind}:{hashlib.sha256(content).hexdigest()}"
+
+def load_model(name: str):
+    """Import and construct a model, recording its load time"""
+    start = time.perf_counter()
+    module, cls = MODEL_CLASSES[name]
+    model = getattr(importlib.import_module(module), cls)()
+    metrics.record_model_load(name, time.perf_counter() - start)
+    return model
+
+async def load_models():
+    """
+    Load the models concurrently on worker threads, then warm them up
+
+    Each model's progress is tracked in model_state. The API is ready once
+    all of them have loaded and the warm-up request has run.
+    """
+    global clause_classifier, risk_scorer, ner_extractor, models_version
+    for name in MODEL_CLASSES:
+        model_state[name] = "loading"
+    names = list(MODEL_CLASSES)
+    models = await asyncio.gather(
+        *(asyncio.to_thread(load_model, name) for name in names), return_exceptions=True
+    )
+    loaded = {}
+    for name, model in zip(names, models):
+        if isinstance(model, Exception):
+            logging.error(f"Error loading {name}: {str(model)}")
+            model_state[name] = "failed"
+        else:
+            loaded[name] = model
+            model_state[name] = "warming"
+    if len(loaded) < len(names):
+        return
+
+    # Hashing the weights files reads them, so it runs off the event loop
+    versions = await asyncio.to_thread(lambda: [model_version(loaded[name]) for name in names])
+    models_version = hashlib.sha256("|".join(versions).encode("utf-8")).hexdigest()[:16]
+    clause_classifier = loaded["clause_classifier"]
+    risk_scorer = loaded["risk_scorer"]
+    ner_extractor = loaded["ner_extractor"]
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(
+            worker_pool.run(classify_and_score, WARMUP_TEXT),
+            worker_pool.run(extract_entities, WARMUP_TEXT),
+        )
+        logging.info(f"Models warmed up in {time.perf_counter() - start:.3f}s")
+    except Exception:
+        # A failed warm-up only costs the first request its latency
+        logging.exception("Model warm-up failed")
+    for name in names:
+        model_state[name] = "ready"
+
+def build_rag_chain(rag_config):
+    """
+    Build the RAG chain from the rag config section
+
+    The vector store written by VectorStore.save is memory-mapped, queries
+    are encoded with a sentence-transformers model, and the LLM is
+    constructed without arguments from its "module:Class" path.
+    """
+    from src.rag.chains import RAGChain
+    from src.rag.retriever import Retriever
+    from src.rag.vector_store import VectorStore
+    from sentence_transformers import SentenceTransformer
+
+    if not rag_config.get("llm"):
+        raise ValueError("rag.llm is not set")
+    module, _, cls = rag_config["llm"].partition(":")
+    llm = getattr(importlib.import_module(module), cls)()
+    store = VectorStore.load(rag_config["store_path"])
+    retriever = Retriever(store, encoder=SentenceTransformer(rag_config["encoder"]))
+    if rag_config.get("cache", True):
+        retriever.enable_cache()
+    return RAGChain(retriever, llm=llm)
+
+async def load_rag_chain(rag_config):
+    """Build the RAG chain on a worker thread, leaving /rag/stream unavailable if it fails"""
+    global rag_chain
+    start = time.perf_counter()
     try:
-        clause_classifier = ClauseClassifier()
-        risk_scorer = RiskScorer()
-        ner_extractor = NERExtractor()
+        rag_chain = await asyncio.to_thread(build_rag_chain, rag_config)
+        logging.info(f"RAG chain loaded in {time.perf_counter() - start:.3f}s")
     except Exception as e:
-        logging.error(f"Error loading models: {str(e)}")
+        logging.error(f"Error loading RAG chain: {str(e)}")
+
+def models_ready() -> bool:
+    return all(state == "ready" for state in model_state.values())
+
+@router.on_event("shutdown")
+def shutdown_event():
+    global worker_pool, loading_task, rag_loading_task, result_cache
+    if loading_task is not None:
+        loading_task.cancel()
+        loading_task = None
+    if rag_loading_task is not None:
+        rag_loading_task.cancel()
+        rag_loading_task = None
+    if result_cache is not None:
+        result_cache.close()
+        result_cache = None
+    if worker_pool is not None:
+        worker_pool.shutdown(wait=False)
+        worker_pool = None
 
 @router.get("/health")
 def health():
-    """Health check endpoint"""
-    return {"status": "ok"}
+    """Health check endpoint, reporting whether the models are loaded"""
+    return {
+        "status": "ok",
+        "ready": models_ready(),
+        "models": dict(model_state),
+    }
+
+@router.get("/health/ready")
+def readiness():
+    """Readiness probe: 200 once every model is loaded and warmed up, 503 before"""
+    if not models_ready():
+        raise HTTPException(status_code=503, detail={"ready": False, "models": dict(model_state)})
+    return {"ready": True, "models": dict(model_state)}
+
+def classify_and_score(text: str):
+    """Clause classification followed by risk scoring, run on a worker thread"""
+    with metrics.span("predict.clause_classifier"):
+        clauses = clause_classifier.predict(text)
+    with metrics.span("predict.risk_scorer"):
+        risks = risk_scorer.predict(clauses)
+    return clauses, risks
+
+def indexes_clauses(risks, clauses) -> bool:
+    """Whether every risk's clause_id is a position in the given clause list"""
+    return all(
+        isinstance(risk.get("clause_id"), int) and 0 <= risk["clause_id"] < len(clauses)
+        for risk in risks
+    )
+
+def classify_and_score_clauses(text: str):
+    """
+    Clause classification and risk scoring clause by clause, reusing cached results
+
+    Only clauses not seen before under the loaded models are classified
+    and scored, so re-analysing an edited document costs as much as the
+    edited clauses. The classifier then sees one ClauseSplitter segment at
+    a time instead of the whole document, so its output can differ from
+    classify_and_score, which is why this mode is opt-in.
+
+    Risk clause ids are shifted to index the combined clause list. That
+    needs the risk scorer to report clause_id as a position in the clauses
+    it was given; when a segment's risks do not, the whole document is
+    classified and scored in one go instead, and that segment is not cached.
+    """
+    clauses, risks = [], []
+    for segment in clause_splitter.split(text):
+        key = result_key("clause", segment.encode("utf-8"))
+        cached = result_cache.get(key)
+        if cached is None:
+            segment_clauses, segment_risks = classify_and_score(segment)
+            cached = jsonable_encoder({"clauses": segment_clauses, "risks": segment_risks})
+            if not indexes_clauses(cached["risks"], cached["clauses"]):
+                logging.warning("Risk clause_id values are not clause positions, scoring the whole document")
+                return classify_and_score(text)
+            result_cache.put(key, cached)
+        offset = len(clauses)
+        clauses.extend(cached["clauses"])
+        risks.extend({**risk, "clause_id": risk["clause_id"] + offset} for risk in cached["risks"])
+    return clauses, risks
+
+def extract_entities(text: str):
+    """Named entity extraction, run on a worker thread"""
+    with metrics.span("predict.ner_extractor"):
+        return ner_extractor.predict(text)
+
+def profile_session(endpoint: str, header: Optional[str]):
+    """Profiling session for a request, NULL_SESSION unless it is traced"""
+    if profiler is None:
+        return NULL_SESSION
+    return profiler.session(endpoint, header)
+
+def require_admin(authorization: Optional[str]):
+    """Reject the request unless it carries the configured admin token"""
+    if profiler is None or profiler.admin_token is None:
+        # Without a token the admin endpoints are closed, not open
+        raise HTTPException(status_code=404, detail="Profiling admin endpoints not configured")
+    token = authorization[len("Bearer "):] if authorization and authorization.startswith("Bearer ") else None
+    if not profiler.authorized(token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
 
 @router.post("/predict", response_model=PredictResponse)
-async def predict(document: UploadFile = File(...)):
+async def predict(response: Response, document: UploadFile = File(...),
+                  x_profile: Optional[str] = Header(None)):
     """Process legal document and return predictions"""
-    if not all([clause_classifier, risk_scorer, ner_extractor]):
-        raise HTTPException(status_code=503, detail="Models not loaded")
+    if not all([clause_classifier, risk_scorer, ner_extractor, worker_pool]):
+        raise HTTPException(status_code=503, detail="Models not loaded", headers={"Retry-After": "5"})
     
+    session = profile_session("/api/predict", x_profile)
+    if session.id is not None:
+        response.headers["X-Profile-Id"] = session.id
     try:
-        # Read the file content
-        content = await document.read()
-        text = content.decode("utf-8")
+        # Admission comes first, so requests refused with 429 are not recorded as served
+        with worker_pool.reserve(), metrics.in_flight("/api/predict"):
+            # Closing the session joins its sampler and saves the profile on a worker thread
+            async with session:
+                # Read the file content
+                with metrics.span("predict.read_decode"):
+                    content = await document.read()
+                    text = content.decode("utf-8")
 
-        # Process the document through our pipeline
-        clauses = clause_classifier.predict(text)
-        risks = risk_scorer.predict(clauses)
-        entities = ner_extractor.predict(text)
-        
-        return PredictResponse(
+                key = result_key("document", content) if result_cache is not None else None
+                cached = result_cache.get(key) if key is not None else None
+                if cached is not None:
+                    return PredictResponse(**cached)
+
+                # Unchanged clauses of an edited document are served from the clause cache
+                classify = classify_and_score_clauses if key is not None and per_clause_cache else classify_and_score
+
+                # NER is independent of the clause -> risk chain, so both run concurrently
+                (clauses, risks), entities = await asyncio.gather(
+                    worker_pool.run(session.wrap(classify), text),
+                    worker_pool.run(session.wrap(extract_entities), text),
+                )
+
+        result = PredictResponse(
             clauses=clauses,
             risks=risks,
             entities=entities
         )
+        if key is not None:
+            result_cache.put(key, jsonable_encoder(result))
+        return result
+    except PoolSaturated:
+        metrics.counter("rejected_requests_total", "Requests refused with 429", endpoint="/api/predict").inc()
+        raise HTTPException(status_code=429, detail="Server busy, retry later", headers={"Retry-After": "1"})
     except Exception as e:
         logging.exception("Error during prediction")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/metrics")
+def metrics_endpoint():
+    """Stage latencies, requests in flight, cache and model-load metrics in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
+def format_sse(event: str, data) -> str:
+    """Encode one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/rag/stream")
+def rag_stream(query: str, x_profile: Optional[str] = Header(None)):
+    """Stream retrieved context, then generated tokens, as server-sent events"""
+    if rag_chain is None:
+        raise HTTPException(status_code=503, detail="RAG chain not configured")
+
+    session = profile_session("/api/rag/stream", x_profile)
+
+    def events():
+        with session:
+            try:
+                for event in session.iterate(rag_chain.stream(query)):
+                    yield format_sse(event["event"], event["data"])
+            except Exception as e:
+                logging.exception("Error during RAG streaming")
+                yield format_sse("error", {"detail": str(e)})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if session.id is not None:
+        headers["X-Profile-Id"] = session.id
+    # A sync generator is iterated in the threadpool, off the event loop
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+@router.get("/admin/profiles")
+def list_profiles(authorization: Optional[str] = Header(None)):
+    """Metadata of the stored request profiles, newest first"""
+    require_admin(authorization)
+    return {"profiles": profiler.store.list()}
+
+@router.get("/admin/profiles/{profile_id}")
+def get_profile(profile_id: str, format: str = "json", authorization: Optional[str] = Header(None)):
+    """A stored profile as JSON, or as folded stacks for flame graph tools with format=folded"""
+    require_admin(authorization)
+    profile = profiler.store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        folded = "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].items())
+        return PlainTextResponse(folded)
+    return profile
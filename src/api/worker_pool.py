@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Callable
+import asyncio
+
+
+class PoolSaturated(Exception):
+    """Raised when a WorkerPool already has max_pending requests admitted"""
+
+
+class WorkerPool:
+    """Bounded thread pool for running blocking model code off the event loop
+
+    Requests are admitted with reserve(); once max_pending requests are in
+    flight further ones are rejected immediately instead of queueing without
+    bound, so the API can answer 429 and stay responsive.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 32):
+        """
+        Initialize the pool
+
+        Args:
+            max_workers: Number of worker threads
+            max_pending: Maximum number of admitted requests, running or queued
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-worker")
+
+    @contextmanager
+    def reserve(self):
+        """Admit one request for the duration of the block, raising PoolSaturated when full"""
+        # Only touched from the event loop thread, so no lock is needed
+        if self.pending >= self.max_pending:
+            raise PoolSaturated(f"{self.pending} requests already pending")
+        self.pending += 1
+        try:
+            yield
+        finally:
+            self.pending -= 1
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking function on a worker thread and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -1,30 +1,143 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 from pathlib import Path
+import logging
 import pandas as pd
 import numpy as np
+from src.pipelines.table_io import (
+    get_format, table_path, read_table, iter_table, write_table, compact_dtypes, TableWriter
+)
+from src.pipelines.text_features import legal_features, hashed_features
+
+
+def _featurize_chunk(chunk, text_column, target_column):
+    """Features of one chunk, run in worker processes"""
+    return FeatureEngineeringPipeline.dense_features(chunk, text_column, target_column)
+
 
 class FeatureEngineeringPipeline:
     def __init__(self, config):
         self.config = config
         self.input_path = Path(config['data']['processed_data_path'])
         self.output_path = Path(config['data']['features_path'])
-    
+        self.format = get_format(config)
+        self.row_group_size = config['data'].get('row_group_size', 65536)
+        self.chunk_size = config['data'].get('chunk_size', 65536)
+        features_config = config.get('features', {})
+        self.text_column = features_config.get('text_column', 'text')
+        self.target_column = features_config.get('target_column')
+        self.n_features = features_config.get('hash_features', 1 << 18)
+        self.ngram_range = tuple(features_config.get('ngram_range', (1, 2)))
+        self.workers = features_config.get('workers', 1)
+
     def load_data(self):
         """Load preprocessed data"""
-        return pd.read_csv(self.input_path / 'preprocessed_data.csv')
-    
+        return read_table(table_path(self.input_path, 'preprocessed_data', self.format), self.format)
+
+    @staticmethod
+    def dense_features(data, text_column='text', target_column=None):
+        """
+        Tabular features: the input columns with the text column replaced by legal signal counts
+
+        The target column, when given, is moved last, where the training
+        pipeline expects it.
+        """
+        if text_column not in data.columns:
+            return data
+        features = pd.concat(
+            [data.drop(columns=[text_column]), legal_features(data[text_column])], axis=1
+        )
+        if target_column is not None and target_column in features.columns:
+            features = features[[c for c in features.columns if c != target_column] + [target_column]]
+        return features
+
     def create_features(self, data):
-        """Create features from preprocessed data"""
-        # Add your feature engineering logic here
-        return data
-    
+        """Create tabular features from preprocessed data"""
+        return self.dense_features(data, self.text_column, self.target_column)
+
+    def create_text_features(self, data):
+        """
+        Hashed n-gram features of the text column as a CSR matrix, or None without text
+
+        They are computed on demand and not saved with the features table,
+        which the tabular models are trained and served on.
+        """
+        if self.text_column not in data.columns:
+            return None
+        return hashed_features(data[self.text_column], self.n_features, self.ngram_range)
+
+    def iter_features(self, chunks):
+        """
+        Featurize chunks of preprocessed data, in order
+
+        With more than one worker, chunks are featurized in parallel
+        processes. The features have no fitted state, so workers need
+        nothing but the chunk, and at most 2 * workers chunks are in flight
+        at once.
+
+        Args:
+            chunks: Iterable of preprocessed DataFrames
+
+        Yields:
+            Features DataFrame per chunk
+        """
+        args = (self.text_column, self.target_column)
+        if self.workers is None or self.workers <= 1:
+            for chunk in chunks:
+                yield _featurize_chunk(chunk, *args)
+            return
+        with ProcessPoolExecutor(self.workers) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_featurize_chunk, chunk, *args))
+                if len(pending) >= 2 * self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
     def save_features(self, features):
-        """Save engineered features"""
-        self.output_path.mkdir(parents=True, exist_ok=True)
-        features.to_csv(self.output_path / 'features.csv', index=False)
-    
+        """Save engineered features, with compact dtypes for columnar formats"""
+        if self.format != 'csv':
+            features = compact_dtypes(features)
+        write_table(
+            features,
+            table_path(self.output_path, 'features', self.format),
+            self.format,
+            row_group_size=self.row_group_size
+        )
+
     def run(self):
         """Run the feature engineering pipeline"""
         data = self.load_data()
         features = self.create_features(data)
         self.save_features(features)
-        return features
\ No newline at end of file
+        return features
+
+    def run_streaming(self):
+        """
+        Run the feature engineering pipeline chunk by chunk
+
+        Preprocessed data is read chunk_size rows at a time and featurized
+        by features.workers processes, so memory stays bounded whatever the
+        corpus size, and the features are appended to the features table.
+        Floats are stored as float32 for columnar formats. Other columns keep
+        their dtypes, so every chunk has the same schema.
+
+        Returns:
+            Path of the features table
+        """
+        output = table_path(self.output_path, 'features', self.format)
+        chunks = iter_table(
+            table_path(self.input_path, 'preprocessed_data', self.format),
+            self.format,
+            chunk_size=self.chunk_size
+        )
+        with TableWriter(output, self.format, self.row_group_size) as writer:
+            for features in self.iter_features(chunks):
+                if self.format != 'csv':
+                    features = features.astype(
+                        {c: np.float32 for c in features.columns if features[c].dtype == np.float64}
+                    )
+                writer.write(features)
+        logging.info(f"Wrote features for {writer.rows} rows to {output}")
+        return output
@@ -1,6 +1,28 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 from pathlib import Path
+import json
+import logging
+import os
+import shutil
 import pandas as pd
 import joblib
+from src.pipelines.model_registry import file_digest
+from src.pipelines.table_io import (
+    get_format, table_path, read_table, iter_table, write_table, TableWriter
+)
+
+# Model loaded once per worker process by _init_worker
+_worker_model = None
+
+
+def _init_worker(model_file):
+    global _worker_model
+    _worker_model = joblib.load(model_file, mmap_mode='r')
+
+
+def _predict_chunk(features):
+    return _worker_model.predict(features)
 
 class InferencePipeline:
     def __init__(self, config):
@@ -8,15 +30,30 @@ class InferencePipeline:
         self.model_path = Path(config['model']['save_path'])
         self.features_path = Path(config['data']['features_path'])
         self.predictions_path = Path(config['data']['predictions_path'])
+        self.format = get_format(config)
+        self.chunk_size = config['data'].get('chunk_size', 65536)
     
+    @property
+    def model_file(self):
+        """Path of the trained model file"""
+        return self.model_path / f"{self.config['model']['name']}.pkl"
+
     def load_model(self):
         """Load trained model"""
-        model_file = self.model_path / f"{self.config['model']['name']}.pkl"
-        return joblib.load(model_file)
+        return joblib.load(self.model_file)
     
     def load_features(self):
         """Load features for inference"""
-        return pd.read_csv(self.features_path / 'features.csv')
+        return read_table(table_path(self.features_path, 'features', self.format), self.format)
+
+    def iter_features(self, skip_chunks=0):
+        """Load features for inference in chunks of chunk_size rows, leaving out the first skip_chunks"""
+        return iter_table(
+            table_path(self.features_path, 'features', self.format),
+            self.format,
+            chunk_size=self.chunk_size,
+            skip_chunks=skip_chunks
+        )
     
     def make_predictions(self, model, features):
         """Make predictions using the trained model"""
@@ -24,12 +61,101 @@ class InferencePipeline:
     
     def save_predictions(self, predictions):
         """Save model predictions"""
-        self.predictions_path.mkdir(parents=True, exist_ok=True)
-        pd.DataFrame({'predictions': predictions}).to_csv(
-            self.predictions_path / 'predictions.csv',
-            index=False
+        write_table(
+            pd.DataFrame({'predictions': predictions}),
+            table_path(self.predictions_path, 'predictions', self.format),
+            self.format
         )
     
+    def run_streaming(self, workers=None, resume=True):
+        """
+        Run the inference pipeline out of core, one chunk of features at a time
+
+        Each chunk's predictions are written to its own part file under
+        predictions_path/predictions.parts, renamed into place only once
+        complete, so a crashed run resumes by skipping chunks whose part
+        exists. The leading run of finished chunks is not even read back.
+        The parts are merged in input order into the predictions table at
+        the end.
+
+        Args:
+            workers: Number of processes predicting chunks in parallel, 1 or None runs in-process
+            resume: Reuse part files left by an interrupted run with the same inputs and model
+
+        Returns:
+            Path of the predictions table
+        """
+        parts_dir = self.predictions_path / 'predictions.parts'
+        features_file = table_path(self.features_path, 'features', self.format)
+        stat = features_file.stat()
+        manifest = {
+            'features': str(features_file),
+            'features_mtime_ns': stat.st_mtime_ns,
+            'features_size': stat.st_size,
+            'chunk_size': self.chunk_size,
+            'format': self.format,
+            # Parts predicted by a model swapped in since the crash are not reused
+            'model': file_digest(self.model_file),
+        }
+        manifest_file = parts_dir / 'manifest.json'
+        if parts_dir.exists():
+            previous = None
+            if resume and manifest_file.exists():
+                with open(manifest_file, 'r') as f:
+                    previous = json.load(f)
+            if previous != manifest:
+                shutil.rmtree(parts_dir)
+        parts_dir.mkdir(parents=True, exist_ok=True)
+        with open(manifest_file, 'w') as f:
+            json.dump(manifest, f)
+
+        def part_file(index):
+            return table_path(parts_dir, f'part-{index:06d}', self.format)
+
+        def write_part(index, predictions):
+            target = part_file(index)
+            tmp = target.with_name(target.name + '.tmp')
+            write_table(pd.DataFrame({'predictions': predictions}), tmp, self.format)
+            os.replace(tmp, target)
+
+        # Chunks already predicted by an earlier run are skipped, not recomputed. Parallel runs
+        # finish out of order, so past the leading finished run a few later chunks may be done too
+        done = 0
+        while part_file(done).exists():
+            done += 1
+        todo = (
+            (index, chunk) for index, chunk in enumerate(self.iter_features(skip_chunks=done), start=done)
+            if not part_file(index).exists()
+        )
+        if workers is None or workers <= 1:
+            model = self.load_model()
+            for index, chunk in todo:
+                write_part(index, self.make_predictions(model, chunk))
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(str(self.model_file),)) as pool:
+                # Bound the chunks in flight so memory stays proportional to workers
+                pending = deque()
+                for index, chunk in todo:
+                    pending.append((index, pool.submit(_predict_chunk, chunk)))
+                    if len(pending) >= 2 * workers:
+                        done_index, future = pending.popleft()
+                        write_part(done_index, future.result())
+                while pending:
+                    done_index, future = pending.popleft()
+                    write_part(done_index, future.result())
+
+        output = table_path(self.predictions_path, 'predictions', self.format)
+        parts = sorted(parts_dir.glob(f'part-*{output.suffix}'))
+        if parts:
+            with TableWriter(output, self.format) as writer:
+                for part in parts:
+                    writer.write(read_table(part, self.format))
+            logging.info(f"Wrote {writer.rows} predictions from {len(parts)} chunks to {output}")
+        else:
+            self.save_predictions([])
+        shutil.rmtree(parts_dir)
+        return output
+
     def run(self):
         """Run the inference pipeline"""
         model = self.load_model()
@@ -0,0 +1,161 @@
+from pathlib import Path
+from typing import BinaryIO
+import hashlib
+import logging
+import os
+import threading
+import time
+import joblib
+from src.utils.metrics import metrics
+
+# Loads retried when the model file is replaced between hashing and memory-mapping it
+_LOAD_ATTEMPTS = 3
+
+
+def stream_digest(f: BinaryIO, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of the rest of an open binary file, read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(chunk_size), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file, read in chunks"""
+    with open(path, "rb") as f:
+        return stream_digest(f, chunk_size)
+
+
+def dump_model(model, path):
+    """
+    Write a joblib model file atomically
+
+    The model is dumped to a temporary sibling that is then renamed over
+    path, so the previous file is replaced rather than rewritten. A
+    ModelRegistry that memory-mapped the previous file keeps reading it
+    intact, and readers never see a partially written model.
+
+    Args:
+        model: Model to pickle
+        path: Target .pkl file
+    """
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        joblib.dump(model, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+class ModelRegistry:
+    """Process-wide cache of a joblib model that reloads when the file changes
+
+    The model is loaded once and shared by every request. get() checks the
+    file's inode, mtime and size at most once per check_interval seconds;
+    when they change and the content hash differs, the new model is loaded
+    fully before the reference is swapped, so callers always see a complete
+    model. Writers must replace the file with dump_model rather than
+    rewrite it, since a memory-mapped model keeps reading the old file.
+    """
+
+    def __init__(self, model_file, mmap_mode: str = "r", check_interval: float = 5.0):
+        """
+        Initialize the registry
+
+        Args:
+            model_file: Path to the joblib .pkl file
+            mmap_mode: Passed to joblib.load so large numpy arrays are memory-mapped
+                and shared between forked workers; None loads them into memory
+            check_interval: Minimum seconds between checks of the model file
+        """
+        self.model_file = Path(model_file)
+        self.mmap_mode = mmap_mode
+        self.check_interval = check_interval
+        self.model = None
+        self.version = None  # Content hash of the loaded model file
+        self.load_seconds = None
+        self._stat = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Return the current model, reloading it first if the file changed
+
+        Returns:
+            The loaded model
+        """
+        now = time.monotonic()
+        if self.model is not None and now - self._last_check < self.check_interval:
+            return self.model
+        with self._lock:
+            if self.model is None or now - self._last_check >= self.check_interval:
+                self._last_check = now
+                self._refresh()
+        return self.model
+
+    def load(self):
+        """Load the model now, regardless of the check interval"""
+        with self._lock:
+            self._last_check = time.monotonic()
+            self._refresh()
+        return self.model
+
+    def _refresh(self):
+        """Reload if changed, keeping the current model when the new file cannot be loaded"""
+        try:
+            self._reload_if_changed()
+        except Exception:
+            if self.model is None:
+                raise
+            logging.exception(f"Failed to reload {self.model_file}, keeping the loaded model")
+
+    def _reload_if_changed(self):
+        stat = self.model_file.stat()
+        if self.model is not None and self._signature(stat) == self._stat:
+            return
+        for _ in range(_LOAD_ATTEMPTS):
+            if self._load_if_changed():
+                return
+        raise RuntimeError(f"{self.model_file} kept being replaced while loading")
+
+    @staticmethod
+    def _signature(stat: os.stat_result) -> tuple:
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load_if_changed(self) -> bool:
+        """
+        Hash the file and load it if the hash changed
+
+        The hash covers the bytes that are loaded: without memory mapping
+        the model is unpickled from the handle that was hashed, and with it
+        the file must still be the hashed inode once loaded. Files are
+        replaced, never rewritten, so the same inode holds the same bytes.
+
+        Returns:
+            False if the file was replaced while loading and nothing was swapped in
+        """
+        with open(self.model_file, "rb") as f:
+            opened = os.fstat(f.fileno())
+            version = stream_digest(f)
+            if self.model is not None and version == self.version:
+                self._stat = self._signature(opened)
+                return True
+            start = time.perf_counter()
+            if self.mmap_mode is None:
+                f.seek(0)
+                model = joblib.load(f)
+            else:
+                model = joblib.load(self.model_file, mmap_mode=self.mmap_mode)
+                if self.model_file.stat().st_ino != opened.st_ino:
+                    return False
+        self.load_seconds = time.perf_counter() - start
+        metrics.record_model_load(self.model_file.stem, self.load_seconds)
+        # Single reference assignment, so readers never observe a partial swap
+        self.model = model
+        self.version = version
+        self._stat = self._signature(opened)
+        logging.info(f"Loaded model {self.model_file} ({version[:12]}) in {self.load_seconds:.3f}s")
+        return True
@@ -0,0 +1,267 @@
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, List, Optional
+import pandas as pd
+import numpy as np
+
+# File suffix per storage format
+SUFFIXES = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("Columnar storage formats require pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def get_format(config) -> str:
+    """Storage format configured under data.format, csv by default"""
+    fmt = config['data'].get('format', 'csv')
+    if fmt not in SUFFIXES:
+        raise ValueError(f"Unsupported data format: {fmt}")
+    return fmt
+
+
+def table_path(directory, name: str, fmt: str) -> Path:
+    """Path of a named table stored in the given format"""
+    return Path(directory) / f"{name}{SUFFIXES[fmt]}"
+
+
+def compact_dtypes(df: pd.DataFrame, max_category_ratio: float = 0.5) -> pd.DataFrame:
+    """
+    Downcast columns to compact dtypes
+
+    float64 becomes float32, integers are downcast to the smallest type that
+    fits, and string columns with few distinct values become categorical.
+
+    Args:
+        df: Input frame
+        max_category_ratio: Largest distinct/total ratio for a string column to become categorical
+
+    Returns:
+        Frame with compact dtypes
+    """
+    df = df.copy()
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_float_dtype(series):
+            df[column] = series.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(series):
+            df[column] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            if len(series) and series.nunique(dropna=True) / len(series) <= max_category_ratio:
+                df[column] = series.astype("category")
+    return df
+
+
+def read_table(path, fmt: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Read a whole table
+
+    Args:
+        path: Table file
+        fmt: Storage format
+        columns: Columns to read, all if None
+
+    Returns:
+        Table as a DataFrame
+    """
+    if fmt == "csv":
+        return pd.read_csv(path, usecols=columns)
+    pa = _require_pyarrow()
+    if fmt == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    with pa.memory_map(str(path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table.to_pandas()
+
+
+def _uniform_chunks(batches, chunk_size: int, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+    """Re-slice a stream of record batches into chunks of exactly chunk_size rows, after skip_rows rows"""
+    import pyarrow as pa
+
+    pending, rows = [], 0
+    for batch in batches:
+        if skip_rows >= batch.num_rows:
+            skip_rows -= batch.num_rows
+            continue
+        batch, skip_rows = batch.slice(skip_rows), 0
+        while batch.num_rows:
+            take = min(chunk_size - rows, batch.num_rows)
+            pending.append(batch.slice(0, take))
+            rows += take
+            batch = batch.slice(take)
+            if rows == chunk_size:
+                yield pa.Table.from_batches(pending).to_pandas()
+                pending, rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending).to_pandas()
+
+
+def iter_table(path, fmt: str, chunk_size: int = 65536,
+               columns: Optional[List[str]] = None, skip_chunks: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    Read a table in chunks of at most chunk_size rows
+
+    Parquet is read one record batch at a time and Arrow IPC files are
+    memory-mapped, so memory stays bounded by the chunk size. Chunk
+    boundaries depend only on the file and chunk_size, so skip_chunks
+    resumes an earlier pass: the same chunks are yielded minus the first
+    skip_chunks, and the skipped rows are not parsed. CSV lines are still
+    scanned for line breaks (so quoted fields must not span lines), while
+    Parquet row groups and Arrow batches before the first chunk are not
+    read at all.
+
+    Args:
+        path: Table file
+        fmt: Storage format
+        chunk_size: Maximum rows per chunk
+        columns: Columns to read, all if None
+        skip_chunks: Number of leading chunks to leave out
+
+    Yields:
+        Consecutive chunks of the table
+    """
+    if fmt == "csv":
+        if not skip_chunks:
+            yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+            return
+        names = pd.read_csv(path, nrows=0).columns
+        with open(path, "rb") as f:
+            # Header and skipped lines are consumed at C speed, without parsing their fields
+            deque(islice(f, 1 + skip_chunks * chunk_size), maxlen=0)
+            for chunk in pd.read_csv(f, header=None, names=names, usecols=columns, chunksize=chunk_size):
+                if len(chunk):
+                    yield chunk
+        return
+    pa = _require_pyarrow()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        skip_rows, first_group = skip_chunks * chunk_size, 0
+        while first_group < parquet.num_row_groups and parquet.metadata.row_group(first_group).num_rows <= skip_rows:
+            skip_rows -= parquet.metadata.row_group(first_group).num_rows
+            first_group += 1
+        if first_group == parquet.num_row_groups:
+            return
+        batches = parquet.iter_batches(
+            batch_size=chunk_size, columns=columns, row_groups=range(first_group, parquet.num_row_groups)
+        )
+        # Re-sliced, since whether batches span row groups varies across pyarrow versions
+        yield from _uniform_chunks(batches, chunk_size, skip_rows)
+        return
+    with pa.memory_map(str(path), "r") as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            # Batches are zero-copy views of the mapped file, so skipping one costs no read
+            n_chunks = -(-batch.num_rows // chunk_size)
+            if skip_chunks >= n_chunks:
+                skip_chunks -= n_chunks
+                continue
+            if columns is not None:
+                batch = batch.select(columns)
+            for start in range(skip_chunks * chunk_size, batch.num_rows, chunk_size):
+                yield batch.slice(start, chunk_size).to_pandas()
+            skip_chunks = 0
+
+
+def write_table(df: pd.DataFrame, path, fmt: str, row_group_size: int = 65536):
+    """
+    Write a table, creating its directory
+
+    Args:
+        df: Table to write
+        path: Target file
+        fmt: Storage format
+        row_group_size: Rows per Parquet row group or Arrow record batch
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+        return
+    pa = _require_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, path, row_group_size=row_group_size)
+        return
+    with pa.OSFile(str(path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=row_group_size)
+
+
+class TableWriter:
+    """Append DataFrames to one table file chunk by chunk
+
+    Every chunk must have the same columns and dtypes. Parquet chunks become
+    row groups and Arrow chunks record batches.
+    """
+
+    def __init__(self, path, fmt: str, row_group_size: int = 65536):
+        """
+        Open the target file for writing, creating its directory
+
+        Args:
+            path: Target file
+            fmt: Storage format
+            row_group_size: Maximum rows per Parquet row group or Arrow record batch
+        """
+        self.path = Path(path)
+        self.fmt = fmt
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self._header_written = False
+        self._writer = None
+        self._sink = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == "csv":
+            self._sink = open(self.path, "w", newline="")
+
+    def write(self, df: pd.DataFrame):
+        """Append a chunk"""
+        if self.fmt == "csv":
+            df.to_csv(self._sink, index=False, header=not self._header_written)
+            self._header_written = True
+        else:
+            pa = _require_pyarrow()
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                if self.fmt == "parquet":
+                    import pyarrow.parquet as pq
+
+                    self._writer = pq.ParquetWriter(self.path, table.schema)
+                else:
+                    self._sink = pa.OSFile(str(self.path), "wb")
+                    self._writer = pa.ipc.new_file(self._sink, table.schema)
+            if self.fmt == "parquet":
+                self._writer.write_table(table, row_group_size=self.row_group_size)
+            else:
+                self._writer.write_table(table, max_chunksize=self.row_group_size)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,77 @@
+from typing import Tuple
+import re
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+
+_MONTHS = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+
+# Legal signals counted per document, as (regex, flags)
+LEGAL_PATTERNS = {
+    "money_amounts": (
+        r"(?:[$€£]\s?\d[\d,]*(?:\.\d+)?|\b\d[\d,]*(?:\.\d+)?\s?(?:usd|eur|gbp|dollars|euros|pounds)\b)",
+        re.IGNORECASE,
+    ),
+    # The lookahead rejects most positions before trying the month alternatives
+    "dates": (
+        rf"\b(?=[\dadfjmnos])(?:\d{{1,2}}[/.-]\d{{1,2}}[/.-]\d{{2,4}}|\d{{4}}-\d{{2}}-\d{{2}}"
+        rf"|{_MONTHS}\.?\s+\d{{1,2}}(?:st|nd|rd|th)?,?\s+\d{{4}}|\d{{1,2}}(?:st|nd|rd|th)?\s+{_MONTHS}\.?,?\s+\d{{4}})\b",
+        re.IGNORECASE,
+    ),
+    "durations": (
+        r"(?:\b\d+|\(\d+\))\s*(?:\([\w\s-]+\)\s*)?(?:business\s+|calendar\s+)?(?:days?|weeks?|months?|years?)\b",
+        re.IGNORECASE,
+    ),
+    "percentages": (r"\b\d+(?:\.\d+)?\s?(?:%|per\s?cent\b)", re.IGNORECASE),
+    "obligations": (r"\b(?:shall|must)\b(?!\s+not\b)|\b(?:agrees?|undertakes?|is required) to\b", re.IGNORECASE),
+    "prohibitions": (r"\b(?:shall|must|may)\s+not\b|\bis prohibited from\b", re.IGNORECASE),
+    "permissions": (r"\bmay\b(?!\s+not\b)|\bis entitled to\b", re.IGNORECASE),
+    "defined_terms": (r"[\"“][A-Z][\w -]{1,40}[\"”]", 0),
+}
+
+
+def legal_features(texts: pd.Series) -> pd.DataFrame:
+    """
+    Count legal signals in each document
+
+    Every feature is one vectorized pandas string operation over the whole
+    column, not a Python call per row.
+
+    Args:
+        texts: Document texts
+
+    Returns:
+        One int32 column per LEGAL_PATTERNS entry plus legal_words and legal_chars,
+        prefixed with legal_ and indexed like texts
+    """
+    texts = texts.fillna("").astype(str)
+    columns = {
+        f"legal_{name}": texts.str.count(pattern, flags=flags)
+        for name, (pattern, flags) in LEGAL_PATTERNS.items()
+    }
+    columns["legal_words"] = texts.str.count(r"\S+")
+    columns["legal_chars"] = texts.str.len()
+    return pd.DataFrame(columns, index=texts.index).astype(np.int32)
+
+
+def hashing_vectorizer(n_features: int = 1 << 18, ngram_range: Tuple[int, int] = (1, 2)) -> HashingVectorizer:
+    """
+    Stateless vectorizer mapping text to L2-normalised hashed n-gram counts
+
+    It has no vocabulary to fit, so any process can build an identical one
+    and transform its share of the corpus independently.
+    """
+    return HashingVectorizer(
+        n_features=n_features,
+        ngram_range=tuple(ngram_range),
+        alternate_sign=False,
+        norm="l2",
+        dtype=np.float32,
+    )
+
+
+def hashed_features(texts: pd.Series, n_features: int = 1 << 18,
+                    ngram_range: Tuple[int, int] = (1, 2)) -> sparse.csr_matrix:
+    """Hashed n-gram features of the documents as a float32 CSR matrix"""
+    return hashing_vectorizer(n_features, ngram_range).transform(texts.fillna("").astype(str)).tocsr()
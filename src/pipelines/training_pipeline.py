@@ -1,42 +1,143 @@
 from pathlib import Path
-import pandas as pd
+import logging
+import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier, HistGradientBoostingClassifier
 import joblib
+from src.pipelines.model_registry import dump_model
+from src.pipelines.table_io import get_format, table_path, read_table
+
+# Estimators selectable with model.estimator, and their default parameters
+ESTIMATORS = {
+    'random_forest': (RandomForestClassifier, {'n_estimators': 100, 'random_state': 42, 'n_jobs': -1}),
+    'extra_trees': (ExtraTreesClassifier, {'n_estimators': 100, 'random_state': 42, 'n_jobs': -1}),
+    'hist_gradient_boosting': (HistGradientBoostingClassifier, {'random_state': 42}),
+}
+
+# Generic config parameter names mapped to each estimator's own
+PARAMETER_ALIASES = {
+    'hist_gradient_boosting': {'epochs': 'max_iter'},
+}
+
+# Estimators that can grow an existing model with warm_start
+FOREST_ESTIMATORS = ('random_forest', 'extra_trees')
+
+
+def estimator_params(estimator, parameters):
+    """
+    Map and validate config parameters for an estimator
+
+    Parameter names are translated through PARAMETER_ALIASES, and names the
+    estimator does not accept are dropped with a warning.
+
+    Args:
+        estimator: Key of ESTIMATORS
+        parameters: Parameters from the config
+
+    Returns:
+        Keyword arguments for the estimator constructor
+    """
+    if estimator not in ESTIMATORS:
+        raise ValueError(f"Unknown estimator '{estimator}', expected one of {sorted(ESTIMATORS)}")
+    cls, defaults = ESTIMATORS[estimator]
+    aliases = PARAMETER_ALIASES.get(estimator, {})
+    accepted = cls().get_params()
+
+    params = dict(defaults)
+    ignored = []
+    for name, value in (parameters or {}).items():
+        name = aliases.get(name, name)
+        if name in accepted:
+            params[name] = value
+        else:
+            ignored.append(name)
+    if ignored:
+        logging.warning(f"Ignoring parameters not accepted by {cls.__name__}: {', '.join(sorted(ignored))}")
+    return params
+
 
 class TrainingPipeline:
     def __init__(self, config):
         self.config = config
         self.features_path = Path(config['data']['features_path'])
+        self.model_path = Path(config['model']['save_path'])
         self.model_params = config['model']['parameters']
-    
+        self.estimator = config['model'].get('estimator', 'random_forest')
+        self.warm_start = config['model'].get('warm_start', False)
+        self.incremental_estimators = config['model'].get('incremental_estimators', 25)
+        self.max_estimators = config['model'].get('max_estimators', 500)
+        self.format = get_format(config)
+
+    @property
+    def model_file(self):
+        """Path of the trained model file"""
+        return self.model_path / f"{self.config['model']['name']}.pkl"
+
     def load_data(self):
         """Load features and target for training"""
-        features = pd.read_csv(self.features_path / 'features.csv')
+        features = read_table(table_path(self.features_path, 'features', self.format), self.format)
         # Assuming last column is target
         X = features.iloc[:, :-1]
         y = features.iloc[:, -1]
         return train_test_split(X, y, test_size=0.2, random_state=42)
-    
+
     def train_model(self, X_train, y_train):
-        """Train the model"""
-        model = RandomForestClassifier(
-            n_estimators=100,
-            random_state=42,
-            **self.model_params
-        )
+        """
+        Train the model
+
+        With model.warm_start enabled and a compatible forest already saved,
+        incremental_estimators new trees are fitted on the given data and
+        added to it instead of refitting the whole forest. Once that would
+        take the forest past max_estimators, it is refitted from scratch, so
+        model size and prediction cost stay bounded across retrains.
+        """
+        model = self.load_previous_model(y_train) if self.warm_start else None
+        if model is not None and model.n_estimators + self.incremental_estimators > self.max_estimators:
+            logging.info(f"Forest of {model.n_estimators} trees would exceed {self.max_estimators}, refitting")
+            model = None
+        if model is not None:
+            model.set_params(
+                warm_start=True,
+                n_estimators=model.n_estimators + self.incremental_estimators,
+                n_jobs=-1
+            )
+            model.fit(X_train, y_train)
+            logging.info(f"Grew forest to {model.n_estimators} trees")
+            return model
+
+        cls, _ = ESTIMATORS[self.estimator]
+        model = cls(**estimator_params(self.estimator, self.model_params))
         model.fit(X_train, y_train)
         return model
-    
+
+    def load_previous_model(self, y_train):
+        """Previously saved model if it can be grown with warm_start on y_train, else None"""
+        if self.estimator not in FOREST_ESTIMATORS or not self.model_file.exists():
+            return None
+        model = joblib.load(self.model_file)
+        if type(model) is not ESTIMATORS[self.estimator][0]:
+            logging.warning(f"Saved model is a {type(model).__name__}, refitting from scratch")
+            return None
+        # New trees must see the same classes, or their votes would not line up with the old ones
+        if not np.array_equal(np.unique(y_train), model.classes_):
+            logging.warning("Class labels changed since the saved model, refitting from scratch")
+            return None
+        return model
+
     def evaluate_model(self, model, X_test, y_test):
         """Evaluate model performance"""
         score = model.score(X_test, y_test)
         print(f"Model accuracy: {score:.4f}")
         return score
-    
+
+    def save_model(self, model):
+        """Save the trained model, replacing the previous file atomically so serving registries can memory-map it"""
+        self.model_path.mkdir(parents=True, exist_ok=True)
+        dump_model(model, self.model_file)
+
     def run(self):
         """Run the training pipeline"""
         X_train, X_test, y_train, y_test = self.load_data()
         model = self.train_model(X_train, y_train)
         self.evaluate_model(model, X_test, y_test)
-        return model
\ No newline at end of file
+        return model
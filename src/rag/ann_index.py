@@ -0,0 +1,181 @@
+from typing import List, Optional
+import threading
+import numpy as np
+
+# Rows assigned to centroids per block, bounds the temporary score matrix
+_ASSIGN_BLOCK = 16384
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length, leaving zero rows untouched"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index
+
+    A spherical k-means coarse quantizer partitions the embeddings into
+    ``n_lists`` cells. A query only scans the rows stored in its ``nprobe``
+    closest cells, so search cost scales with ``nprobe / n_lists`` of the
+    corpus instead of all of it. Rows added since the last search are
+    buffered with their cell assignments and merged into the lists in one
+    pass on the next search.
+    """
+
+    def __init__(self, n_lists: int = 256, nprobe: int = 8, n_iter: int = 10,
+                 max_train_points: int = 256 * 64, seed: int = 0):
+        """
+        Initialize the index
+
+        Args:
+            n_lists: Number of coarse cells (inverted lists)
+            nprobe: Default number of cells scanned per query
+            n_iter: Number of k-means iterations used by train
+            max_train_points: Upper bound on vectors sampled for training
+            seed: Random seed for sampling and centroid initialisation
+        """
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.max_train_points = max_train_points
+        self.seed = seed
+        self.centroids = None
+        self._lists = []
+        self._pending_cells: List[np.ndarray] = []
+        self._pending_ids: List[np.ndarray] = []
+        self._lock = threading.Lock()
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(ids) for ids in self._lists) + sum(len(ids) for ids in self._pending_ids)
+
+    def train(self, vectors: np.ndarray):
+        """
+        Fit the coarse quantizer on a sample of vectors
+
+        Args:
+            vectors: (n, dim) matrix of embeddings
+        """
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > self.max_train_points:
+            sample = vectors[rng.choice(len(vectors), self.max_train_points, replace=False)]
+        else:
+            sample = vectors
+        sample = _normalize(np.asarray(sample, dtype=np.float32))
+        n_lists = min(self.n_lists, len(sample))
+        if n_lists == 0:
+            raise ValueError("Cannot train an IVF index on an empty set of vectors")
+
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignment = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
+            # Re-seed empty cells from random points so every list stays usable
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        with self._lock:
+            self.centroids = centroids
+            self._lists = [np.empty(0, dtype=np.int64) for _ in range(n_lists)]
+            self._pending_cells, self._pending_ids = [], []
+
+    def _assign(self, vectors: np.ndarray, centroids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Nearest centroid (by inner product) for each row, computed blockwise"""
+        centroids = self.centroids if centroids is None else centroids
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), _ASSIGN_BLOCK):
+            block = vectors[start:start + _ASSIGN_BLOCK]
+            assignment[start:start + _ASSIGN_BLOCK] = np.argmax(block @ centroids.T, axis=1)
+        return assignment
+
+    def add(self, vectors: np.ndarray, start_id: int):
+        """
+        Append vectors to their inverted lists
+
+        Only the cell assignment is computed here; the lists are extended
+        on the next search, so repeated small adds do not copy every list
+        they touch.
+
+        Args:
+            vectors: (n, dim) matrix of embeddings
+            start_id: Row id of the first vector in the owning store
+        """
+        if not self.is_trained:
+            raise RuntimeError("IVFIndex must be trained before vectors are added")
+        if len(vectors) == 0:
+            return
+        assignment = self._assign(_normalize(np.asarray(vectors, dtype=np.float32)))
+        with self._lock:
+            self._pending_cells.append(assignment)
+            self._pending_ids.append(np.arange(start_id, start_id + len(vectors), dtype=np.int64))
+
+    def _merge_pending(self):
+        """Fold buffered rows into the inverted lists, extending each touched list once"""
+        if not self._pending_ids:
+            return
+        with self._lock:
+            if not self._pending_ids:
+                return
+            cells = np.concatenate(self._pending_cells)
+            ids = np.concatenate(self._pending_ids)
+            # Stable, so each list stays in ascending row order
+            order = np.argsort(cells, kind="stable")
+            touched, bounds = np.unique(cells[order], return_index=True)
+            bounds = np.append(bounds, len(order))
+            lists = list(self._lists)
+            for cell, lo, hi in zip(touched, bounds[:-1], bounds[1:]):
+                lists[cell] = np.concatenate([lists[cell], ids[order[lo:hi]]])
+            # Swapped in whole, so concurrent searches see the old or the new lists
+            self._lists = lists
+            self._pending_cells, self._pending_ids = [], []
+
+    def compacted(self, keep: np.ndarray) -> "IVFIndex":
+        """
+        Copy of the index without dropped rows, renumbered to their new positions
+
+        The centroids are reused, so no vector is reassigned. Rows at or
+        beyond len(keep) are left out.
+
+        Args:
+            keep: Boolean mask over row ids, True for the rows that stay
+
+        Returns:
+            New index whose row ids follow the compacted store
+        """
+        self._merge_pending()
+        index = IVFIndex(self.n_lists, self.nprobe, self.n_iter, self.max_train_points, self.seed)
+        index.centroids = self.centroids
+        new_ids = np.cumsum(keep) - 1
+        lists = []
+        for ids in self._lists:
+            ids = ids[ids < len(keep)]
+            lists.append(new_ids[ids[keep[ids]]])
+        index._lists = lists
+        return index
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """
+        Row ids stored in the cells closest to a query
+
+        Args:
+            query: Query vector
+            nprobe: Number of cells to scan, defaults to self.nprobe
+
+        Returns:
+            Array of candidate row ids
+        """
+        self._merge_pending()
+        lists = self._lists
+        nprobe = min(nprobe or self.nprobe, len(lists))
+        scores = self.centroids @ query
+        cells = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        return np.concatenate([lists[c] for c in cells])
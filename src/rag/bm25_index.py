@@ -0,0 +1,196 @@
+from array import array
+from collections import Counter
+from typing import Dict, List, NamedTuple, Tuple
+import re
+import threading
+import numpy as np
+
+# Words, numbers and dotted or hyphenated compounds such as section numbers "12.3(b)" -> "12.3", "b"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens of a text, keeping section numbers and hyphenated terms whole"""
+    return _TOKEN_RE.findall(text.casefold())
+
+
+class _Postings(NamedTuple):
+    """Merged postings and document lengths
+
+    A merge builds new arrays and publishes them with a single assignment,
+    so a search that reads the postings once sees arrays from one merge
+    even while documents are added.
+    """
+    offsets: np.ndarray
+    doc_ids: np.ndarray
+    term_freqs: np.ndarray
+    doc_lengths: np.ndarray
+    total_length: float
+
+
+_EMPTY = _Postings(
+    offsets=np.zeros(1, dtype=np.int64),
+    doc_ids=np.empty(0, dtype=np.int32),
+    term_freqs=np.empty(0, dtype=np.float32),
+    doc_lengths=np.empty(0, dtype=np.float32),
+    total_length=0.0,
+)
+
+
+class BM25Index:
+    """In-memory Okapi BM25 inverted index with array-backed postings
+
+    Postings are stored term-major in three flat arrays: for term t, the
+    documents containing it are doc_ids[offsets[t]:offsets[t + 1]], with
+    their term frequencies at the same positions in term_freqs. Documents
+    added since the last search are buffered in typed arrays and merged
+    into new postings by one sort on the next search, which are then
+    published as a whole.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, text_key: str = "text"):
+        """
+        Initialize an empty index
+
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalisation
+            text_key: Document field indexed by VectorStore
+        """
+        self.k1 = k1
+        self.b = b
+        self.text_key = text_key
+        self.vocabulary: Dict[str, int] = {}
+        self._postings = _EMPTY
+        self._pending_terms = array("i")
+        self._pending_docs = array("i")
+        self._pending_freqs = array("f")
+        self._pending_lengths = array("f")
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._postings.doc_lengths) + len(self._pending_lengths)
+
+    def add(self, texts: List[str], start_id: int):
+        """
+        Index documents
+
+        Args:
+            texts: Document texts
+            start_id: Row id of the first text in the owning store
+        """
+        counts = [Counter(tokenize(text or "")) for text in texts]
+        with self._lock:
+            if start_id != len(self):
+                raise ValueError(f"Expected documents starting at row {len(self)}, got {start_id}")
+            for offset, doc_counts in enumerate(counts):
+                for term, count in doc_counts.items():
+                    term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+                    self._pending_terms.append(term_id)
+                    self._pending_docs.append(start_id + offset)
+                    self._pending_freqs.append(count)
+                self._pending_lengths.append(sum(doc_counts.values()))
+
+    def _merged_locked(self) -> _Postings:
+        """Postings including the buffered ones, merged into the term-major arrays if needed
+
+        Call with the lock held.
+        """
+        if not self._pending_lengths:
+            return self._postings
+        old = self._postings
+        n_terms = len(self.vocabulary)
+        old_terms = np.repeat(np.arange(len(old.offsets) - 1, dtype=np.int32), np.diff(old.offsets))
+        terms = np.concatenate([old_terms, np.frombuffer(self._pending_terms, dtype=np.int32)])
+        docs = np.concatenate([old.doc_ids, np.frombuffer(self._pending_docs, dtype=np.int32)])
+        freqs = np.concatenate([old.term_freqs, np.frombuffer(self._pending_freqs, dtype=np.float32)])
+        pending_lengths = np.frombuffer(self._pending_lengths, dtype=np.float32)
+        # Stable, so each term's postings stay in ascending document order
+        order = np.argsort(terms, kind="stable")
+        offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=n_terms), out=offsets[1:])
+        self._postings = _Postings(
+            offsets=offsets,
+            doc_ids=docs[order],
+            term_freqs=freqs[order],
+            doc_lengths=np.concatenate([old.doc_lengths, pending_lengths]),
+            total_length=old.total_length + float(pending_lengths.sum()),
+        )
+        self._pending_terms = array("i")
+        self._pending_docs = array("i")
+        self._pending_freqs = array("f")
+        self._pending_lengths = array("f")
+        return self._postings
+
+    def compacted(self, keep: np.ndarray) -> "BM25Index":
+        """
+        Copy of the index without dropped documents, renumbered to their new positions
+
+        Postings are filtered and remapped, so no text is tokenized again.
+        Documents at or beyond len(keep) are left out.
+
+        Args:
+            keep: Boolean mask over row ids, True for the documents that stay
+
+        Returns:
+            New index whose row ids follow the compacted store
+        """
+        index = BM25Index(self.k1, self.b, self.text_key)
+        with self._lock:
+            postings = self._merged_locked()
+            index.vocabulary = dict(self.vocabulary)
+        n_terms = len(index.vocabulary)
+        terms = np.repeat(np.arange(n_terms, dtype=np.int32), np.diff(postings.offsets))
+        n = min(len(keep), len(postings.doc_lengths))
+        keep = keep[:n]
+        kept = postings.doc_ids < n
+        kept[kept] = keep[postings.doc_ids[kept]]
+        new_ids = np.cumsum(keep) - 1
+        offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms[kept], minlength=n_terms), out=offsets[1:])
+        doc_lengths = postings.doc_lengths[:n][keep]
+        index._postings = _Postings(
+            offsets=offsets,
+            doc_ids=new_ids[postings.doc_ids[kept]].astype(np.int32),
+            term_freqs=postings.term_freqs[kept],
+            doc_lengths=doc_lengths,
+            total_length=float(doc_lengths.sum()),
+        )
+        return index
+
+    def scores(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25 scores of the documents sharing at least one term with a query
+
+        Only the postings of the query terms are read, so the cost depends
+        on how common the terms are, not on the corpus size.
+
+        Args:
+            query: Query text
+
+        Returns:
+            (row ids, scores) of the matching documents, in row order
+        """
+        terms = set(tokenize(query))
+        # Term ids are looked up against the same merge as the postings they index
+        with self._lock:
+            postings = self._merged_locked()
+            term_ids = sorted({self.vocabulary[t] for t in terms if t in self.vocabulary})
+        n_docs = len(postings.doc_lengths)
+        if n_docs == 0 or not term_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        avg_length = postings.total_length / n_docs or 1.0
+        docs, contributions = [], []
+        for term_id in term_ids:
+            lo, hi = postings.offsets[term_id], postings.offsets[term_id + 1]
+            ids, tf = postings.doc_ids[lo:hi], postings.term_freqs[lo:hi]
+            df = int(hi - lo)
+            idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * postings.doc_lengths[ids] / avg_length)
+            docs.append(ids)
+            contributions.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+
+        ids, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(contributions)).astype(np.float32)
+        return ids.astype(np.int64), totals
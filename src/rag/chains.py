@@ -1,44 +1,120 @@
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional
+import logging
 from src.rag.retriever import Retriever
+from src.rag.prompt_packer import PromptPacker
+from src.utils.metrics import metrics
+
+PROMPT_TEMPLATE = """You are a legal assistant. Answer the question using only the contract excerpts below.
+
+Context:
+{context}
+
+Question: {query}
+Answer:"""
+
+def context_label(i: int) -> str:
+    """Numbered label put before the i-th context excerpt, separating it from the previous one"""
+    return f"[{i}] " if i == 1 else f"\n\n[{i}] "
 
 class RAGChain:
     """Chain for combining retrieval and generation"""
-    
-    def __init__(self, retriever: Retriever):
-        """Initialize the chain"""
+
+    def __init__(self, retriever: Retriever, llm=None, packer: Optional[PromptPacker] = None):
+        """
+        Initialize the chain
+
+        Args:
+            retriever: Retriever supplying context documents
+            llm: Language model exposing generate(prompt) -> str and,
+                optionally, stream(prompt) -> iterator of text chunks
+            packer: Packer fitting retrieved context into the prompt budget
+        """
         self.retriever = retriever
-        self.llm = None  # Load your LLM here
-    
+        self.llm = llm
+        self.packer = packer or PromptPacker()
+
     def run(self, query: str) -> Dict:
         """
         Run the RAG chain on a query
-        
+
         Args:
             query: The input query text
-            
+
         Returns:
             Generated response with supporting context
         """
         # Retrieve relevant documents
-        docs = self.retriever.retrieve(query)
-        
+        with metrics.span("rag.retrieve"):
+            docs = self.retriever.retrieve(query)
+
         # Format prompt with retrieved context
-        prompt = self.format_prompt(query, docs)
-        
+        with metrics.span("rag.format_prompt"):
+            prompt = self.format_prompt(query, docs)
+
         # Generate response
-        response = self.generate(prompt)
-        
+        with metrics.span("rag.generate"):
+            response = self.generate(prompt)
+
         return {
             "response": response,
             "context": docs
         }
-    
+
+    def stream(self, query: str) -> Iterator[Dict]:
+        """
+        Run the RAG chain on a query, yielding results as they become available
+
+        The retrieved context is yielded before generation starts, followed by
+        the generated text chunk by chunk.
+
+        Args:
+            query: The input query text
+
+        Yields:
+            Events {"event": "context", "data": docs}, then
+            {"event": "token", "data": text} per chunk, then {"event": "done", "data": None}
+        """
+        with metrics.span("rag.retrieve"):
+            docs = self.retriever.retrieve(query)
+        yield {"event": "context", "data": docs}
+
+        with metrics.span("rag.format_prompt"):
+            prompt = self.format_prompt(query, docs)
+        # Spans the whole stream, up to the last token, as the client experiences it
+        with metrics.span("rag.generate"):
+            for token in self.generate_stream(prompt):
+                yield {"event": "token", "data": token}
+
+        yield {"event": "done", "data": None}
+
     def format_prompt(self, query: str, docs: List[Dict]) -> str:
-        """Format prompt with query and retrieved documents"""
-        # Implement prompt formatting
-        pass
-    
+        """
+        Format prompt with query and retrieved documents
+
+        Near-duplicate documents are dropped and the rest packed by score
+        into the packer's token budget, numbered labels included.
+        """
+        chunks = [
+            {"text": doc["document"].get("text", ""), "score": doc.get("score", 0.0)}
+            for doc in docs
+        ]
+        packed, stats = self.packer.pack(chunks, label=context_label)
+        logging.debug("Prompt packing stats: %s", stats)
+
+        context = "".join(context_label(i) + chunk["text"] for i, chunk in enumerate(packed, 1))
+        return PROMPT_TEMPLATE.format(context=context, query=query)
+
     def generate(self, prompt: str) -> str:
         """Generate response using LLM"""
-        # Implement generation
-        pass
\ No newline at end of file
+        if self.llm is None:
+            raise RuntimeError("No LLM configured for RAGChain")
+        return self.llm.generate(prompt)
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        """Generate response incrementally, falling back to one chunk if the LLM cannot stream"""
+        if self.llm is None:
+            raise RuntimeError("No LLM configured for RAGChain")
+        if hasattr(self.llm, "stream"):
+            yield from self.llm.stream(prompt)
+        else:
+            yield self.generate(prompt)
@@ -0,0 +1,128 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import re
+import time
+import zlib
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\S+")
+
+# Mersenne prime modulus for the MinHash universal hash family
+_PRIME = (1 << 61) - 1
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count as the number of whitespace-separated words"""
+    return len(_TOKEN_RE.findall(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text after its first max_tokens whitespace-separated words"""
+    if max_tokens <= 0:
+        return ""
+    for i, match in enumerate(_TOKEN_RE.finditer(text)):
+        if i == max_tokens - 1:
+            return text[:match.end()]
+    return text
+
+
+class PromptPacker:
+    """Select retrieved chunks for a prompt under a token budget
+
+    Chunks are taken in descending score order. A chunk whose estimated
+    Jaccard similarity to an already selected chunk reaches the dedup
+    threshold is dropped, which removes the near-identical boilerplate
+    common in legal templates. The last chunk that does not fit is
+    truncated so the budget is filled exactly, counting the label that
+    the prompt puts before each chunk.
+    """
+
+    def __init__(self, max_tokens: int = 2048, dedup_threshold: float = 0.8,
+                 shingle_size: int = 5, num_perm: int = 64,
+                 token_counter: Callable[[str], int] = count_tokens,
+                 truncate: Callable[[str, int], str] = truncate_tokens, seed: int = 1):
+        """
+        Initialize the packer
+
+        Args:
+            max_tokens: Token budget for the packed context
+            dedup_threshold: Estimated Jaccard similarity at which a chunk counts as a duplicate
+            shingle_size: Number of words per shingle
+            num_perm: Number of MinHash permutations
+            token_counter: Function counting tokens in a text
+            truncate: Function cutting a text to a number of tokens
+            seed: Random seed for the MinHash permutations
+        """
+        self.max_tokens = max_tokens
+        self.dedup_threshold = dedup_threshold
+        self.shingle_size = shingle_size
+        self.token_counter = token_counter
+        self.truncate = truncate
+        rng = np.random.default_rng(seed)
+        # Multipliers below 2**29 keep a * x + b under 2**64 for 32-bit shingle hashes
+        self._a = rng.integers(1, 1 << 29, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the word shingles of a text"""
+        words = text.lower().split()
+        n = max(len(words) - self.shingle_size + 1, 1)
+        shingles = np.fromiter(
+            (zlib.crc32(" ".join(words[i:i + self.shingle_size]).encode("utf-8")) for i in range(n)),
+            dtype=np.uint64,
+            count=n,
+        )
+        hashes = (np.outer(self._a, shingles) + self._b[:, None]) % _PRIME
+        return hashes.min(axis=1)
+
+    def pack(self, chunks: List[Dict], budget: Optional[int] = None,
+             label: Optional[Callable[[int], str]] = None) -> Tuple[List[Dict], Dict]:
+        """
+        Deduplicate, order and fit chunks into the token budget
+
+        Args:
+            chunks: Dictionaries with a "text" and an optional "score"
+            budget: Token budget, defaults to max_tokens
+            label: Text the prompt puts before the i-th packed chunk, counting from 1,
+                whose tokens are charged to the budget
+
+        Returns:
+            (selected chunks, stats): the chunks best first, with "text" possibly
+            truncated and "tokens" set to the tokens they take including their label,
+            and the counts and timing of this call
+        """
+        start = time.perf_counter()
+        budget = self.max_tokens if budget is None else budget
+        ordered = sorted(chunks, key=lambda c: c.get("score", 0.0), reverse=True)
+
+        packed, signatures = [], []
+        used = duplicates = 0
+        for chunk in ordered:
+            if used >= budget:
+                break
+            text = chunk.get("text") or ""
+            if not text.strip():
+                continue
+            sig = self.signature(text)
+            if any(np.mean(sig == other) >= self.dedup_threshold for other in signatures):
+                duplicates += 1
+                continue
+            label_tokens = self.token_counter(label(len(packed) + 1)) if label is not None else 0
+            tokens = self.token_counter(text)
+            if used + label_tokens + tokens > budget:
+                text = self.truncate(text, budget - used - label_tokens)
+                tokens = self.token_counter(text)
+                if not tokens:
+                    break
+            signatures.append(sig)
+            packed.append({**chunk, "text": text, "tokens": label_tokens + tokens})
+            used += label_tokens + tokens
+
+        stats = {
+            "chunks": len(chunks),
+            "packed": len(packed),
+            "duplicates": duplicates,
+            "tokens": used,
+            "budget": budget,
+            "elapsed_ms": (time.perf_counter() - start) * 1000.0,
+        }
+        return packed, stats
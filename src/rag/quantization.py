@@ -0,0 +1,282 @@
+from pathlib import Path
+from typing import Union
+import numpy as np
+
+# Rows compared per block when training and encoding, bounds the score matrix
+_BLOCK = 8192
+# Codes widened to float32 per block when scoring, small enough to stay in cache
+_SCAN_BLOCK = 512
+
+
+def _sample(vectors: np.ndarray, max_points: int, rng: np.random.Generator) -> np.ndarray:
+    """Up to max_points rows of vectors as float32, drawn without replacement"""
+    if len(vectors) > max_points:
+        vectors = vectors[np.sort(rng.choice(len(vectors), max_points, replace=False))]
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the closest centroid by Euclidean distance for each row, computed blockwise"""
+    # argmin ||x - c||^2 = argmax (x . c - ||c||^2 / 2)
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _BLOCK):
+        scores = vectors[start:start + _BLOCK] @ centroids.T
+        scores -= half_norms
+        assignment[start:start + _BLOCK] = np.argmax(scores, axis=1)
+    return assignment
+
+
+def _kmeans(vectors: np.ndarray, k: int, n_iter: int, rng: np.random.Generator) -> np.ndarray:
+    """Euclidean k-means centroids, empty clusters re-seeded from random points"""
+    centroids = vectors[rng.choice(len(vectors), k, replace=len(vectors) < k)].copy()
+    for _ in range(n_iter):
+        assignment = _nearest(vectors, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.stack(
+            [np.bincount(assignment, weights=vectors[:, d], minlength=k) for d in range(vectors.shape[1])],
+            axis=1,
+        )
+        empty = counts == 0
+        centroids = sums / np.maximum(counts, 1)[:, None]
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+    return centroids.astype(np.float32)
+
+
+class ScalarQuantizer:
+    """int8 scalar quantizer, 4x smaller than float32
+
+    Each dimension is mapped linearly from its trained [min, max] range onto
+    256 levels, so x ~= offset + scale * code. Inner products with a
+    full-precision query are computed from the codes directly (asymmetric
+    distance computation): q . x ~= q . offset + (q * scale) . code.
+    """
+
+    kind = "int8"
+    code_dtype = np.uint8
+    # Candidates re-scored per result by default, int8 codes rank close to float32
+    rerank_factor = 4
+
+    def __init__(self, max_train_points: int = 65536, seed: int = 0):
+        """
+        Initialize the quantizer
+
+        Args:
+            max_train_points: Upper bound on vectors sampled for training
+            seed: Random seed for sampling
+        """
+        self.max_train_points = max_train_points
+        self.seed = seed
+        self.offset = None
+        self.scale = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.scale is not None
+
+    @property
+    def code_size(self) -> int:
+        """Bytes per encoded vector"""
+        return len(self.scale)
+
+    def train(self, vectors: np.ndarray):
+        """
+        Fit the per-dimension ranges on a sample of vectors
+
+        Args:
+            vectors: (n, dim) matrix of embeddings
+        """
+        if len(vectors) == 0:
+            raise ValueError("Cannot train a quantizer on an empty set of vectors")
+        sample = _sample(vectors, self.max_train_points, np.random.default_rng(self.seed))
+        low, high = sample.min(axis=0), sample.max(axis=0)
+        self.offset = low
+        self.scale = np.maximum(high - low, 1e-12).astype(np.float32) / 255.0
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Encode vectors as (n, dim) uint8 codes, clipping values outside the trained range"""
+        codes = np.empty((len(vectors), self.code_size), dtype=np.uint8)
+        for start in range(0, len(vectors), _BLOCK):
+            block = (np.asarray(vectors[start:start + _BLOCK], dtype=np.float32) - self.offset) / self.scale
+            codes[start:start + _BLOCK] = np.clip(np.rint(block), 0, 255)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate float32 vectors of codes"""
+        return self.offset + codes.astype(np.float32) * self.scale
+
+    def inner_products(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """
+        Approximate inner products of a query with encoded vectors
+
+        Args:
+            query: Full-precision query vector
+            codes: (n, dim) codes from encode
+
+        Returns:
+            float32 array of n inner products
+        """
+        weights = (query * self.scale).astype(np.float32)
+        bias = np.float32(query @ self.offset)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), _SCAN_BLOCK):
+            out[start:start + _SCAN_BLOCK] = codes[start:start + _SCAN_BLOCK].astype(np.float32) @ weights
+        out += bias
+        return out
+
+    def save(self, path: Union[str, Path]):
+        """
+        Write the trained ranges to an .npz file, read back by load_quantizer
+
+        Args:
+            path: Target file or open binary file
+        """
+        np.savez(path, kind=self.kind, offset=self.offset, scale=self.scale)
+
+
+class ProductQuantizer:
+    """Product quantizer storing one byte per subvector
+
+    The embedding is split into n_subvectors contiguous slices, and each
+    slice is replaced by the index of its nearest centroid in a 256-entry
+    codebook learned by k-means for that slice. A 768-dim float32 vector
+    with 96 subvectors takes 96 bytes, 32x less.
+
+    Inner products use asymmetric distance computation: the query is kept
+    in full precision, its dot product with every centroid of every
+    codebook is tabulated once per query, and a vector's score is the sum
+    of n_subvectors table lookups.
+    """
+
+    kind = "pq"
+    code_dtype = np.uint8
+    n_centroids = 256
+    # Candidates re-scored per result by default. PQ rankings are much
+    # coarser than int8 ones, and the more dimensions per subvector the
+    # coarser: raising the factor (or n_subvectors) buys recall back at the
+    # cost of more full-precision rows read per search.
+    rerank_factor = 16
+
+    def __init__(self, n_subvectors: int = 96, n_iter: int = 10,
+                 max_train_points: int = 256 * 64, seed: int = 0):
+        """
+        Initialize the quantizer
+
+        Args:
+            n_subvectors: Number of slices, must divide the embedding dimension
+            n_iter: Number of k-means iterations per codebook
+            max_train_points: Upper bound on vectors sampled for training
+            seed: Random seed for sampling and centroid initialisation
+        """
+        self.n_subvectors = n_subvectors
+        self.n_iter = n_iter
+        self.max_train_points = max_train_points
+        self.seed = seed
+        self.codebooks = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.codebooks is not None
+
+    @property
+    def code_size(self) -> int:
+        """Bytes per encoded vector"""
+        return self.n_subvectors
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        """View of vectors as (n, n_subvectors, sub_dim)"""
+        return np.asarray(vectors, dtype=np.float32).reshape(len(vectors), self.n_subvectors, -1)
+
+    def train(self, vectors: np.ndarray):
+        """
+        Learn one codebook per subvector on a sample of vectors
+
+        Args:
+            vectors: (n, dim) matrix of embeddings, dim divisible by n_subvectors
+        """
+        if len(vectors) == 0:
+            raise ValueError("Cannot train a quantizer on an empty set of vectors")
+        dim = vectors.shape[1]
+        if dim % self.n_subvectors:
+            raise ValueError(f"Embedding dimension {dim} is not divisible by {self.n_subvectors} subvectors")
+        rng = np.random.default_rng(self.seed)
+        sample = self._split(_sample(vectors, self.max_train_points, rng))
+        self.codebooks = np.stack([
+            _kmeans(np.ascontiguousarray(sample[:, j]), self.n_centroids, self.n_iter, rng)
+            for j in range(self.n_subvectors)
+        ])
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Encode vectors as (n, n_subvectors) uint8 centroid indices"""
+        codes = np.empty((len(vectors), self.n_subvectors), dtype=np.uint8)
+        for start in range(0, len(vectors), _BLOCK):
+            block = self._split(vectors[start:start + _BLOCK])
+            for j in range(self.n_subvectors):
+                codes[start:start + _BLOCK, j] = _nearest(block[:, j], self.codebooks[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate float32 vectors of codes"""
+        parts = self.codebooks[np.arange(self.n_subvectors), codes]
+        return parts.reshape(len(codes), -1)
+
+    def inner_products(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """
+        Approximate inner products of a query with encoded vectors
+
+        Args:
+            query: Full-precision query vector
+            codes: (n, n_subvectors) codes from encode
+
+        Returns:
+            float32 array of n inner products
+        """
+        # (n_subvectors, 256) table of the query slice . centroid products
+        table = np.einsum("jcd,jd->jc", self.codebooks, self._split(query.reshape(1, -1))[0])
+        out = np.zeros(len(codes), dtype=np.float32)
+        # Blocked so each block's codes stay in cache across the per-subvector lookups
+        for start in range(0, len(codes), 8 * _SCAN_BLOCK):
+            block, acc = codes[start:start + 8 * _SCAN_BLOCK], out[start:start + 8 * _SCAN_BLOCK]
+            for j in range(self.n_subvectors):
+                acc += table[j].take(block[:, j])
+        return out
+
+    def save(self, path: Union[str, Path]):
+        """
+        Write the codebooks and parameters to an .npz file, read back by load_quantizer
+
+        Args:
+            path: Target file or open binary file
+        """
+        np.savez(
+            path, kind=self.kind, codebooks=self.codebooks,
+            params=np.array([self.n_subvectors, self.n_iter, self.max_train_points, self.seed]),
+        )
+
+
+Quantizer = Union[ScalarQuantizer, ProductQuantizer]
+
+
+def load_quantizer(path: Union[str, Path]) -> Quantizer:
+    """
+    Read a trained quantizer written by its save method
+
+    Args:
+        path: .npz file
+
+    Returns:
+        ScalarQuantizer or ProductQuantizer
+    """
+    with np.load(path) as data:
+        kind = str(data["kind"])
+        if kind == ScalarQuantizer.kind:
+            quantizer = ScalarQuantizer()
+            quantizer.offset, quantizer.scale = data["offset"], data["scale"]
+        elif kind == ProductQuantizer.kind:
+            n_subvectors, n_iter, max_train_points, seed = (int(v) for v in data["params"])
+            quantizer = ProductQuantizer(n_subvectors, n_iter, max_train_points, seed)
+            quantizer.codebooks = data["codebooks"]
+        else:
+            raise ValueError(f"Unknown quantizer kind: {kind}")
+    return quantizer
@@ -1,34 +1,243 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
+import numpy as np
 from src.rag.vector_store import VectorStore
+from src.utils.batching import MicroBatcher
+from src.utils.cache import LRUCache
+from src.utils.metrics import metrics
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query used as a cache key"""
+    return " ".join(query.casefold().split())
+
 
 class Retriever:
     """Document retriever for RAG pipeline"""
-    
-    def __init__(self, vector_store: VectorStore):
-        """Initialize the retriever"""
+
+    def __init__(self, vector_store: VectorStore, encoder=None):
+        """
+        Initialize the retriever
+
+        Args:
+            vector_store: Store holding the document embeddings
+            encoder: Embedding model exposing encode(texts) -> (n, dim) array,
+                e.g. a sentence-transformers model
+        """
         self.vector_store = vector_store
-        self.encoder = None  # Load your embedding model here
-    
+        self.encoder = encoder
+        self.embedding_cache = None
+        self.result_cache = None
+        self._cache_version = None
+        self._batcher = None
+        self.hybrid = None  # hybrid_search options when hybrid retrieval is enabled
+
     def retrieve(self, query: str, k: int = 5) -> List[Dict]:
         """
         Retrieve relevant documents for a query
-        
+
+        When caching is enabled, repeated queries are answered from the
+        result cache. When batching is enabled, the query joins other
+        retrieve calls that arrive within the batching window and is served
+        by retrieve_many. When hybrid retrieval is enabled, BM25 and vector
+        rankings are fused (see VectorStore.hybrid_search).
+
         Args:
             query: The input query text
             k: Number of documents to retrieve
-            
+
         Returns:
             List of relevant documents with similarity scores
         """
+        cached = self._cached_results(query, k)
+        if cached is not None:
+            return cached
+
+        if self._batcher is not None:
+            return self._batcher.submit((query, k)).result()
+
         # Encode query
         query_embedding = self.encode_query(query)
-        
+
         # Search vector store
-        results = self.vector_store.similarity_search(query_embedding, k=k)
-        
+        version = self.vector_store.version
+        results = self._search_many([query], query_embedding.reshape(1, -1), k)[0]
+
+        self._cache_results(query, k, results, version)
         return results
-    
-    def encode_query(self, query: str):
+
+    def retrieve_many(self, queries: List[str], k: int = 5) -> List[List[Dict]]:
+        """
+        Retrieve relevant documents for several queries at once
+
+        Queries are encoded in a single encoder call and searched with one
+        matrix-matrix similarity search.
+
+        Args:
+            queries: The input query texts
+            k: Number of documents to retrieve per query
+
+        Returns:
+            One list of relevant documents with similarity scores per query
+        """
+        if not queries:
+            return []
+        results = [self._cached_results(query, k) for query in queries]
+        missing = [i for i, cached in enumerate(results) if cached is None]
+        if missing:
+            missing_queries = [queries[i] for i in missing]
+            version = self.vector_store.version
+            found = self._search_many(missing_queries, self.encode_queries(missing_queries), k)
+            for i, docs in zip(missing, found):
+                self._cache_results(queries[i], k, docs, version)
+                results[i] = docs
+        return results
+
+    def _search_many(self, queries: List[str], query_embeddings: np.ndarray, k: int) -> List[List[Dict]]:
+        """Search the store for encoded queries, fusing in BM25 when hybrid retrieval is enabled"""
+        if self.hybrid is None:
+            return self.vector_store.similarity_search_batch(query_embeddings, k=k)
+        return [
+            self.vector_store.hybrid_search(query, embedding, k=k, **self.hybrid)
+            for query, embedding in zip(queries, query_embeddings)
+        ]
+
+    def enable_hybrid(self, candidates: int = 1000, rrf_k: int = 60, prefilter: bool = True):
+        """
+        Fuse BM25 and vector rankings in retrieve and retrieve_many
+
+        Builds the store's lexical index if it has none.
+
+        Args:
+            candidates: Depth of each ranking fed into reciprocal rank fusion
+            rrf_k: Rank offset damping the weight of top ranks
+            prefilter: Score only lexical (and approximate index) candidates against the query embedding
+        """
+        if self.vector_store.lexical_index is None:
+            self.vector_store.build_lexical_index()
+        self.hybrid = {"candidates": candidates, "rrf_k": rrf_k, "prefilter": prefilter}
+        if self.result_cache is not None:
+            self.result_cache.clear()
+
+    def disable_hybrid(self):
+        """Retrieve by vector similarity only"""
+        self.hybrid = None
+        if self.result_cache is not None:
+            self.result_cache.clear()
+
+    def encode_query(self, query: str) -> np.ndarray:
         """Encode query text to embedding vector"""
-        # Implement query encoding
-        pass
\ No newline at end of file
+        return self.encode_queries([query])[0]
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Encode several query texts to a (n, dim) embedding matrix
+
+        Queries missing from the embedding cache are encoded in one call.
+        """
+        if self.encoder is None:
+            raise RuntimeError("No query encoder configured for Retriever")
+        if self.embedding_cache is None:
+            embeddings = self.encoder.encode(list(queries))
+            return np.asarray(embeddings, dtype=np.float32).reshape(len(queries), -1)
+
+        keys = [normalize_query(query) for query in queries]
+        rows = [self.embedding_cache.get(key) for key in keys]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing:
+            encoded = self.encoder.encode([queries[i] for i in missing])
+            encoded = np.asarray(encoded, dtype=np.float32).reshape(len(missing), -1)
+            for i, row in zip(missing, encoded):
+                row = row.copy()
+                self.embedding_cache.put(keys[i], row)
+                rows[i] = row
+        return np.stack(rows)
+
+    def enable_cache(self, max_entries: int = 4096, max_bytes: Optional[int] = 64 * 1024 * 1024,
+                     ttl_seconds: Optional[float] = 3600.0):
+        """
+        Cache query embeddings and retrieval results
+
+        Embeddings are keyed on the normalized query text and results on the
+        normalized text and k. Results are dropped whenever the vector store
+        changes.
+
+        Args:
+            max_entries: Maximum number of entries per cache
+            max_bytes: Maximum estimated size of each cache in bytes
+            ttl_seconds: Lifetime of a cache entry
+        """
+        self.embedding_cache = LRUCache(max_entries, max_bytes, ttl_seconds)
+        self.result_cache = LRUCache(max_entries, max_bytes, ttl_seconds)
+        self._cache_version = self.vector_store.version
+        metrics.register_cache("retriever_embeddings", self.embedding_cache)
+        metrics.register_cache("retriever_results", self.result_cache)
+
+    def disable_cache(self):
+        """Stop caching and drop all cached entries"""
+        self.embedding_cache = None
+        self.result_cache = None
+        self._cache_version = None
+
+    def _cached_results(self, query: str, k: int) -> Optional[List[Dict]]:
+        """Cached results for a query, or None on a miss"""
+        if self.result_cache is None:
+            return None
+        if self._cache_version != self.vector_store.version:
+            self.result_cache.clear()
+            self._cache_version = self.vector_store.version
+        cached = self.result_cache.get((normalize_query(query), k))
+        if cached is None:
+            return None
+        # Hand out fresh dicts so callers cannot mutate the cached entry
+        return [dict(doc) for doc in cached]
+
+    def _cache_results(self, query: str, k: int, results: List[Dict], version: int):
+        """Cache results searched at a store version, unless the store or cache has moved on since"""
+        if self.result_cache is not None and self._cache_version == version == self.vector_store.version:
+            self.result_cache.put((normalize_query(query), k), [dict(doc) for doc in results])
+
+    def enable_batching(self, max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        """
+        Route retrieve calls through a micro-batching queue
+
+        Args:
+            max_batch_size: Largest number of queries searched together
+            max_wait_ms: Longest time a query waits for others to join its batch
+        """
+        self.disable_batching()
+        self._batcher = MicroBatcher(
+            self._retrieve_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            name="retriever-batcher",
+        )
+
+    def disable_batching(self):
+        """Stop the micro-batching queue and serve retrieve calls directly"""
+        batcher, self._batcher = self._batcher, None
+        if batcher is not None:
+            batcher.close()
+
+    def _retrieve_batch(self, requests: List[tuple]) -> List[List[Dict]]:
+        """
+        Serve queued (query, k) requests with one encoder call and one batched search per k
+
+        Requests are grouped by k rather than searched at the largest k and
+        truncated, since quantized reranking and the hybrid prefilter rank
+        differently at different depths, and each query must get the same
+        results as a direct retrieve.
+        """
+        queries = [query for query, _ in requests]
+        embeddings = self.encode_queries(queries)
+        groups: Dict[int, List[int]] = {}
+        for i, (_, k) in enumerate(requests):
+            groups.setdefault(k, []).append(i)
+
+        version = self.vector_store.version
+        results: List[Optional[List[Dict]]] = [None] * len(requests)
+        for k, indexes in groups.items():
+            found = self._search_many([queries[i] for i in indexes], embeddings[indexes], k)
+            for i, docs in zip(indexes, found):
+                self._cache_results(queries[i], k, docs, version)
+                results[i] = docs
+        return results
@@ -0,0 +1,295 @@
+from heapq import merge
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+import multiprocessing
+import threading
+import traceback
+import numpy as np
+
+from src.rag.ann_index import IVFIndex
+from src.rag.quantization import Quantizer
+from src.rag.vector_store import VectorStore
+
+_SHARD_DIR = "shard-{:03d}"
+# Store methods a shard worker answers
+_SEARCH_METHODS = {"similarity_search", "similarity_search_batch"}
+
+
+def _serve_shard(conn, path: str, n_lists: Optional[int]):
+    """
+    Worker process loop answering search requests against one shard
+
+    The shard is opened with VectorStore.load, so its embeddings stay
+    memory-mapped and shared through the page cache.
+    """
+    try:
+        store = VectorStore.load(path)
+        if n_lists:
+            store.build_index(IVFIndex(n_lists=n_lists))
+        conn.send(("ok", len(store)))
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+        return
+    while True:
+        try:
+            method, args = conn.recv()
+        except EOFError:
+            return
+        if method == "close":
+            return
+        try:
+            if method not in _SEARCH_METHODS:
+                raise ValueError(f"Unsupported shard method: {method}")
+            conn.send(("ok", getattr(store, method)(*args)))
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+
+
+def _merge_top_k(per_shard: List[List[Dict]], k: int) -> List[Dict]:
+    """Global top-k from per-shard results, each already sorted best first"""
+    return list(islice(merge(*per_shard, key=lambda r: r["score"], reverse=True), k))
+
+
+class _WorkerExited(RuntimeError):
+    """A shard worker's pipe closed, so the worker must be restarted before its next request"""
+
+
+class _Shard:
+    """One shard's worker process, its pipe and the lock serializing its requests"""
+
+    __slots__ = ("path", "process", "conn", "lock")
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.process = None
+        self.conn = None  # None once the worker is gone or its pipe is out of step
+        self.lock = threading.Lock()
+
+
+class ShardedVectorStore:
+    """Read-only vector store partitioned across local worker processes
+
+    Each shard is a directory written by VectorStore.save and served by its
+    own process, which memory-maps it. A search is sent to every shard
+    before any reply is awaited, so the shards score their partitions in
+    parallel on separate cores, and the per-shard top-k lists are merged
+    with a heap. Each shard takes one request at a time, but a caller
+    releases a shard as soon as it has replied, so concurrent searches
+    from several threads pipeline through the shards. A worker that dies
+    fails the searches in flight with RuntimeError and is restarted on the
+    next search.
+
+    Exposes similarity_search, similarity_search_batch and version, so it
+    can back a Retriever.
+    """
+
+    def __init__(self, path: Union[str, Path], n_lists: Optional[int] = None, start_method: str = "spawn"):
+        """
+        Initialize the store, without starting its workers
+
+        Args:
+            path: Directory holding the shard-NNN subdirectories
+            n_lists: Train an IVF index with this many cells in every shard on start
+            start_method: multiprocessing start method for the workers
+        """
+        self.path = Path(path)
+        self.shard_paths = sorted(p for p in self.path.glob("shard-*") if p.is_dir())
+        if not self.shard_paths:
+            raise FileNotFoundError(f"No vector store shards in {self.path}")
+        self.n_lists = n_lists
+        # The shards are read-only, so cached results never go stale
+        self.version = 0
+        self._context = multiprocessing.get_context(start_method)
+        self._shards = []
+        self._sizes = []
+
+    @classmethod
+    def create(cls, path: Union[str, Path], documents: List[Dict], embeddings: np.ndarray, n_shards: int,
+               make_quantizer: Optional[Callable[[], Quantizer]] = None, **kwargs) -> "ShardedVectorStore":
+        """
+        Partition documents into contiguous shards and save them under path
+
+        Args:
+            path: Target directory
+            documents: Document dictionaries
+            embeddings: (n, embedding_dim) matrix
+            n_shards: Number of shards, typically the number of cores
+            make_quantizer: Optional factory of a quantizer trained per shard
+            **kwargs: Passed to the constructor
+
+        Returns:
+            Store over the new shards, not yet started
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(documents) != len(embeddings):
+            raise ValueError(f"Got {len(documents)} documents but {len(embeddings)} embeddings")
+        bounds = np.linspace(0, len(documents), n_shards + 1).astype(int)
+        for shard, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+            store = VectorStore(embedding_dim=embeddings.shape[1], initial_capacity=hi - lo)
+            store.add_documents(documents[lo:hi], embeddings[lo:hi])
+            if make_quantizer is not None and hi > lo:
+                store.quantize(make_quantizer())
+            store.save(Path(path) / _SHARD_DIR.format(shard))
+        return cls(path, **kwargs)
+
+    def __len__(self) -> int:
+        return sum(self._sizes)
+
+    def __enter__(self) -> "ShardedVectorStore":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self):
+        """Start one worker per shard and wait until every shard is loaded"""
+        if self._shards:
+            return
+        self._shards = [_Shard(shard_path) for shard_path in self.shard_paths]
+        try:
+            # Every worker is started before any is awaited, so the shards load in parallel
+            for shard in self._shards:
+                self._spawn(shard)
+            self._sizes = [self._receive(shard) for shard in self._shards]
+        except Exception:
+            self.close()
+            raise
+
+    def _spawn(self, shard: _Shard):
+        """Start the worker process of a shard, without waiting for it to load"""
+        conn, worker_conn = self._context.Pipe()
+        shard.process = self._context.Process(
+            target=_serve_shard, args=(worker_conn, str(shard.path), self.n_lists),
+            name=f"vector-shard-{shard.path.name}", daemon=True,
+        )
+        shard.process.start()
+        worker_conn.close()
+        shard.conn = conn
+
+    def _restart(self, index: int):
+        """Replace a dead or out-of-step shard worker, called with the shard's lock held"""
+        shard = self._shards[index]
+        self._stop(shard, timeout=0)
+        self._spawn(shard)
+        self._sizes[index] = self._receive(shard)
+
+    @staticmethod
+    def _stop(shard: _Shard, timeout: float = 5):
+        """Ask a shard worker to exit, terminating it if it does not within timeout seconds"""
+        if shard.conn is not None:
+            try:
+                shard.conn.send(("close", ()))
+            except OSError:
+                pass
+            shard.conn.close()
+            shard.conn = None
+        if shard.process is not None:
+            shard.process.join(timeout=timeout)
+            if shard.process.is_alive():
+                shard.process.terminate()
+                shard.process.join()
+            shard.process = None
+
+    def close(self):
+        """Stop the workers"""
+        for shard in self._shards:
+            with shard.lock:
+                self._stop(shard)
+        self._shards = []
+        self._sizes = []
+
+    @staticmethod
+    def _discard(shard: _Shard):
+        """Drop a shard's pipe after a failure, so its worker is restarted on next use"""
+        if shard.conn is not None:
+            shard.conn.close()
+            shard.conn = None
+
+    @classmethod
+    def _receive(cls, shard: _Shard):
+        """Read a worker reply, raising its error in this process"""
+        try:
+            status, payload = shard.conn.recv()
+        except (EOFError, OSError) as e:
+            cls._discard(shard)
+            raise _WorkerExited(f"Vector store shard worker for {shard.path.name} exited") from e
+        if status == "error":
+            raise RuntimeError(f"Vector store shard failed:\n{payload}")
+        return payload
+
+    def _fan_out(self, method: str, *args) -> List:
+        """Send a request to every shard, then collect the replies in shard order"""
+        if not self._shards:
+            raise RuntimeError("ShardedVectorStore is not started, call start() or use it as a context manager")
+        held, sent = [], []
+        replies, error = [], None
+        try:
+            # Locks are taken in shard order, so concurrent callers cannot deadlock
+            for index, shard in enumerate(self._shards):
+                shard.lock.acquire()
+                held.append(shard)
+                try:
+                    if shard.conn is None or not shard.process.is_alive():
+                        self._restart(index)
+                    shard.conn.send((method, args))
+                except (OSError, RuntimeError) as e:
+                    self._discard(shard)
+                    error = RuntimeError(f"Vector store shard {shard.path.name} is unavailable: {e}")
+                    break
+                sent.append(shard)
+
+            # Replies are read even after a failure, so no pipe is left with an unread reply.
+            # Each shard is released once it has replied, so the next caller's request can go out.
+            for shard in sent:
+                try:
+                    replies.append(self._receive(shard))
+                except RuntimeError as e:
+                    error = error or e
+                held.remove(shard)
+                shard.lock.release()
+        finally:
+            # A caller interrupted mid-collection leaves replies unread, which would reach the next caller
+            for shard in held:
+                if shard in sent:
+                    self._discard(shard)
+                shard.lock.release()
+        if error is not None:
+            raise error
+        return replies
+
+    def similarity_search(self, query_embedding: np.ndarray, k: int = 5,
+                          nprobe: Optional[int] = None, exact: bool = False) -> List[Dict]:
+        """
+        Find the most similar documents across all shards
+
+        Args:
+            query_embedding: Query vector
+            k: Number of results to return
+            nprobe: Cells scanned by the shards' approximate indexes
+            exact: Force a brute-force search in every shard
+
+        Returns:
+            List of similar documents with scores, best first
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        return _merge_top_k(self._fan_out("similarity_search", query, k, nprobe, exact), k)
+
+    def similarity_search_batch(self, query_embeddings: np.ndarray, k: int = 5,
+                                nprobe: Optional[int] = None, exact: bool = False) -> List[List[Dict]]:
+        """
+        Find the most similar documents for several queries in one round trip per shard
+
+        Args:
+            query_embeddings: (n_queries, embedding_dim) matrix of query vectors
+            k: Number of results to return per query
+            nprobe: Cells scanned by the shards' approximate indexes
+            exact: Force a brute-force search in every shard
+
+        Returns:
+            One list of similar documents with scores per query
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        per_shard = self._fan_out("similarity_search_batch", queries, k, nprobe, exact)
+        return [_merge_top_k(list(results), k) for results in zip(*per_shard)]
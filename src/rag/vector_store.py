@@ -1,36 +1,992 @@
-from typing import List, Dict
+from pathlib import Path
+from typing import BinaryIO, List, Dict, Iterable, NamedTuple, Optional, Sequence, Tuple, Union
+import json
+import os
+import tempfile
+import threading
 import numpy as np
 
+from src.rag.ann_index import IVFIndex
+from src.rag.bm25_index import BM25Index
+from src.rag.quantization import Quantizer, load_quantizer
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores along the last axis, best first
+
+    Args:
+        scores: 1-D or 2-D array of scores
+        k: Number of indices to keep
+
+    Returns:
+        Array of indices with the same leading shape as scores
+    """
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.intp)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape).copy()
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+# Corpus rows scored per block in batched search, bounds the score matrix
+_SEARCH_BLOCK = 65536
+
+# On-disk layout written by VectorStore.save
+FORMAT_VERSION = 1
+_META_FILE = "meta.json"
+_EMBEDDINGS_FILE = "embeddings.f32"
+_NORMS_FILE = "norms.f32"
+_DOCUMENTS_FILE = "documents.jsonl"
+_OFFSETS_FILE = "offsets.i64"
+_CODES_FILE = "codes.u8"
+_QUANTIZER_FILE = "quantizer.npz"
+
+
+def _open_memmap(path: Path, dtype, shape) -> np.ndarray:
+    """Read-only memory map of a raw array file, tolerating empty arrays"""
+    if int(np.prod(shape)) == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+def _write_atomic(path: Path, write):
+    """Write a file through a temporary sibling and rename it into place"""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _write_rows(f: BinaryIO, array: np.ndarray, rows: np.ndarray):
+    """Write the given rows of an array block by block, so a memory-mapped one is never read whole"""
+    for start in range(0, len(rows), _SEARCH_BLOCK):
+        f.write(np.ascontiguousarray(array[rows[start:start + _SEARCH_BLOCK]]).tobytes())
+
+
+def _map_rows(f: BinaryIO, capacity: int, dim: int) -> np.memmap:
+    """
+    Map a float32 row file read-write, growing it to capacity rows
+
+    The file only ever grows, so maps of its earlier size stay valid for
+    searches still holding them.
+    """
+    return np.memmap(f, dtype=np.float32, mode="r+", shape=(capacity, dim))
+
+
+def _spill_rows(matrix: np.ndarray, capacity: int, directory: Optional[Path],
+                keep: Optional[np.ndarray] = None) -> Tuple[BinaryIO, np.memmap]:
+    """
+    Copy a matrix's rows, or only the kept ones, into a new row file of capacity rows
+
+    Rows are copied one block at a time, so the matrix is never held in
+    memory whole. The file is anonymous: it is removed once the file object
+    and every map of it are gone.
+
+    Returns:
+        (open file, read-write map of it)
+    """
+    f = tempfile.TemporaryFile(dir=directory)
+    for start in range(0, len(matrix), _SEARCH_BLOCK):
+        block = matrix[start:start + _SEARCH_BLOCK]
+        if keep is not None:
+            block = block[keep[start:start + _SEARCH_BLOCK]]
+        f.write(np.ascontiguousarray(block).tobytes())
+    f.flush()
+    return f, _map_rows(f, capacity, matrix.shape[1])
+
+
+class DocumentTable(Sequence):
+    """Lazily decoded documents backed by a memory-mapped JSON-lines file
+
+    Documents are only parsed when indexed, so opening a store does not
+    deserialize its metadata. Documents appended after loading are kept in
+    memory.
+    """
+
+    def __init__(self, data: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+        self._data = data
+        self._starts = starts
+        self._ends = ends
+        self._appended = []
+
+    def __len__(self) -> int:
+        return len(self._starts) + len(self._appended)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        n = len(self._starts)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("document index out of range")
+        if i >= n:
+            return self._appended[i - n]
+        return json.loads(self._data[self._starts[i]:self._ends[i]].tobytes())
+
+    def extend(self, documents: List[Dict]):
+        self._appended.extend(documents)
+
+    def take(self, rows: np.ndarray) -> "DocumentTable":
+        """Table of the given rows, in ascending order, still backed by the same file"""
+        n = len(self._starts)
+        rows = np.asarray(rows)
+        stored = rows[rows < n]
+        table = DocumentTable(self._data, self._starts[stored], self._ends[stored])
+        table._appended = [self._appended[i - n] for i in rows[rows >= n]]
+        return table
+
+
+def _take_documents(documents: Sequence, rows: np.ndarray) -> Sequence:
+    """The documents at the given rows, without decoding memory-mapped ones"""
+    if isinstance(documents, DocumentTable):
+        return documents.take(rows)
+    return [documents[i] for i in rows]
+
+
+class _State(NamedTuple):
+    """Row-aligned contents of a store
+
+    Writers build a new state and publish it with a single assignment, so a
+    search that reads the state once sees matching arrays, codes, documents,
+    tombstones and indexes even while rows are added or compacted away.
+    """
+    size: int
+    matrix: np.ndarray
+    norms: np.ndarray
+    deleted: np.ndarray
+    deleted_count: int
+    documents: Sequence
+    index: Optional[IVFIndex]
+    lexical_index: Optional[BM25Index]
+    codes: Optional[np.ndarray] = None
+    quantizer: Optional[Quantizer] = None
+    # Private file the matrix maps, grown in place by appends; None for an
+    # in-memory matrix or the read-only map of a saved store
+    matrix_file: Optional[BinaryIO] = None
+
+    def is_live(self, rows: np.ndarray) -> np.ndarray:
+        """Mask of the rows that exist in this state and are not deleted"""
+        live = rows < self.size
+        if self.deleted_count:
+            live[live] = ~self.deleted[rows[live]]
+        return live
+
+    def live_rows(self, rows: np.ndarray) -> np.ndarray:
+        return rows[self.is_live(rows)]
+
+
 class VectorStore:
     """Vector store for document embeddings"""
-    
-    def __init__(self, embedding_dim: int = 768):
-        """Initialize the vector store"""
+
+    def __init__(self, embedding_dim: int = 768, initial_capacity: int = 1024,
+                 index: Optional[IVFIndex] = None, lexical_index: Optional[BM25Index] = None,
+                 id_key: str = "id", compaction_threshold: Optional[float] = 0.2,
+                 quantizer: Optional[Quantizer] = None, rerank_factor: Optional[int] = None,
+                 spill_dir: Optional[Union[str, Path]] = None):
+        """
+        Initialize the vector store
+
+        Embeddings live in a single preallocated float32 matrix that grows
+        geometrically, with their L2 norms precomputed alongside. Deleted
+        and replaced documents are only marked in a tombstone mask, which
+        searches skip, until compaction rewrites the matrix without them.
+
+        Once quantized, approximate search scans compact codes instead of
+        the matrix and re-scores only the best rerank_factor * k candidates
+        with their full-precision embeddings. Those move to a file in
+        spill_dir that grows as rows are appended, so only the codes and
+        norms stay in memory and only the re-ranked rows are read from disk.
+        A loaded store's matrix likewise stays on disk when written to.
+
+        Each quantizer has its own default rerank_factor: int8 codes rank
+        almost like float32 and need few candidates, PQ codes are 4-8x
+        smaller again but need many more. A larger factor trades search
+        latency, in full-precision rows read, for recall.
+
+        Args:
+            embedding_dim: Dimension of the document embeddings
+            initial_capacity: Number of rows to preallocate
+            index: Optional approximate index, trained by build_index
+            lexical_index: Optional BM25 index over the documents' text, filled by add_documents
+            id_key: Document field identifying documents for upsert and delete
+            compaction_threshold: Fraction of deleted rows that starts a background
+                compaction, None to only compact on explicit compact calls
+            quantizer: Optional ScalarQuantizer or ProductQuantizer, trained by quantize
+            rerank_factor: Candidates re-scored at full precision per requested result,
+                None for the quantizer's default
+            spill_dir: Directory of the embedding file of quantized stores, defaults
+                to the system temporary directory
+        """
         self.embedding_dim = embedding_dim
-        self.documents = []
-        self.embeddings = []
-    
+        self.id_key = id_key
+        self.compaction_threshold = compaction_threshold
+        self.rerank_factor = rerank_factor
+        self.spill_dir = spill_dir
+        # Bumped on every change that can alter search results
+        self.version = 0
+        capacity = max(initial_capacity, 1)
+        self._state = _State(
+            size=0,
+            matrix=np.empty((capacity, embedding_dim), dtype=np.float32),
+            norms=np.empty(capacity, dtype=np.float32),
+            deleted=np.zeros(capacity, dtype=bool),
+            deleted_count=0,
+            documents=[],
+            index=index,
+            lexical_index=lexical_index,
+            quantizer=quantizer,
+        )
+        # Live row of each document id, None until first needed after load
+        self._id_rows: Optional[Dict] = {}
+        self._write_lock = threading.Lock()
+        self._compaction_lock = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        """Number of live documents"""
+        return self._state.size - self._state.deleted_count
+
+    @property
+    def documents(self) -> Sequence:
+        """Documents by row, including deleted ones until compaction"""
+        return self._state.documents
+
+    @property
+    def index(self) -> Optional[IVFIndex]:
+        return self._state.index
+
+    @index.setter
+    def index(self, index: Optional[IVFIndex]):
+        with self._write_lock:
+            self._publish(self._state._replace(index=index))
+
+    @property
+    def lexical_index(self) -> Optional[BM25Index]:
+        return self._state.lexical_index
+
+    @lexical_index.setter
+    def lexical_index(self, index: Optional[BM25Index]):
+        with self._write_lock:
+            self._publish(self._state._replace(lexical_index=index))
+
+    @property
+    def quantizer(self) -> Optional[Quantizer]:
+        return self._state.quantizer
+
+    @property
+    def codes(self) -> Optional[np.ndarray]:
+        """View of the quantized embeddings, None until quantize is called"""
+        state = self._state
+        return None if state.codes is None else state.codes[:state.size]
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """View of the stored embeddings, one row per document, including deleted ones until compaction"""
+        state = self._state
+        return state.matrix[:state.size]
+
+    @property
+    def norms(self) -> np.ndarray:
+        """View of the precomputed embedding norms"""
+        state = self._state
+        return state.norms[:state.size]
+
+    @property
+    def deleted_fraction(self) -> float:
+        """Fraction of stored rows that are tombstoned"""
+        state = self._state
+        return state.deleted_count / state.size if state.size else 0.0
+
+    def _publish(self, state: _State):
+        """Make a new state visible to searches"""
+        self._state = state
+        self.version += 1
+
+    def _reserve(self, state: _State, capacity: int) -> _State:
+        """
+        State whose backing arrays hold at least capacity rows, copying them if they must grow
+
+        A matrix on disk grows on disk: its file is extended in place, or,
+        for the read-only map of a saved store, first copied to a private
+        file in spill_dir.
+        """
+        if capacity <= state.matrix.shape[0]:
+            return state
+        new_capacity = max(capacity, 2 * state.matrix.shape[0])
+        matrix_file = state.matrix_file
+        if matrix_file is not None:
+            matrix = _map_rows(matrix_file, new_capacity, self.embedding_dim)
+        elif isinstance(state.matrix, np.memmap):
+            matrix_file, matrix = _spill_rows(state.matrix[:state.size], new_capacity, self.spill_dir)
+        else:
+            matrix = np.empty((new_capacity, self.embedding_dim), dtype=np.float32)
+            matrix[:state.size] = state.matrix[:state.size]
+        norms = np.empty(new_capacity, dtype=np.float32)
+        deleted = np.zeros(new_capacity, dtype=bool)
+        norms[:state.size] = state.norms[:state.size]
+        deleted[:state.size] = state.deleted[:state.size]
+        codes = state.codes
+        if codes is not None:
+            codes = np.empty((new_capacity, codes.shape[1]), dtype=codes.dtype)
+            codes[:state.size] = state.codes[:state.size]
+        return state._replace(matrix=matrix, norms=norms, deleted=deleted, codes=codes, matrix_file=matrix_file)
+
+    def _as_matrix(self, embeddings) -> np.ndarray:
+        """Coerce embeddings to a (n, embedding_dim) float32 matrix"""
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        if matrix.ndim != 2 or matrix.shape[1] != self.embedding_dim:
+            raise ValueError(
+                f"Expected embeddings of dimension {self.embedding_dim}, got shape {matrix.shape}"
+            )
+        return matrix
+
+    def _document_ids(self, documents: List[Dict], required: bool) -> List:
+        """Ids of a batch of documents, checked for duplicates"""
+        ids = [doc.get(self.id_key) for doc in documents]
+        if required and any(doc_id is None for doc_id in ids):
+            raise ValueError(f"Every upserted document needs an '{self.id_key}' field")
+        present = [doc_id for doc_id in ids if doc_id is not None]
+        if len(set(present)) != len(present):
+            raise ValueError(f"Duplicate '{self.id_key}' values in one batch")
+        return ids
+
+    def _id_rows_locked(self) -> Dict:
+        """Live row of each document id, indexing the stored documents on first use"""
+        if self._id_rows is None:
+            state = self._state
+            self._id_rows = {}
+            for row in range(state.size):
+                if not state.deleted[row]:
+                    doc_id = state.documents[row].get(self.id_key)
+                    if doc_id is not None:
+                        self._id_rows[doc_id] = row
+        return self._id_rows
+
+    def _append(self, state: _State, documents: List[Dict], matrix: np.ndarray) -> _State:
+        """Write rows past the end of a state and index them, returning the state that includes them"""
+        start, end = state.size, state.size + matrix.shape[0]
+        state = self._reserve(state, end)
+        state.matrix[start:end] = matrix
+        state.norms[start:end] = np.linalg.norm(matrix, axis=1)
+        if state.codes is not None:
+            state.codes[start:end] = state.quantizer.encode(matrix)
+        state.documents.extend(documents)
+        if state.index is not None and state.index.is_trained:
+            state.index.add(matrix, start)
+        if state.lexical_index is not None:
+            key = state.lexical_index.text_key
+            state.lexical_index.add([doc.get(key, "") for doc in documents], start)
+        return state._replace(size=end)
+
+    @staticmethod
+    def _tombstone(state: _State, rows) -> _State:
+        """State with the given live rows marked deleted
+
+        The mask is copied rather than updated in place, so searches holding
+        the previous state are unaffected. The copy is one byte per stored
+        row (about 1 MB, tens of microseconds, for a million rows) on every
+        upsert or delete call, so callers applying many changes should pass
+        them as one batch rather than one document per call.
+        """
+        deleted = state.deleted.copy()
+        deleted[rows] = True
+        return state._replace(deleted=deleted, deleted_count=state.deleted_count + len(rows))
+
     def add_documents(self, documents: List[Dict[str, str]], embeddings: List[np.ndarray]):
         """
         Add documents and their embeddings to the store
-        
+
         Args:
             documents: List of document dictionaries with metadata
-            embeddings: List of document embeddings
+            embeddings: List of document embeddings, or a (n, embedding_dim) matrix
         """
-        self.documents.extend(documents)
-        self.embeddings.extend(embeddings)
-    
-    def similarity_search(self, query_embedding: np.ndarray, k: int = 5) -> List[Dict]:
+        if len(documents) == 0:
+            return
+        matrix = self._as_matrix(embeddings)
+        if matrix.shape[0] != len(documents):
+            raise ValueError(
+                f"Got {len(documents)} documents but {matrix.shape[0]} embeddings"
+            )
+        ids = self._document_ids(documents, required=False)
+
+        with self._write_lock:
+            state = self._state
+            if any(doc_id is not None for doc_id in ids):
+                id_rows = self._id_rows_locked()
+                existing = [doc_id for doc_id in ids if doc_id in id_rows]
+                if existing:
+                    raise ValueError(f"Documents already stored, use upsert to replace them: {existing[:5]}")
+            state = self._append(state, documents, matrix)
+            # Ids are mapped only once their rows are written, so a failed append leaves no dangling ids
+            if any(doc_id is not None for doc_id in ids):
+                for row, doc_id in enumerate(ids, state.size - len(ids)):
+                    if doc_id is not None:
+                        id_rows[doc_id] = row
+            self._publish(state)
+
+    def upsert(self, documents: List[Dict], embeddings: List[np.ndarray]):
+        """
+        Add documents, replacing the stored ones with the same ids
+
+        Replacements are appended and the old rows tombstoned in the same
+        step, so a search sees either the old or the new version.
+
+        Args:
+            documents: Documents with an id_key field
+            embeddings: List of document embeddings, or a (n, embedding_dim) matrix
+        """
+        if len(documents) == 0:
+            return
+        matrix = self._as_matrix(embeddings)
+        if matrix.shape[0] != len(documents):
+            raise ValueError(
+                f"Got {len(documents)} documents but {matrix.shape[0]} embeddings"
+            )
+        ids = self._document_ids(documents, required=True)
+
+        with self._write_lock:
+            id_rows = self._id_rows_locked()
+            replaced = [id_rows[doc_id] for doc_id in ids if doc_id in id_rows]
+            state = self._append(self._state, documents, matrix)
+            if replaced:
+                state = self._tombstone(state, replaced)
+            for row, doc_id in enumerate(ids, state.size - len(ids)):
+                id_rows[doc_id] = row
+            self._publish(state)
+            self._maybe_compact()
+
+    def delete(self, ids: Iterable) -> int:
+        """
+        Delete documents by id
+
+        Rows are tombstoned immediately and reclaimed by compaction.
+
+        Args:
+            ids: Ids of the documents to delete, unknown ids are ignored
+
+        Returns:
+            Number of documents deleted
+        """
+        with self._write_lock:
+            id_rows = self._id_rows_locked()
+            rows = [id_rows.pop(doc_id) for doc_id in set(ids) if doc_id in id_rows]
+            if rows:
+                self._publish(self._tombstone(self._state, rows))
+                self._maybe_compact()
+        return len(rows)
+
+    def _maybe_compact(self):
+        """Start a background compaction once the deleted fraction reaches the threshold"""
+        state = self._state
+        if self.compaction_threshold is None or state.deleted_count == 0:
+            return
+        if state.deleted_count < self.compaction_threshold * state.size:
+            return
+        if self._compaction is None or not self._compaction.is_alive():
+            self._compaction = threading.Thread(target=self.compact, name="vector-store-compaction", daemon=True)
+            self._compaction.start()
+
+    def wait_for_compaction(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a running background compaction
+
+        Returns:
+            True if no compaction is running anymore
+        """
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.join(timeout)
+            return not compaction.is_alive()
+        return True
+
+    def compact(self) -> int:
+        """
+        Rewrite the store without its deleted rows
+
+        Live rows are copied into new arrays and the indexes renumbered
+        without taking any lock, so searches and writes carry on meanwhile.
+        Writes made during the copy are then replayed onto the copy under
+        the write lock, and the result is published in one assignment.
+
+        Returns:
+            Number of rows dropped
+        """
+        with self._compaction_lock:
+            base = self._state
+            if base.deleted_count == 0:
+                return 0
+            keep = ~base.deleted[:base.size]
+            n_live = int(keep.sum())
+            capacity = max(n_live + n_live // 4, 1)
+            if isinstance(base.matrix, np.memmap):
+                matrix_file, matrix = _spill_rows(base.matrix[:base.size], capacity, self.spill_dir, keep)
+            else:
+                matrix_file, matrix = None, np.empty((capacity, self.embedding_dim), dtype=np.float32)
+                np.compress(keep, base.matrix[:base.size], axis=0, out=matrix[:n_live])
+            norms = np.empty(capacity, dtype=np.float32)
+            np.compress(keep, base.norms[:base.size], out=norms[:n_live])
+            documents = _take_documents(base.documents, np.flatnonzero(keep))
+            index = self._compacted_index(base.index, keep)
+            lexical_index = base.lexical_index.compacted(keep) if base.lexical_index is not None else None
+
+            with self._write_lock:
+                current = self._state
+                # Indexes rebuilt during the copy replace the ones compacted above
+                if current.index is not base.index:
+                    index = self._compacted_index(current.index, keep)
+                if current.lexical_index is not base.lexical_index:
+                    lexical_index = current.lexical_index.compacted(keep) if current.lexical_index is not None else None
+                # Codes are a fraction of the matrix size, so they are copied here rather than reconciled
+                codes = None
+                if current.codes is not None:
+                    codes = np.empty((capacity, current.codes.shape[1]), dtype=current.codes.dtype)
+                    np.compress(keep, current.codes[:base.size], axis=0, out=codes[:n_live])
+                    # Quantized during the copy, the copy moves to disk as quantize does
+                    if not isinstance(matrix, np.memmap):
+                        matrix_file, matrix = _spill_rows(matrix[:n_live], capacity, self.spill_dir)
+                state = _State(
+                    size=n_live, matrix=matrix, norms=norms, deleted=np.zeros(capacity, dtype=bool),
+                    deleted_count=0, documents=documents, index=index, lexical_index=lexical_index,
+                    codes=codes, quantizer=current.quantizer, matrix_file=matrix_file,
+                )
+
+                # Replay rows added and deleted since the copy started
+                if current.size > base.size:
+                    state = self._append(
+                        state,
+                        current.documents[base.size:current.size],
+                        current.matrix[base.size:current.size],
+                    )
+                new_ids = np.cumsum(keep) - 1
+                dead = np.concatenate([
+                    new_ids[np.flatnonzero(current.deleted[:base.size] & keep)],
+                    n_live + np.flatnonzero(current.deleted[base.size:current.size]),
+                ])
+                if len(dead):
+                    state = self._tombstone(state, dead)
+                if self._id_rows is not None:
+                    self._id_rows = {
+                        doc_id: int(new_ids[row]) if row < base.size else n_live + row - base.size
+                        for doc_id, row in self._id_rows.items()
+                    }
+                # Maps hold their own descriptor, so searches on the old state are unaffected
+                if current.matrix_file is not None and current.matrix_file is not matrix_file:
+                    current.matrix_file.close()
+                self._publish(state)
+            return base.size - n_live
+
+    @staticmethod
+    def _compacted_index(index: Optional[IVFIndex], keep: np.ndarray) -> Optional[IVFIndex]:
+        if index is None or not index.is_trained:
+            return index
+        return index.compacted(keep)
+
+    def build_lexical_index(self, index: Optional[BM25Index] = None) -> BM25Index:
+        """
+        Index the text of every stored document for lexical search
+
+        Documents added afterwards are indexed as they arrive.
+
+        Args:
+            index: Empty index to fill, defaults to a new BM25Index
+
+        Returns:
+            The filled index
+        """
+        index = BM25Index() if index is None else index
+        with self._write_lock:
+            state = self._state
+            index.add([state.documents[i].get(index.text_key, "") for i in range(state.size)], 0)
+            self._publish(state._replace(lexical_index=index))
+        return index
+
+    def build_index(self, index: Optional[IVFIndex] = None) -> IVFIndex:
+        """
+        Train an approximate index on the current embeddings
+
+        Documents added afterwards are inserted into the index as they arrive.
+
+        Args:
+            index: Index to train, defaults to the configured one or a new IVFIndex
+
+        Returns:
+            The trained index
+        """
+        with self._write_lock:
+            state = self._state
+            if index is None:
+                index = state.index if state.index is not None else IVFIndex()
+            embeddings = state.matrix[:state.size]
+            index.train(embeddings)
+            index.add(embeddings, 0)
+            self._publish(state._replace(index=index))
+        return index
+
+    def quantize(self, quantizer: Optional[Quantizer] = None) -> Quantizer:
+        """
+        Train a quantizer on the live embeddings and encode every row
+
+        Approximate searches then score the codes instead of the float32
+        matrix, and documents added afterwards are encoded as they arrive.
+        An in-memory matrix is moved to a file in spill_dir, leaving only
+        the codes and norms in memory.
+
+        Args:
+            quantizer: ScalarQuantizer or ProductQuantizer to train, defaults to the configured one
+
+        Returns:
+            The trained quantizer
+        """
+        with self._write_lock:
+            state = self._state
+            quantizer = quantizer if quantizer is not None else state.quantizer
+            if quantizer is None:
+                raise ValueError("No quantizer given or configured")
+            embeddings = state.matrix[:state.size]
+            quantizer.train(embeddings[~state.deleted[:state.size]] if state.deleted_count else embeddings)
+            codes = np.empty((state.matrix.shape[0], quantizer.code_size), dtype=quantizer.code_dtype)
+            codes[:state.size] = quantizer.encode(embeddings)
+            matrix_file, matrix = state.matrix_file, state.matrix
+            if not isinstance(matrix, np.memmap):
+                matrix_file, matrix = _spill_rows(embeddings, matrix.shape[0], self.spill_dir)
+            self._publish(state._replace(matrix=matrix, matrix_file=matrix_file, codes=codes, quantizer=quantizer))
+        return quantizer
+
+    @staticmethod
+    def _cosine_scores(state: _State, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of a query against all rows, or only the given ones
+
+        When all rows are scored, deleted ones score -inf.
+        """
+        matrix = state.matrix[:state.size] if rows is None else state.matrix[rows]
+        norms = state.norms[:state.size] if rows is None else state.norms[rows]
+        denom = norms * np.float32(np.linalg.norm(query))
+        scores = matrix @ query
+        np.divide(scores, denom, out=scores, where=denom > 0)
+        scores[denom <= 0] = 0.0
+        if rows is None and state.deleted_count:
+            scores[state.deleted[:state.size]] = -np.inf
+        return scores
+
+    @staticmethod
+    def _quantized_scores(state: _State, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate cosine similarity from the codes, with the same conventions as _cosine_scores"""
+        codes = state.codes[:state.size] if rows is None else state.codes[rows]
+        norms = state.norms[:state.size] if rows is None else state.norms[rows]
+        denom = norms * np.float32(np.linalg.norm(query))
+        scores = state.quantizer.inner_products(query, codes)
+        np.divide(scores, denom, out=scores, where=denom > 0)
+        scores[denom <= 0] = 0.0
+        if rows is None and state.deleted_count:
+            scores[state.deleted[:state.size]] = -np.inf
+        return scores
+
+    def _vector_top_k(self, state: _State, query: np.ndarray, k: int,
+                      rows: Optional[np.ndarray] = None, exact: bool = False):
+        """
+        Rows most similar to a query, best first, among all live rows or only the given ones
+
+        With quantized codes, unless exact is set, the codes are scored
+        first and the best rerank_factor * k rows are re-scored from the
+        full-precision embeddings.
+
+        Returns:
+            (row ids, cosine scores)
+        """
+        if not exact and state.codes is not None:
+            factor = self.rerank_factor if self.rerank_factor is not None else state.quantizer.rerank_factor
+            approx = self._quantized_scores(state, query, rows)
+            top = _top_k(approx, k * factor)
+            top = top[approx[top] > -np.inf]
+            rows = top if rows is None else rows[top]
+            # Ascending row order reads the memory-mapped matrix sequentially
+            rows = np.sort(rows)
+        scores = self._cosine_scores(state, query, rows)
+        top = _top_k(scores, k)
+        top = top[scores[top] > -np.inf]
+        return (top if rows is None else rows[top]), scores[top]
+
+    def similarity_search(self, query_embedding: np.ndarray, k: int = 5,
+                          nprobe: Optional[int] = None, exact: bool = False) -> List[Dict]:
         """
         Find most similar documents to a query
-        
+
+        Uses the approximate index when one has been built and the
+        quantized codes when the store is quantized, unless exact is set.
+        Otherwise every stored embedding is scored in one matrix-vector
+        product.
+
         Args:
             query_embedding: Query vector
             k: Number of results to return
-            
+            nprobe: Cells scanned by the approximate index, trades recall for latency
+            exact: Force a brute-force search over the whole store
+
         Returns:
             List of similar documents with scores
         """
-        # Implement similarity search (e.g., cosine similarity)
-        return []  # List[{document, score}]
\ No newline at end of file
+        state = self._state
+        if state.size == state.deleted_count or k <= 0:
+            return []
+        query = self._as_matrix(query_embedding)[0]
+
+        rows = None
+        if not exact and state.index is not None and state.index.is_trained:
+            rows = state.live_rows(state.index.candidates(query, nprobe=nprobe))
+        ids, scores = self._vector_top_k(state, query, k, rows, exact=exact)
+        return [
+            {"document": state.documents[i], "score": float(score)}
+            for i, score in zip(ids, scores)
+        ]
+
+    @staticmethod
+    def _require_lexical_index(state: _State) -> BM25Index:
+        if state.lexical_index is None:
+            raise RuntimeError("No lexical index, pass one to VectorStore or call build_lexical_index")
+        return state.lexical_index
+
+    def _lexical_scores(self, state: _State, query: str):
+        """BM25 row ids and scores of the live documents matching a query"""
+        ids, scores = self._require_lexical_index(state).scores(query)
+        live = state.is_live(ids)
+        return ids[live], scores[live]
+
+    def lexical_search(self, query: str, k: int = 5) -> List[Dict]:
+        """
+        Find the documents best matching a query's terms by BM25
+
+        Args:
+            query: Query text
+            k: Number of results to return
+
+        Returns:
+            List of matching documents with BM25 scores
+        """
+        state = self._state
+        ids, scores = self._lexical_scores(state, query)
+        top = _top_k(scores, k)
+        return [
+            {"document": state.documents[i], "score": float(score)}
+            for i, score in zip(ids[top], scores[top])
+        ]
+
+    def hybrid_search(self, query: str, query_embedding: np.ndarray, k: int = 5,
+                      candidates: int = 1000, rrf_k: int = 60, prefilter: bool = True,
+                      nprobe: Optional[int] = None) -> List[Dict]:
+        """
+        Find documents by fusing BM25 and cosine rankings with reciprocal rank fusion
+
+        Each document scores the sum of 1 / (rrf_k + rank) over the two
+        rankings it appears in, each truncated to the top candidates.
+
+        With prefilter, only the lexical candidates are scored exactly
+        against the query embedding, together with the approximate index's
+        candidates when one is built so documents without shared terms can
+        still be found. When fewer than k documents match lexically, every
+        document is scored instead.
+
+        Args:
+            query: Query text
+            query_embedding: Query vector
+            k: Number of results to return
+            candidates: Depth of each ranking fed into the fusion
+            rrf_k: Rank offset damping the weight of top ranks
+            prefilter: Score only lexical and index candidates against the embedding
+            nprobe: Cells scanned by the approximate index
+
+        Returns:
+            List of documents with fused scores, best first
+        """
+        state = self._state
+        if state.size == state.deleted_count or k <= 0:
+            return []
+        lexical_ids, lexical_scores = self._lexical_scores(state, query)
+        lexical_ids = lexical_ids[_top_k(lexical_scores, candidates)]
+        query_vector = self._as_matrix(query_embedding)[0]
+
+        rows = None
+        trained = state.index is not None and state.index.is_trained
+        if prefilter and len(lexical_ids) >= k:
+            rows = lexical_ids
+            if trained:
+                rows = np.union1d(rows, state.live_rows(state.index.candidates(query_vector, nprobe=nprobe)))
+        elif trained:
+            rows = state.live_rows(state.index.candidates(query_vector, nprobe=nprobe))
+        vector_ids, _ = self._vector_top_k(state, query_vector, candidates, rows)
+
+        ranked = np.concatenate([lexical_ids, vector_ids])
+        ranks = np.concatenate([np.arange(len(lexical_ids)), np.arange(len(vector_ids))])
+        ids, inverse = np.unique(ranked, return_inverse=True)
+        fused = np.bincount(inverse, weights=1.0 / (rrf_k + 1.0 + ranks))
+        best = _top_k(fused, k)
+        return [
+            {"document": state.documents[i], "score": float(fused[j])}
+            for i, j in zip(ids[best], best)
+        ]
+
+    def similarity_search_batch(self, query_embeddings: np.ndarray, k: int = 5,
+                                nprobe: Optional[int] = None, exact: bool = False) -> List[List[Dict]]:
+        """
+        Find the most similar documents for several queries at once
+
+        Exact search scores all queries against the store with one
+        matrix-matrix product per block of rows, keeping a running top-k.
+        With an approximate index or quantized codes each query is searched
+        on its own.
+
+        Args:
+            query_embeddings: (n_queries, embedding_dim) matrix of query vectors
+            k: Number of results to return per query
+            nprobe: Cells scanned by the approximate index, trades recall for latency
+            exact: Force a brute-force search over the whole store
+
+        Returns:
+            One list of similar documents with scores per query
+        """
+        queries = self._as_matrix(query_embeddings)
+        state = self._state
+        if state.size == state.deleted_count or k <= 0:
+            return [[] for _ in range(len(queries))]
+        approximate = (state.index is not None and state.index.is_trained) or state.codes is not None
+        if not exact and approximate:
+            return [self.similarity_search(q, k=k, nprobe=nprobe) for q in queries]
+
+        query_norms = np.linalg.norm(queries, axis=1)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_ids = np.empty((len(queries), 0), dtype=np.intp)
+        for start in range(0, state.size, _SEARCH_BLOCK):
+            end = min(start + _SEARCH_BLOCK, state.size)
+            denom = np.outer(query_norms, state.norms[start:end])
+            scores = queries @ state.matrix[start:end].T
+            np.divide(scores, denom, out=scores, where=denom > 0)
+            scores[denom <= 0] = 0.0
+            if state.deleted_count:
+                scores[:, state.deleted[start:end]] = -np.inf
+
+            top = _top_k(scores, k)
+            merged_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            merged_ids = np.concatenate([best_ids, top + start], axis=1)
+            keep = _top_k(merged_scores, k)
+            best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+            best_ids = np.take_along_axis(merged_ids, keep, axis=1)
+
+        return [
+            [
+                {"document": state.documents[i], "score": float(score)}
+                for i, score in zip(ids, row_scores) if score > -np.inf
+            ]
+            for ids, row_scores in zip(best_ids, best_scores)
+        ]
+
+    def save(self, path: Union[str, Path]):
+        """
+        Persist the store to a directory
+
+        Embeddings and norms are written as raw row-major float32 files, and
+        documents as JSON lines with an int64 byte-offset sidecar, so that
+        load can memory-map everything instead of deserializing it. Deleted
+        rows are left out. A quantized store also writes its codes and
+        trained quantizer, so loading it needs no retraining.
+
+        Args:
+            path: Target directory, created if missing
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        state = self._state
+        rows = np.flatnonzero(~state.deleted[:state.size]) if state.deleted_count else np.arange(state.size)
+        _write_atomic(path / _EMBEDDINGS_FILE, lambda f: _write_rows(f, state.matrix, rows))
+        _write_atomic(path / _NORMS_FILE, lambda f: _write_rows(f, state.norms, rows))
+
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+
+        def write_documents(f):
+            for n, i in enumerate(rows):
+                line = json.dumps(state.documents[i], ensure_ascii=False).encode("utf-8") + b"\n"
+                f.write(line)
+                offsets[n + 1] = offsets[n] + len(line)
+
+        _write_atomic(path / _DOCUMENTS_FILE, write_documents)
+        _write_atomic(path / _OFFSETS_FILE, lambda f: f.write(offsets.tobytes()))
+
+        if state.codes is not None:
+            _write_atomic(path / _CODES_FILE, lambda f: _write_rows(f, state.codes, rows))
+            _write_atomic(path / _QUANTIZER_FILE, state.quantizer.save)
+
+        # Written last: a directory without meta.json is an incomplete save
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "embedding_dim": self.embedding_dim,
+            "count": len(rows),
+        }
+        if state.codes is not None:
+            meta["quantizer"] = {"kind": state.quantizer.kind, "code_size": state.quantizer.code_size}
+        _write_atomic(path / _META_FILE, lambda f: f.write(json.dumps(meta).encode("utf-8")))
+
+    @classmethod
+    def load(cls, path: Union[str, Path], index: Optional[IVFIndex] = None,
+             lexical_index: Optional[BM25Index] = None, rerank_factor: Optional[int] = None,
+             spill_dir: Optional[Union[str, Path]] = None) -> "VectorStore":
+        """
+        Open a store written by save
+
+        Arrays are memory-mapped read-only, so workers on one host share the
+        same page-cache pages and opening is independent of corpus size.
+        The first write copies the embeddings to a private file in spill_dir
+        and grows that, never reading them into process memory, and the
+        first upsert or delete decodes the documents to find their ids.
+        Quantized stores search their codes and only page in the embeddings
+        of re-ranked rows.
+
+        Args:
+            path: Directory written by save
+            index: Optional approximate index, trained by build_index
+            lexical_index: Optional empty BM25 index, filled from the stored documents
+            rerank_factor: Candidates re-scored at full precision per requested result,
+                None for the quantizer's default
+            spill_dir: Directory of the embedding file written to, defaults to path
+
+        Returns:
+            VectorStore backed by the files in path
+        """
+        path = Path(path)
+        meta_file = path / _META_FILE
+        if not meta_file.exists():
+            raise FileNotFoundError(f"Vector store metadata not found: {meta_file}")
+        with open(meta_file, "r") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector store format: {meta.get('format_version')}")
+
+        count, dim = meta["count"], meta["embedding_dim"]
+        store = cls(embedding_dim=dim, initial_capacity=1, index=index, rerank_factor=rerank_factor,
+                    spill_dir=path if spill_dir is None else spill_dir)
+        offsets = _open_memmap(path / _OFFSETS_FILE, np.int64, (count + 1,))
+        data = _open_memmap(path / _DOCUMENTS_FILE, np.uint8, (int(offsets[-1]),))
+        store._state = store._state._replace(
+            size=count,
+            matrix=_open_memmap(path / _EMBEDDINGS_FILE, np.float32, (count, dim)),
+            norms=_open_memmap(path / _NORMS_FILE, np.float32, (count,)),
+            deleted=np.zeros(count, dtype=bool),
+            documents=DocumentTable(data, offsets[:-1], offsets[1:]),
+        )
+        if "quantizer" in meta:
+            store._state = store._state._replace(
+                codes=_open_memmap(path / _CODES_FILE, np.uint8, (count, meta["quantizer"]["code_size"])),
+                quantizer=load_quantizer(path / _QUANTIZER_FILE),
+            )
+        # Built from the documents on the first id-keyed write
+        store._id_rows = None
+        if lexical_index is not None:
+            store.build_lexical_index(lexical_index)
+        return store
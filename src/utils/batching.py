@@ -0,0 +1,128 @@
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+import logging
+import queue
+import threading
+import time
+
+
+class MicroBatcher:
+    """Collect concurrently submitted items into batches for a batch function
+
+    Callers submit single items and get a Future back. A background thread
+    gathers items until max_batch_size is reached or max_wait_ms has passed
+    since the first item of the batch arrived, calls process_batch once on
+    the whole batch, and resolves each Future with its own result.
+
+    By default every item counts as 1 towards max_batch_size; item_size
+    lets items carry a weight instead, e.g. the number of rows they hold.
+    An item that would push a batch past max_batch_size starts the next
+    batch instead, so only an item larger than the limit on its own makes
+    a batch exceed it.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 32, max_wait_ms: float = 2.0,
+                 name: str = "micro-batcher",
+                 item_size: Optional[Callable[[Any], int]] = None):
+        """
+        Initialize the batcher and start its worker thread
+
+        Args:
+            process_batch: Function mapping a list of items to a list of results of the same length
+            max_batch_size: Largest total size of the items passed to process_batch at once
+            max_wait_ms: Longest time the first item of a batch waits for company
+            name: Name of the worker thread
+            item_size: Size of an item towards max_batch_size, 1 per item if None
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.item_size = item_size or (lambda item: 1)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        # Entry that did not fit in the previous batch, owned by the worker thread
+        self._carry = None
+        self._closed = False
+        # Orders submits against close, so nothing is queued behind the sentinel
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._worker, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """
+        Queue an item for the next batch
+
+        Args:
+            item: Input for process_batch
+
+        Returns:
+            Future resolved with the item's result
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((item, future))
+        return future
+
+    def close(self, timeout: Optional[float] = None):
+        """Stop accepting items and wait for queued batches to finish"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _collect(self) -> List:
+        """Block for the first item, then gather more until the batch is full or the wait expires"""
+        first, self._carry = self._carry, None
+        if first is None:
+            first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        size = self.item_size(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                # Re-queue the sentinel so the worker exits after this batch
+                self._queue.put(None)
+                break
+            entry_size = self.item_size(entry[0])
+            if size + entry_size > self.max_batch_size:
+                self._carry = entry
+                break
+            batch.append(entry)
+            size += entry_size
+        return batch
+
+    def _worker(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                results = self.process_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"Batch function returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as e:
+                logging.exception("Error while processing batch")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
@@ -1,34 +1,132 @@
-from typing import List
+from typing import Iterable, Iterator, List, Tuple, Union, TextIO
 import re
 
 class ClauseSplitter:
     """Split legal documents into clauses"""
-    
-    def __init__(self):
-        """Initialize the splitter"""
+
+    def __init__(self, chunk_size: int = 1 << 16):
+        """
+        Initialize the splitter
+
+        Args:
+            chunk_size: Characters read at a time when iter_split is given a file
+        """
         self.patterns = [
             r"^\d+\.\s+",  # Numbered clauses
             r"^[A-Z]\.\s+",  # Letter clauses
             r"^Article \d+",  # Articles
             r"^Section \d+",  # Sections
         ]
-    
+        # All headers in one alternation so a document is scanned once
+        self.header_re = re.compile("|".join(f"(?:{p})" for p in self.patterns), re.MULTILINE)
+        self.chunk_size = chunk_size
+
     def split(self, text: str) -> List[str]:
         """
         Split document into clauses
-        
+
         Args:
             text: Document text content
-            
+
         Returns:
             List of clause texts
         """
-        # Implement clause splitting logic
-        clauses = []
-        # Add your implementation here
-        return clauses
-    
+        return [text[start:end] for start, end in self.spans(text)]
+
+    def spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Locate clauses without copying them
+
+        Each clause runs from one header to the next, with surrounding
+        whitespace excluded. Text before the first header is returned as a
+        leading clause when it is not blank.
+
+        Args:
+            text: Document text content
+
+        Returns:
+            List of (start, end) offsets into text
+        """
+        spans = []
+        start = 0
+        for match in self.header_re.finditer(text):
+            self._append_span(spans, text, start, match.start(), 0)
+            start = match.start()
+        self._append_span(spans, text, start, len(text), 0)
+        return spans
+
+    def iter_split(self, source: Union[Iterable[str], TextIO]) -> Iterator[Tuple[int, int, str]]:
+        """
+        Split a document read incrementally from a stream
+
+        Only complete lines are scanned for headers; the trailing partial
+        line is carried over to the next chunk. Text is dropped as soon as
+        the clause containing it has been yielded, so memory is bounded by
+        the longest clause rather than the document.
+
+        Args:
+            source: File object opened in text mode, or an iterable of text chunks
+
+        Yields:
+            (start, end, clause_text) with offsets into the full document,
+            identical to spans on the concatenated text
+        """
+        buffer = ""
+        offset = 0  # Document offset of buffer[0]
+        clause_start = 0  # Buffer index where the open clause begins
+        scan_from = 0  # Buffer index where the next header scan starts
+        spans = []
+
+        for chunk in self._chunks(source):
+            buffer += chunk
+            complete = buffer.rfind("\n", scan_from) + 1
+            if complete == 0:
+                continue
+            for match in self.header_re.finditer(buffer, scan_from, complete):
+                self._append_span(spans, buffer, clause_start, match.start(), offset)
+                clause_start = match.start()
+            scan_from = complete
+
+            for start, end in spans:
+                yield start, end, buffer[start - offset:end - offset]
+            spans.clear()
+
+            # Drop text belonging to clauses already yielded
+            if clause_start > 0:
+                buffer = buffer[clause_start:]
+                offset += clause_start
+                scan_from -= clause_start
+                clause_start = 0
+
+        for match in self.header_re.finditer(buffer, scan_from):
+            self._append_span(spans, buffer, clause_start, match.start(), offset)
+            clause_start = match.start()
+        self._append_span(spans, buffer, clause_start, len(buffer), offset)
+        for start, end in spans:
+            yield start, end, buffer[start - offset:end - offset]
+
+    def _chunks(self, source: Union[Iterable[str], TextIO]) -> Iterator[str]:
+        """Text chunks from a file object or an iterable of strings"""
+        if hasattr(source, "read"):
+            while True:
+                chunk = source.read(self.chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        else:
+            yield from source
+
+    @staticmethod
+    def _append_span(spans: List[Tuple[int, int]], text: str, start: int, end: int, offset: int):
+        """Append text[start:end] trimmed of surrounding whitespace, shifted by offset, unless blank"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start + offset, end + offset))
+
     def clean_clause(self, clause: str) -> str:
         """Clean and normalize clause text"""
         # Implement clause cleaning
-        return clause.strip()
\ No newline at end of file
+        return clause.strip()
@@ -1,46 +1,184 @@
-from typing import Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import os
 import re
 
+
+def _extract_pdf_range(file_path: str, start: int, end: int) -> List[str]:
+    """Extract the text of pages [start, end) of a PDF, run in worker processes"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
 class DocumentParser:
     """Parser for legal documents"""
-    
-    def __init__(self):
-        """Initialize the parser"""
-        pass
-    
+
+    def __init__(self, paragraphs_per_page: int = 50):
+        """
+        Initialize the parser
+
+        Args:
+            paragraphs_per_page: DOCX paragraphs grouped into one page when the
+                document has no explicit page breaks
+        """
+        self.paragraphs_per_page = paragraphs_per_page
+
     def parse_pdf(self, file_path: str) -> str:
         """
         Parse PDF document to text
-        
+
         Args:
             file_path: Path to PDF file
-            
+
         Returns:
             Extracted text content
         """
-        # Implement PDF parsing
-        pass
-    
+        return "\n".join(self.iter_pdf_pages(file_path))
+
     def parse_docx(self, file_path: str) -> str:
         """
         Parse DOCX document to text
-        
+
         Args:
             file_path: Path to DOCX file
-            
+
         Returns:
             Extracted text content
         """
-        # Implement DOCX parsing
-        pass
-    
+        return "\n".join(self.iter_docx_pages(file_path))
+
+    def iter_pages(self, file_path: str, workers: Optional[int] = None) -> Iterator[str]:
+        """
+        Yield the text of a document page by page, dispatching on file type
+
+        Args:
+            file_path: Path to a PDF, DOCX or plain-text file
+            workers: Parse PDFs with this many processes when greater than 1
+
+        Yields:
+            Text of each page in document order
+        """
+        suffix = Path(file_path).suffix.lower()
+        if suffix == ".pdf":
+            if workers is not None and workers > 1:
+                return self.iter_pdf_pages_parallel(file_path, workers=workers)
+            return self.iter_pdf_pages(file_path)
+        if suffix == ".docx":
+            return self.iter_docx_pages(file_path)
+        if suffix in (".txt", ".md"):
+            return self._iter_text_pages(file_path)
+        raise ValueError(f"Unsupported document type: {suffix}")
+
+    def iter_pdf_pages(self, file_path: str) -> Iterator[str]:
+        """
+        Yield the text of a PDF one page at a time
+
+        Pages are extracted lazily, so downstream processing of early pages
+        starts before later pages are read.
+
+        Args:
+            file_path: Path to PDF file
+
+        Yields:
+            Text of each page
+        """
+        from pypdf import PdfReader
+
+        reader = PdfReader(file_path)
+        for page in reader.pages:
+            yield page.extract_text() or ""
+
+    def iter_pdf_pages_parallel(self, file_path: str, workers: Optional[int] = None,
+                                pages_per_task: int = 8) -> Iterator[str]:
+        """
+        Yield the text of a PDF page by page, extracting page ranges in parallel
+
+        Ranges are parsed by a process pool and yielded in document order.
+        At most two ranges per worker are in flight, so memory stays bounded
+        by pages in flight rather than by file size.
+
+        Args:
+            file_path: Path to PDF file
+            workers: Number of worker processes, defaults to the CPU count
+            pages_per_task: Pages extracted by one worker call
+
+        Yields:
+            Text of each page
+        """
+        from pypdf import PdfReader
+
+        page_count = len(PdfReader(file_path).pages)
+        workers = workers or os.cpu_count() or 1
+        ranges = [(s, min(s + pages_per_task, page_count)) for s in range(0, page_count, pages_per_task)]
+        if workers <= 1 or len(ranges) <= 1:
+            yield from self.iter_pdf_pages(file_path)
+            return
+
+        remaining = iter(ranges)
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+            pending = deque(
+                pool.submit(_extract_pdf_range, str(file_path), start, end)
+                for start, end in islice(remaining, 2 * workers)
+            )
+            while pending:
+                pages = pending.popleft().result()
+                # Keep the pool busy while the caller consumes this range
+                for start, end in islice(remaining, 1):
+                    pending.append(pool.submit(_extract_pdf_range, str(file_path), start, end))
+                yield from pages
+
+    def iter_docx_pages(self, file_path: str) -> Iterator[str]:
+        """
+        Yield the text of a DOCX document page by page
+
+        DOCX has no fixed layout, so pages are delimited by explicit page
+        breaks, or by every paragraphs_per_page paragraphs if there are none.
+
+        Args:
+            file_path: Path to DOCX file
+
+        Yields:
+            Text of each page
+        """
+        from docx import Document
+
+        document = Document(file_path)
+        page = []
+        for paragraph in document.paragraphs:
+            breaks = paragraph._element.xpath('.//w:br[@w:type="page"]')
+            page.append(paragraph.text)
+            if breaks or len(page) >= self.paragraphs_per_page:
+                yield "\n".join(page)
+                page = []
+        if page:
+            yield "\n".join(page)
+
+    def _iter_text_pages(self, file_path: str) -> Iterator[str]:
+        """Yield a plain-text file split on form feeds"""
+        page = []
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                while "\f" in line:
+                    head, line = line.split("\f", 1)
+                    page.append(head)
+                    yield "".join(page)
+                    page = []
+                page.append(line)
+        if page:
+            yield "".join(page)
+
     def extract_metadata(self, text: str) -> Dict:
         """
         Extract document metadata
-        
+
         Args:
             text: Document text content
-            
+
         Returns:
             Dictionary of metadata fields
         """
@@ -49,4 +187,4 @@ class DocumentParser:
             "title": "",
             "date": "",
             "parties": []
-        }
\ No newline at end of file
+        }
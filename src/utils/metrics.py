@@ -0,0 +1,269 @@
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+import threading
+import time
+import weakref
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name: str, labels: Tuple) -> List[str]:
+        return [f"{name}{_format_labels(labels)} {_format_value(self.value)}"]
+
+
+class Gauge:
+    """Value that can go up and down, e.g. requests in flight"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self, name: str, labels: Tuple) -> List[str]:
+        return [f"{name}{_format_labels(labels)} {_format_value(self.value)}"]
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets
+
+    Observing is a bisect and two additions under a lock, so it is cheap
+    enough for every request. Quantiles are left to the scraper.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot counts values above every bound
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self, name: str, labels: Tuple) -> List[str]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            bucket_labels = labels + (("le", _format_value(float(bound))),)
+            lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class _Span:
+    """Context manager observing its wall time into a histogram"""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _InFlight(_Span):
+    """Span that also counts the requests currently inside it"""
+
+    __slots__ = ("gauge",)
+
+    def __init__(self, histogram: Histogram, gauge: Gauge):
+        super().__init__(histogram)
+        self.gauge = gauge
+
+    def __enter__(self):
+        self.gauge.inc()
+        return super().__enter__()
+
+    def __exit__(self, *exc):
+        super().__exit__(*exc)
+        self.gauge.dec()
+
+
+class MetricsRegistry:
+    """Named counters, gauges and histograms rendered in the Prometheus text format
+
+    Metrics are created on first use and identified by name and labels.
+    Registered caches are read when rendering, so they cost nothing on
+    the request path.
+    """
+
+    def __init__(self, namespace: str = "legalease"):
+        """
+        Initialize an empty registry
+
+        Args:
+            namespace: Prefix of every metric name
+        """
+        self.namespace = namespace
+        self._families = {}  # name -> (type, help, {labels: metric})
+        self._spans = {}  # stage -> Histogram, avoids rebuilding labels on the hot path
+        self._caches = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def _metric(self, kind: str, cls, name: str, help: str, labels: Dict[str, str], **kwargs):
+        name = f"{self.namespace}_{name}"
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = (kind, help, {})
+            elif family[0] != kind:
+                raise ValueError(f"Metric {name} is already registered as a {family[0]}")
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = cls(**kwargs)
+        return metric
+
+    def counter(self, name: str, help: str = "", **labels) -> Counter:
+        """Counter with the given name and labels, created if needed"""
+        return self._metric("counter", Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str = "", **labels) -> Gauge:
+        """Gauge with the given name and labels, created if needed"""
+        return self._metric("gauge", Gauge, name, help, labels)
+
+    def histogram(self, name: str, help: str = "",
+                  buckets: Optional[Tuple[float, ...]] = None, **labels) -> Histogram:
+        """Histogram with the given name and labels, created if needed"""
+        return self._metric("histogram", Histogram, name, help, labels,
+                            buckets=buckets or DEFAULT_BUCKETS)
+
+    def span(self, stage: str) -> _Span:
+        """
+        Time a processing stage
+
+        Usage:
+            with metrics.span("predict.classify"):
+                ...
+
+        Args:
+            stage: Stage name, recorded as the stage label of stage_seconds
+
+        Returns:
+            Context manager observing the elapsed time on exit
+        """
+        histogram = self._spans.get(stage)
+        if histogram is None:
+            histogram = self._spans[stage] = self.histogram(
+                "stage_seconds", "Time spent in each processing stage", stage=stage
+            )
+        return _Span(histogram)
+
+    def in_flight(self, endpoint: str) -> _InFlight:
+        """
+        Track a request to an endpoint
+
+        Counts it in requests_in_flight while inside the block and records
+        its duration in request_seconds.
+        """
+        return _InFlight(
+            self.histogram("request_seconds", "Request latency by endpoint", endpoint=endpoint),
+            self.gauge("requests_in_flight", "Requests currently being served", endpoint=endpoint),
+        )
+
+    def record_model_load(self, model: str, seconds: float):
+        """Record how long loading a model took"""
+        self.gauge("model_load_seconds", "Duration of the last load of each model", model=model).set(seconds)
+        self.counter("model_loads_total", "Number of model loads", model=model).inc()
+
+    def register_cache(self, name: str, cache):
+        """
+        Report an LRUCache's statistics under the given cache label
+
+        The cache is held weakly; a later cache registered under the same
+        name replaces it.
+        """
+        self._caches[name] = cache
+
+    def _cache_samples(self) -> List[str]:
+        caches = sorted(self._caches.items())
+        if not caches:
+            return []
+        lines = []
+        families = [
+            ("cache_hits_total", "counter", "Cache lookups that found an entry", "hits"),
+            ("cache_misses_total", "counter", "Cache lookups that found nothing", "misses"),
+            ("cache_evictions_total", "counter", "Entries evicted to respect the cache bounds", "evictions"),
+            ("cache_hit_ratio", "gauge", "Hits over lookups since the cache was created", "hit_ratio"),
+            ("cache_entries", "gauge", "Entries currently cached", "entries"),
+            ("cache_size_bytes", "gauge", "Estimated size of the cached values", "size_bytes"),
+        ]
+        stats = {name: cache.stats() for name, cache in caches}
+        for metric, kind, help, field in families:
+            name = f"{self.namespace}_{metric}"
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for cache_name, values in stats.items():
+                lines.append(f"{name}{_format_labels([('cache', cache_name)])} {_format_value(values[field])}")
+        return lines
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            families = [(name, kind, help, dict(metrics)) for name, (kind, help, metrics) in self._families.items()]
+        lines = []
+        for name, kind, help, metrics in sorted(families):
+            if help:
+                lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in sorted(metrics.items()):
+                lines.extend(metric.samples(name, labels))
+        lines.extend(self._cache_samples())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by the API, pipelines and RAG components
+metrics = MetricsRegistry()
@@ -0,0 +1,295 @@
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import asyncio
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})"
+
+
+def collapse_stack(frame) -> str:
+    """Stack of a frame as 'outer;...;inner', the folded format read by flame graph tools"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class ProfileStore:
+    """Bounded ring of profiles on disk
+
+    Each profile is one JSON file named after its id. Ids start with the
+    capture time, so the oldest files sort first and are deleted once
+    more than max_profiles are stored.
+    """
+
+    def __init__(self, directory, max_profiles: int = 50):
+        """
+        Initialize the store, creating its directory
+
+        Args:
+            directory: Directory holding the profile files
+            max_profiles: Number of most recent profiles kept
+        """
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _files(self) -> List[Path]:
+        return sorted(self.directory.glob("*.json"))
+
+    def save(self, profile: Dict) -> str:
+        """
+        Write a profile and drop the oldest ones beyond max_profiles
+
+        Args:
+            profile: Profile with an "id" key
+
+        Returns:
+            Id of the profile
+        """
+        path = self.directory / f"{profile['id']}.json"
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(profile, f)
+        os.replace(tmp, path)
+        with self._lock:
+            files = self._files()
+            for old in files[:max(len(files) - self.max_profiles, 0)]:
+                old.unlink(missing_ok=True)
+        return profile["id"]
+
+    def list(self) -> List[Dict]:
+        """Metadata of the stored profiles, newest first"""
+        summaries = []
+        for path in reversed(self._files()):
+            profile = self.get(path.stem)
+            if profile is not None:
+                summaries.append({key: value for key, value in profile.items() if key != "stacks"})
+        return summaries
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        """Stored profile, or None if it does not exist or was rotated out"""
+        path = self.directory / f"{Path(profile_id).name}.json"
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+
+class ProfileSession:
+    """Stack sampler for a single request
+
+    While the session is open, a background thread samples the stacks of
+    the threads doing the request's work every interval seconds. Work runs
+    on worker threads, so callables and iterators are wrapped with wrap()
+    and iterate() to mark their thread as belonging to the request while
+    they execute. Unlike cProfile, sampling sees every thread of the
+    request and does not slow the profiled code down. Coroutines use
+    "async with", which joins the sampler and writes the profile on a
+    worker thread instead of blocking the event loop.
+    """
+
+    def __init__(self, store: ProfileStore, endpoint: str, reason: str, interval: float = 0.005):
+        """
+        Args:
+            store: Store receiving the profile when the session closes
+            endpoint: Endpoint being profiled
+            reason: Why the request was profiled, "header" or "sampled"
+            interval: Seconds between samples
+        """
+        self.store = store
+        self.endpoint = endpoint
+        self.reason = reason
+        self.interval = interval
+        self.id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        self.stacks = Counter()
+        self.samples = 0
+        self._threads = Counter()  # thread ident -> number of active wrapped calls
+        self._threads_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name=f"profiler-{self.id}", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        self._stop.set()
+        self._sampler.join()
+        try:
+            self.store.save({
+                "id": self.id,
+                "endpoint": self.endpoint,
+                "reason": self.reason,
+                "started_at": time.time() - duration,
+                "duration_seconds": duration,
+                "interval_seconds": self.interval,
+                "samples": self.samples,
+                "error": None if exc_type is None else exc_type.__name__,
+                "stacks": dict(self.stacks.most_common()),
+            })
+        except OSError:
+            logging.exception("Could not store profile %s", self.id)
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await asyncio.to_thread(self.__exit__, exc_type, exc, tb)
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            with self._threads_lock:
+                threads = [ident for ident, active in self._threads.items() if active and ident != own]
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[collapse_stack(frame)] += 1
+                    self.samples += 1
+
+    def _enter_thread(self):
+        with self._threads_lock:
+            self._threads[threading.get_ident()] += 1
+
+    def _exit_thread(self):
+        with self._threads_lock:
+            self._threads[threading.get_ident()] -= 1
+
+    def wrap(self, fn: Callable) -> Callable:
+        """Callable sampling the thread that runs fn while it executes"""
+        def traced(*args, **kwargs):
+            self._enter_thread()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._exit_thread()
+        return traced
+
+    def iterate(self, iterable: Iterable) -> Iterator:
+        """Iterator sampling whichever thread pulls each item while it is produced"""
+        iterator = iter(iterable)
+        while True:
+            self._enter_thread()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._exit_thread()
+            yield item
+
+
+class _NullSession:
+    """Session used for requests that are not profiled; every method is a pass-through"""
+
+    id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+    def wrap(self, fn: Callable) -> Callable:
+        return fn
+
+    def iterate(self, iterable: Iterable) -> Iterable:
+        return iterable
+
+
+NULL_SESSION = _NullSession()
+
+
+class RequestProfiler:
+    """Decides which requests to profile and hands out sessions for them
+
+    A request is profiled when it carries the trigger header with the admin
+    token as its value, or when it is drawn by sample_rate. Without an admin
+    token the header is ignored and the admin endpoints are closed. Other
+    requests get NULL_SESSION, which adds no work.
+    """
+
+    def __init__(self, store: ProfileStore, sample_rate: float = 0.0, interval_ms: float = 5.0,
+                 admin_token: Optional[str] = None):
+        """
+        Args:
+            store: Where profiles are written
+            sample_rate: Fraction of requests profiled without the header
+            interval_ms: Milliseconds between stack samples
+            admin_token: Secret required in the trigger header and by the admin endpoints,
+                None to disable both
+        """
+        self.store = store
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000.0
+        self.admin_token = admin_token or None
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "RequestProfiler":
+        """
+        Build a profiler from the profiling config section
+
+        The admin token is read from the LEGALEASE_ADMIN_TOKEN environment
+        variable, falling back to profiling.admin_token.
+        """
+        store = ProfileStore(config.get("directory", "logs/profiles"), config.get("max_profiles", 50))
+        return cls(
+            store,
+            sample_rate=config.get("sample_rate", 0.0),
+            interval_ms=config.get("interval_ms", 5.0),
+            admin_token=os.environ.get("LEGALEASE_ADMIN_TOKEN") or config.get("admin_token"),
+        )
+
+    def authorized(self, token: Optional[str]) -> bool:
+        """Whether a presented token grants admin access, never when no admin token is configured"""
+        if self.admin_token is None or token is None:
+            return False
+        return hmac.compare_digest(token.encode("utf-8"), self.admin_token.encode("utf-8"))
+
+    def session(self, endpoint: str, header: Optional[str] = None):
+        """
+        Session for one request
+
+        Args:
+            endpoint: Endpoint being served
+            header: Value of the trigger header, None if absent
+
+        Returns:
+            A ProfileSession if the request is profiled, else NULL_SESSION
+        """
+        if header is not None and self.authorized(header):
+            reason = "header"
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            reason = "sampled"
+        else:
+            return NULL_SESSION
+        return ProfileSession(self.store, endpoint, reason, self.interval)
@@ -0,0 +1,511 @@
+import asyncio
+import json
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+import httpx
+from fastapi import FastAPI
+from src.api import routes
+from src.api.worker_pool import WorkerPool, PoolSaturated
+from src.rag.chains import RAGChain
+from src.utils.metrics import metrics
+from src.utils.profiling import ProfileStore, RequestProfiler
+
+class StubClassifier:
+    """Clause classifier returning the whole text as one clause"""
+
+    def predict(self, text):
+        return [{"text": text, "type": "general", "confidence": 1.0}]
+
+class StubRiskScorer:
+    """Risk scorer finding no risks"""
+
+    def predict(self, clauses):
+        return []
+
+class StubNER:
+    """NER extractor tagging the whole text, tracking how many calls overlap"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.gate = threading.Event()
+        self.gate.set()
+        self.threads = set()
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def predict(self, text):
+        with self._lock:
+            self.threads.add(threading.current_thread().name)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            self.gate.wait(timeout=5)
+            time.sleep(self.delay)
+            return [{"text": text, "type": "ORGANIZATION", "start": 0, "end": len(text), "metadata": {}}]
+        finally:
+            with self._lock:
+                self.active -= 1
+
+class CountingClassifier(StubClassifier):
+    """Clause classifier recording every text it is given"""
+
+    def __init__(self):
+        self.texts = []
+
+    def predict(self, text):
+        self.texts.append(text)
+        return super().predict(text)
+
+class FlaggingRiskScorer:
+    """Risk scorer flagging clauses about indemnities, numbering them from first_id"""
+
+    def __init__(self, first_id=0):
+        self.first_id = first_id
+
+    def predict(self, clauses):
+        return [
+            {"clause_id": i + self.first_id, "level": "high", "description": "Indemnity", "confidence": 0.9}
+            for i, clause in enumerate(clauses) if "indemnify" in clause["text"]
+        ]
+
+class StubRetriever:
+    """Retriever returning one fixed clause"""
+
+    def retrieve(self, query, k=5):
+        return [{"document": {"text": "Liability is capped at the fees paid."}, "score": 0.9}]
+
+class StubLLM:
+    """LLM streaming its answer word by word, failing after fail_after words when set"""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+
+    def stream(self, prompt):
+        for i, word in enumerate(["Liability ", "is ", "capped."]):
+            if i == self.fail_after:
+                raise RuntimeError("LLM connection lost")
+            yield word
+
+def api_app():
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    return app
+
+def api_client(app):
+    # One event loop serves every request, as under uvicorn
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+def parse_sse(body):
+    """(event, data) pairs of a server-sent event stream"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+class TestModelVersion(unittest.TestCase):
+    def test_version_follows_weights_file(self):
+        """Test that a model's version is its weights file hash, changing when the file is rewritten"""
+        with tempfile.TemporaryDirectory() as tmp:
+            model = StubClassifier()
+            model.model_file = Path(tmp) / "classifier.pkl"
+            model.model_file.write_bytes(b"weights v1")
+            first = routes.model_version(model)
+            self.assertEqual(first, routes.model_version(model))
+            model.model_file.write_bytes(b"weights v2")
+            self.assertNotEqual(routes.model_version(model), first)
+
+    def test_unversioned_model_is_unique_per_load(self):
+        """Test that a model with no weights file or version never shares a version with another load"""
+        self.assertNotEqual(routes.model_version(StubClassifier()), routes.model_version(StubClassifier()))
+        model = StubClassifier()
+        model.version = "2024-06"
+        self.assertEqual(routes.model_version(model), "2024-06")
+
+class TestWorkerPool(unittest.TestCase):
+    def test_reserve_rejects_beyond_max_pending(self):
+        """Test that reserve admits max_pending requests and frees the slot on exit"""
+        pool = WorkerPool(max_workers=1, max_pending=1)
+        try:
+            with pool.reserve():
+                with self.assertRaises(PoolSaturated):
+                    with pool.reserve():
+                        pass
+            self.assertEqual(pool.pending, 0)
+            with pool.reserve():
+                self.assertEqual(pool.pending, 1)
+        finally:
+            pool.shutdown()
+
+class TestPredictEndpoint(unittest.TestCase):
+    GLOBALS = ("clause_classifier", "risk_scorer", "ner_extractor", "worker_pool", "result_cache", "profiler")
+
+    def setUp(self):
+        self.saved = {name: getattr(routes, name) for name in self.GLOBALS}
+        self.ner = StubNER()
+        routes.clause_classifier = StubClassifier()
+        routes.risk_scorer = StubRiskScorer()
+        routes.ner_extractor = self.ner
+        routes.result_cache = None
+        routes.profiler = None
+        self.app = api_app()
+
+    def tearDown(self):
+        routes.worker_pool.shutdown()
+        for name, value in self.saved.items():
+            setattr(routes, name, value)
+
+    @staticmethod
+    def upload(text):
+        return {"document": ("contract.txt", text.encode("utf-8"), "text/plain")}
+
+    def test_saturated_pool_returns_429(self):
+        """Test that a request beyond max_pending is rejected with 429 and Retry-After"""
+        routes.worker_pool = WorkerPool(max_workers=1, max_pending=1)
+        latency = metrics.histogram("request_seconds", endpoint="/api/predict")
+        served = latency.count
+        self.ner.gate.clear()
+
+        async def scenario():
+            async with api_client(self.app) as client:
+                first = asyncio.create_task(client.post("/api/predict", files=self.upload("first")))
+                while routes.worker_pool.pending == 0:
+                    await asyncio.sleep(0.001)
+                rejected = await client.post("/api/predict", files=self.upload("second"))
+                self.ner.gate.set()
+                return await first, rejected
+
+        first, rejected = asyncio.run(scenario())
+        self.assertEqual(rejected.status_code, 429)
+        self.assertEqual(rejected.headers["Retry-After"], "1")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(routes.worker_pool.pending, 0)
+        # Only the admitted request is recorded in the latency histogram
+        self.assertEqual(latency.count, served + 1)
+
+    def test_concurrent_ner_calls_share_pool(self):
+        """Test that concurrent requests run NER on the pool's threads and each get their own entities"""
+        routes.worker_pool = WorkerPool(max_workers=2, max_pending=8)
+        texts = [f"Party {i} shall deliver the goods." for i in range(6)]
+
+        async def scenario():
+            async with api_client(self.app) as client:
+                return await asyncio.gather(
+                    *(client.post("/api/predict", files=self.upload(text)) for text in texts)
+                )
+
+        responses = asyncio.run(scenario())
+        self.assertEqual([r.status_code for r in responses], [200] * len(texts))
+        self.assertEqual([r.json()["entities"][0]["text"] for r in responses], texts)
+        self.assertTrue(all(name.startswith("model-worker") for name in self.ner.threads))
+        self.assertEqual(self.ner.max_active, 2)
+
+    def test_profile_is_saved_off_the_event_loop(self):
+        """Test that other requests are served while a profiled request's profile is being saved"""
+        routes.worker_pool = WorkerPool(max_workers=2, max_pending=8)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = ProfileStore(tmp)
+            saving, release = threading.Event(), threading.Event()
+            save = store.save
+
+            def blocking_save(profile):
+                saving.set()
+                release.wait(timeout=5)
+                return save(profile)
+
+            store.save = blocking_save
+            routes.profiler = RequestProfiler(store, interval_ms=1, admin_token="secret")
+
+            async def scenario():
+                async with api_client(self.app) as client:
+                    profiled = asyncio.create_task(client.post(
+                        "/api/predict", files=self.upload("Profiled."), headers={"X-Profile": "secret"}
+                    ))
+                    while not saving.is_set():
+                        await asyncio.sleep(0.001)
+                    health = await client.get("/api/health")
+                    saved_meanwhile = profiled.done()
+                    release.set()
+                    return await profiled, health, saved_meanwhile
+
+            profiled, health, saved_meanwhile = asyncio.run(scenario())
+            self.assertEqual(health.status_code, 200)
+            self.assertFalse(saved_meanwhile)
+            self.assertEqual(profiled.status_code, 200)
+            self.assertEqual([p["id"] for p in store.list()], [profiled.headers["X-Profile-Id"]])
+
+class TestPredictCache(unittest.TestCase):
+    GLOBALS = ("clause_classifier", "risk_scorer", "ner_extractor", "worker_pool", "result_cache",
+               "per_clause_cache", "profiler")
+    CONTRACT = (
+        "1. The Supplier shall deliver the goods.\n"
+        "2. The Customer shall pay within 30 days.\n"
+        "3. The Supplier shall indemnify the Customer."
+    )
+
+    def setUp(self):
+        self.saved = {name: getattr(routes, name) for name in self.GLOBALS}
+        self.classifier = CountingClassifier()
+        routes.clause_classifier = self.classifier
+        routes.risk_scorer = FlaggingRiskScorer()
+        routes.ner_extractor = StubNER(delay=0)
+        routes.worker_pool = WorkerPool(max_workers=2, max_pending=8)
+        routes.profiler = None
+        self.app = api_app()
+
+    def tearDown(self):
+        routes.worker_pool.shutdown()
+        if routes.result_cache is not None:
+            routes.result_cache.close()
+        for name, value in self.saved.items():
+            setattr(routes, name, value)
+
+    def predict(self, *texts):
+        async def scenario():
+            async with api_client(self.app) as client:
+                return [
+                    await client.post("/api/predict", files=TestPredictEndpoint.upload(text))
+                    for text in texts
+                ]
+        responses = asyncio.run(scenario())
+        self.assertEqual([r.status_code for r in responses], [200] * len(texts))
+        return [r.json() for r in responses]
+
+    def test_repeated_document_hits_cache(self):
+        """Test that a repeated document is served from the cache and a new one is analysed"""
+        routes.configure_result_cache({"enabled": True})
+        first, repeated, other = self.predict(self.CONTRACT, self.CONTRACT, "A. Other terms apply.")
+        self.assertEqual(repeated, first)
+        # Per-clause mode is off by default, so the classifier sees whole documents
+        self.assertEqual(self.classifier.texts, [self.CONTRACT, "A. Other terms apply."])
+        self.assertEqual(other["clauses"][0]["text"], "A. Other terms apply.")
+
+    def test_per_clause_reuses_unchanged_clauses(self):
+        """Test that per-clause mode only classifies the clauses an edit changed and renumbers risks"""
+        routes.configure_result_cache({"enabled": True, "per_clause": True})
+        edited = self.CONTRACT.replace("30 days", "60 days")
+        original, amended = self.predict(self.CONTRACT, edited)
+        self.assertEqual(self.classifier.texts, [
+            "1. The Supplier shall deliver the goods.",
+            "2. The Customer shall pay within 30 days.",
+            "3. The Supplier shall indemnify the Customer.",
+            "2. The Customer shall pay within 60 days.",
+        ])
+        self.assertEqual([c["text"] for c in amended["clauses"]], edited.split("\n"))
+        for result in (original, amended):
+            self.assertEqual([r["clause_id"] for r in result["risks"]], [2])
+
+    def test_per_clause_falls_back_when_clause_ids_are_not_positions(self):
+        """Test that risks not numbered by clause position make per-clause mode score the whole document"""
+        routes.risk_scorer = FlaggingRiskScorer(first_id=1)
+        routes.configure_result_cache({"enabled": True, "per_clause": True})
+        result, = self.predict(self.CONTRACT)
+        self.assertEqual(self.classifier.texts[-1], self.CONTRACT)
+        self.assertEqual([r["clause_id"] for r in result["risks"]], [1])
+
+class TestModelLoading(unittest.TestCase):
+    GLOBALS = ("clause_classifier", "risk_scorer", "ner_extractor", "worker_pool", "result_cache",
+               "profiler", "models_version", "load_model")
+
+    def setUp(self):
+        self.saved = {name: getattr(routes, name) for name in self.GLOBALS}
+        self.saved_state = dict(routes.model_state)
+        for name in self.GLOBALS[:3]:
+            setattr(routes, name, None)
+        routes.worker_pool = WorkerPool(max_workers=2, max_pending=8)
+        routes.result_cache = None
+        routes.profiler = None
+        self.ner = StubNER(delay=0)
+        self.release = threading.Event()
+        self.loads = []
+        # Passed only when the three models load at the same time
+        self.barrier = threading.Barrier(len(routes.MODEL_CLASSES), timeout=5)
+        self.app = api_app()
+
+    def tearDown(self):
+        routes.worker_pool.shutdown()
+        for name, value in self.saved.items():
+            setattr(routes, name, value)
+        routes.model_state.update(self.saved_state)
+
+    def load_model(self, name):
+        self.loads.append(name)
+        self.barrier.wait()
+        self.release.wait(timeout=5)
+        if name == self.failing:
+            raise RuntimeError(f"{name} weights missing")
+        return {"clause_classifier": StubClassifier, "risk_scorer": StubRiskScorer,
+                "ner_extractor": lambda: self.ner}[name]()
+
+    def run_loading(self, failing=None):
+        """Responses to health, readiness and predict while loading, warming and after load_models"""
+        self.failing = failing
+        routes.load_model = self.load_model
+        upload = TestPredictEndpoint.upload("The Supplier shall deliver the goods.")
+
+        async def probe(client, predict=True):
+            responses = {
+                "health": (await client.get("/api/health")).json(),
+                "ready": await client.get("/api/health/ready"),
+            }
+            if predict:
+                responses["predict"] = await client.post("/api/predict", files=upload)
+            return responses
+
+        async def scenario():
+            async with api_client(self.app) as client:
+                task = asyncio.create_task(routes.load_models())
+                while len(self.loads) < len(routes.MODEL_CLASSES):
+                    await asyncio.sleep(0.001)
+                loading = await probe(client)
+                # The NER warm-up is held until the warming state has been observed
+                self.ner.gate.clear()
+                self.release.set()
+                while failing is None and self.ner.active == 0:
+                    await asyncio.sleep(0.001)
+                # A request now would queue behind the held warm-up, so only the probes are checked
+                warming = await probe(client, predict=False) if failing is None else None
+                self.ner.gate.set()
+                await task
+                return loading, warming, await probe(client)
+
+        return asyncio.run(scenario())
+
+    def test_states_move_from_loading_to_warming_to_ready(self):
+        """Test that the models load concurrently and the API answers 503 until they are warmed up"""
+        loading, warming, ready = self.run_loading()
+        self.assertEqual(sorted(self.loads), sorted(routes.MODEL_CLASSES))
+        for state, probe in (("loading", loading), ("warming", warming)):
+            self.assertFalse(probe["health"]["ready"])
+            self.assertEqual(set(probe["health"]["models"].values()), {state})
+            self.assertEqual(probe["ready"].status_code, 503)
+            self.assertEqual(probe["ready"].json()["detail"]["models"], probe["health"]["models"])
+        self.assertEqual(loading["predict"].status_code, 503)
+        self.assertEqual(loading["predict"].headers["Retry-After"], "5")
+
+        self.assertTrue(ready["health"]["ready"])
+        self.assertEqual(set(ready["health"]["models"].values()), {"ready"})
+        self.assertEqual(ready["ready"].status_code, 200)
+        self.assertEqual(ready["predict"].status_code, 200)
+        self.assertIsNotNone(routes.models_version)
+
+    def test_failed_model_keeps_api_unready(self):
+        """Test that a model failing to load is reported and leaves the API answering 503"""
+        with self.assertLogs(level="ERROR"):
+            _, _, after = self.run_loading(failing="risk_scorer")
+        self.assertFalse(after["health"]["ready"])
+        self.assertEqual(after["health"]["models"], {
+            "clause_classifier": "warming", "risk_scorer": "failed", "ner_extractor": "warming",
+        })
+        self.assertEqual(after["ready"].status_code, 503)
+        self.assertEqual(after["predict"].status_code, 503)
+        self.assertIsNone(routes.risk_scorer)
+
+class TestRagStreamEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.saved = routes.rag_chain, routes.profiler
+        routes.profiler = None
+        self.app = api_app()
+
+    def tearDown(self):
+        routes.rag_chain, routes.profiler = self.saved
+
+    def stream(self, query):
+        async def request():
+            async with api_client(self.app) as client:
+                return await client.get("/api/rag/stream", params={"query": query})
+        return asyncio.run(request())
+
+    def test_unconfigured_chain_returns_503(self):
+        """Test that the endpoint answers 503 until a RAG chain is loaded"""
+        routes.rag_chain = None
+        self.assertEqual(self.stream("liability cap").status_code, 503)
+
+    def test_streams_context_tokens_and_done(self):
+        """Test that the context is sent first, then each token, then done"""
+        routes.rag_chain = RAGChain(StubRetriever(), llm=StubLLM())
+        response = self.stream("liability cap")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = parse_sse(response.text)
+        self.assertEqual([event for event, _ in events], ["context", "token", "token", "token", "done"])
+        self.assertEqual(events[0][1][0]["document"]["text"], "Liability is capped at the fees paid.")
+        self.assertEqual("".join(data for event, data in events if event == "token"), "Liability is capped.")
+        self.assertIsNone(events[-1][1])
+
+    def test_stream_records_generate_span(self):
+        """Test that streaming records retrieval and generation stage latencies"""
+        routes.rag_chain = RAGChain(StubRetriever(), llm=StubLLM())
+        generate = metrics.histogram("stage_seconds", stage="rag.generate")
+        before = generate.count
+        self.stream("liability cap")
+        self.assertEqual(generate.count, before + 1)
+
+    def test_generation_failure_sends_error_event(self):
+        """Test that a failure mid-generation ends the stream with an error event"""
+        routes.rag_chain = RAGChain(StubRetriever(), llm=StubLLM(fail_after=1))
+        events = parse_sse(self.stream("liability cap").text)
+        self.assertEqual([event for event, _ in events], ["context", "token", "error"])
+        self.assertEqual(events[-1][1]["detail"], "LLM connection lost")
+
+class TestAdminEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ProfileStore(self.tmp.name)
+        self.saved = routes.rag_chain, routes.profiler
+        routes.rag_chain = RAGChain(StubRetriever(), llm=StubLLM())
+        self.app = api_app()
+
+    def tearDown(self):
+        routes.rag_chain, routes.profiler = self.saved
+        self.tmp.cleanup()
+
+    def get(self, path, **headers):
+        async def request():
+            async with api_client(self.app) as client:
+                return await client.get(path, headers=headers)
+        return asyncio.run(request())
+
+    def test_no_admin_token_fails_closed(self):
+        """Test that without an admin token the admin endpoints are closed and X-Profile is ignored"""
+        routes.profiler = RequestProfiler(self.store, admin_token=None)
+        self.assertEqual(self.get("/api/admin/profiles").status_code, 404)
+        self.assertEqual(self.get("/api/admin/profiles", Authorization="Bearer ").status_code, 404)
+        response = self.get("/api/rag/stream?query=cap", **{"X-Profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response.headers)
+        self.assertEqual(self.store.list(), [])
+
+    def test_admin_endpoints_require_bearer_token(self):
+        """Test that listing profiles needs the admin token as a bearer token"""
+        routes.profiler = RequestProfiler(self.store, admin_token="secret")
+        self.assertEqual(self.get("/api/admin/profiles").status_code, 401)
+        self.assertEqual(self.get("/api/admin/profiles", Authorization="Bearer wrong").status_code, 401)
+        self.assertEqual(self.get("/api/admin/profiles", Authorization="secret").status_code, 401)
+        response = self.get("/api/admin/profiles", Authorization="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"profiles": []})
+
+    def test_profiled_request_is_served_by_admin_endpoints(self):
+        """Test that a request profiled with X-Profile can be listed and fetched as JSON or folded stacks"""
+        routes.profiler = RequestProfiler(self.store, interval_ms=1, admin_token="secret")
+        auth = {"Authorization": "Bearer secret"}
+        profile_id = self.get("/api/rag/stream?query=cap", **{"X-Profile": "secret"}).headers["X-Profile-Id"]
+
+        listed = self.get("/api/admin/profiles", **auth).json()["profiles"]
+        self.assertEqual([p["id"] for p in listed], [profile_id])
+        self.assertNotIn("stacks", listed[0])
+        profile = self.get(f"/api/admin/profiles/{profile_id}", **auth).json()
+        self.assertEqual(profile["endpoint"], "/api/rag/stream")
+        self.assertEqual(profile["reason"], "header")
+        folded = self.get(f"/api/admin/profiles/{profile_id}?format=folded", **auth)
+        self.assertTrue(folded.headers["content-type"].startswith("text/plain"))
+        self.assertEqual(self.get("/api/admin/profiles/missing", **auth).status_code, 404)
+        self.assertEqual(self.get(f"/api/admin/profiles/{profile_id}").status_code, 401)
+
+if __name__ == '__main__':
+    unittest.main()
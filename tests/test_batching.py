@@ -0,0 +1,184 @@
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+import httpx
+import joblib
+import pandas as pd
+from sklearn.tree import DecisionTreeClassifier
+from src.api import app as tabular_app
+from src.pipelines.model_registry import dump_model, file_digest
+from src.utils.batching import MicroBatcher
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_submit_racing_close_never_hangs(self):
+        """Test that every submit racing close either raises or gets a resolved future"""
+        for _ in range(50):
+            batcher = MicroBatcher(lambda items: items, max_batch_size=4, max_wait_ms=1)
+            futures, start = [], threading.Event()
+
+            def submit_many():
+                start.wait()
+                for i in range(20):
+                    try:
+                        futures.append(batcher.submit(i))
+                    except RuntimeError:
+                        return
+
+            thread = threading.Thread(target=submit_many)
+            thread.start()
+            start.set()
+            batcher.close()
+            thread.join()
+            for future in futures:
+                self.assertIsNotNone(future.result(timeout=5))
+
+    def test_submit_after_close_raises(self):
+        """Test that a closed batcher rejects new items"""
+        batcher = MicroBatcher(lambda items: items)
+        batcher.close()
+        with self.assertRaises(RuntimeError):
+            batcher.submit(1)
+
+    def test_item_size_bounds_batches(self):
+        """Test that weighted items never push a batch past max_batch_size"""
+        batches = []
+
+        gate = threading.Event()
+
+        def record(items):
+            gate.wait()
+            batches.append([len(item) for item in items])
+            return items
+
+        batcher = MicroBatcher(record, max_batch_size=5, max_wait_ms=50, item_size=len)
+        futures = [batcher.submit([0] * n) for n in (3, 1, 4, 2, 6)]
+        time.sleep(0.1)
+        gate.set()
+        for future in futures:
+            future.result(timeout=5)
+        batcher.close()
+        self.assertEqual(sum(batches, []), [3, 1, 4, 2, 6])
+        # Only the oversized item alone may exceed the limit
+        self.assertTrue(all(sum(b) <= 5 or b == [6] for b in batches), batches)
+
+class TestPredictBatch(unittest.TestCase):
+    def setUp(self):
+        model = DecisionTreeClassifier(random_state=0).fit(pd.DataFrame({"x": [0.0, 1.0]}), [0, 1])
+        self.saved = (tabular_app.pipeline, tabular_app.model_registry)
+        tabular_app.pipeline = SimpleNamespace(make_predictions=lambda model, features: model.predict(features))
+        tabular_app.model_registry = SimpleNamespace(get=lambda: model)
+
+    def tearDown(self):
+        tabular_app.pipeline, tabular_app.model_registry = self.saved
+
+    def test_splits_predictions_per_request(self):
+        """Test that one model call is split back into per-request predictions"""
+        results = tabular_app.predict_batch([[{"x": 0.0}], [{"x": 1.0}, {"x": 0.0}]])
+        self.assertEqual([list(r) for r in results], [[0], [1, 0]])
+
+    def test_failing_request_is_isolated(self):
+        """Test that a bad request gets its own error while the rest of the batch succeeds"""
+        results = tabular_app.predict_batch([[{"x": 1.0}], [{"x": "not a number"}], [{"x": 0.0}]])
+        self.assertEqual(list(results[0]), [1])
+        self.assertIsInstance(results[1], Exception)
+        self.assertEqual(list(results[2]), [0])
+
+class TestLazyModelLoad(unittest.TestCase):
+    GLOBALS = ("pipeline", "model_registry", "batcher", "loading_task")
+
+    def setUp(self):
+        self.saved = {name: getattr(tabular_app, name) for name in self.GLOBALS}
+        for name in self.GLOBALS:
+            setattr(tabular_app, name, None)
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.config = {
+            'data': {'features_path': str(root), 'predictions_path': str(root)},
+            'model': {'name': 'model-v1', 'save_path': str(root)},
+        }
+        self.model_file = root / 'model-v1.pkl'
+        self.model = DecisionTreeClassifier(random_state=0).fit(pd.DataFrame({"x": [0.0, 1.0]}), [0, 1])
+
+    def tearDown(self):
+        if tabular_app.batcher is not None:
+            tabular_app.batcher.close()
+        for name, value in self.saved.items():
+            setattr(tabular_app, name, value)
+        self.tmp.cleanup()
+
+    def test_health_reports_loading_then_ready(self):
+        """Test that the API answers 503 while the model loads in the background and serves once it is ready"""
+        dump_model(self.model, self.model_file)
+        tabular_app.batcher = MicroBatcher(tabular_app.predict_batch, name="test-batcher", item_size=len)
+        started = threading.Event()
+
+        def load_model(config):
+            started.wait(timeout=5)
+            tabular_app.load_model(config)
+
+        async def probe(client):
+            return (
+                (await client.get("/health")).json(),
+                await client.get("/health/ready"),
+                await client.post("/predict", json={"data": [{"x": 1.0}]}),
+            )
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=tabular_app.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                before = await probe(client)
+                tabular_app.loading_task = asyncio.create_task(asyncio.to_thread(load_model, self.config))
+                loading = await probe(client)
+                started.set()
+                await tabular_app.loading_task
+                return before, loading, await probe(client)
+
+        before, loading, ready = asyncio.run(scenario())
+        for state, (health, readiness, predict) in (("unavailable", before), ("loading", loading)):
+            self.assertEqual(health["model"], state)
+            self.assertFalse(health["ready"])
+            self.assertEqual(readiness.status_code, 503)
+            self.assertEqual(predict.status_code, 503)
+        health, readiness, predict = ready
+        self.assertEqual(health["model"], "ready")
+        self.assertEqual(readiness.json(), {"ready": True, "version": file_digest(self.model_file)})
+        self.assertEqual(predict.json(), {"predictions": [1]})
+
+    def test_concurrent_first_requests_load_model_once(self):
+        """Test that requests racing to load a model missing at startup load it exactly once"""
+        with self.assertLogs(level="ERROR"):
+            tabular_app.load_model(self.config)
+        self.assertFalse(tabular_app.model_ready())
+        dump_model(self.model, self.model_file)
+
+        loads = []
+        load = joblib.load
+
+        def slow_load(*args, **kwargs):
+            loads.append(threading.current_thread().name)
+            time.sleep(0.05)
+            return load(*args, **kwargs)
+
+        barrier = threading.Barrier(8)
+        results = [None] * 8
+
+        def first_request(i):
+            barrier.wait()
+            results[i] = tabular_app.predict_batch([[{"x": float(i % 2)}]])
+
+        with mock.patch("src.pipelines.model_registry.joblib.load", slow_load):
+            threads = [threading.Thread(target=first_request, args=(i,)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(loads), 1)
+        self.assertEqual([list(r[0]) for r in results], [[i % 2] for i in range(8)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from src.pipelines.feature_eng_pipeline import FeatureEngineeringPipeline
+from src.pipelines.table_io import read_table, write_table
+from src.pipelines.text_features import legal_features, hashed_features
+
+TEXTS = [
+    "The Supplier shall pay $5,000 within thirty (30) days of 1 January 2024.",
+    "The Customer must not assign this Agreement. Either party may terminate on 12 months notice.",
+    "Interest accrues at 2% per month on amounts overdue after 14/02/2023.",
+]
+
+class TestTextFeatures(unittest.TestCase):
+    def test_legal_features(self):
+        """Test that legal signals are counted per document"""
+        features = legal_features(pd.Series(TEXTS + [None]))
+        self.assertEqual(features["legal_money_amounts"].tolist(), [1, 0, 0, 0])
+        self.assertEqual(features["legal_dates"].tolist(), [1, 0, 1, 0])
+        self.assertEqual(features["legal_durations"].tolist(), [1, 1, 0, 0])
+        self.assertEqual(features["legal_obligations"].tolist(), [1, 0, 0, 0])
+        self.assertEqual(features["legal_prohibitions"].tolist(), [0, 1, 0, 0])
+        self.assertEqual(features["legal_permissions"].tolist(), [0, 1, 0, 0])
+        self.assertEqual(features["legal_percentages"].tolist(), [0, 0, 1, 0])
+
+    def test_hashed_features_are_stateless(self):
+        """Test that chunks hashed separately match the corpus hashed at once"""
+        texts = pd.Series(TEXTS)
+        whole = hashed_features(texts, n_features=1024)
+        parts = [hashed_features(texts[:1], n_features=1024), hashed_features(texts[1:], n_features=1024)]
+        self.assertEqual(whole.format, "csr")
+        self.assertEqual(whole.dtype, np.float32)
+        np.testing.assert_allclose(whole.toarray(), np.vstack([p.toarray() for p in parts]))
+
+class TestFeatureEngineeringPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.config = {
+            "data": {
+                "processed_data_path": str(root / "processed"),
+                "features_path": str(root / "features"),
+                "chunk_size": 2,
+            },
+            "features": {"text_column": "text", "target_column": "label", "hash_features": 1024, "workers": 2},
+        }
+        self.data = pd.DataFrame({
+            "label": [1, 0, 1, 0, 1],
+            "text": TEXTS + TEXTS[:2],
+            "pages": [3, 1, 2, 5, 4],
+        })
+        write_table(self.data, root / "processed" / "preprocessed_data.csv", "csv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_run_returns_features(self):
+        """Test that an in-memory run returns the features it saves"""
+        pipeline = FeatureEngineeringPipeline(self.config)
+        features = pipeline.run()
+        self.assertIsInstance(features, pd.DataFrame)
+        self.assertEqual(features.columns[-1], "label")
+        saved = read_table(Path(self.config["data"]["features_path"]) / "features.csv", "csv")
+        np.testing.assert_array_equal(saved.values, features.values)
+
+    def test_run_in_chunks(self):
+        """Test that chunked parallel runs match featurizing the whole table"""
+        pipeline = FeatureEngineeringPipeline(self.config)
+        output = pipeline.run_streaming()
+
+        features = read_table(output, "csv")
+        expected = pipeline.create_features(self.data)
+        self.assertEqual(features.columns[-1], "label")
+        self.assertEqual(list(features.columns), list(expected.columns))
+        np.testing.assert_array_equal(features.values, expected.values)
+        self.assertEqual(sorted(p.name for p in output.parent.iterdir()), ["features.csv"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.dummy import DummyClassifier
+from sklearn.tree import DecisionTreeClassifier
+from src.pipelines.inference_pipeline import InferencePipeline
+from src.pipelines.model_registry import ModelRegistry, dump_model, file_digest
+from src.pipelines.table_io import compact_dtypes, iter_table, read_table, write_table
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+def make_model(label):
+    model = DummyClassifier(strategy="constant", constant=label)
+    return model.fit(np.zeros((2, 1)), [label, label])
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model_file = Path(self.tmp.name) / "model-v1.pkl"
+        joblib.dump(make_model(0), self.model_file)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_loads_once(self):
+        """Test that repeated get calls reuse the loaded model"""
+        registry = ModelRegistry(self.model_file, check_interval=0)
+        model = registry.get()
+        self.assertIs(registry.get(), model)
+        self.assertEqual(model.predict(np.zeros((1, 1)))[0], 0)
+
+    def test_hot_swap_on_change(self):
+        """Test that a rewritten model file is picked up and a broken one is ignored"""
+        registry = ModelRegistry(self.model_file, check_interval=0)
+        registry.load()
+        old_version = registry.version
+
+        dump_model(make_model(1), self.model_file)
+        self.assertEqual(registry.get().predict(np.zeros((1, 1)))[0], 1)
+        self.assertNotEqual(registry.version, old_version)
+        self.assertEqual(registry.version, file_digest(self.model_file))
+
+        self.model_file.write_bytes(b"not a pickle")
+        self.assertEqual(registry.get().predict(np.zeros((1, 1)))[0], 1)
+
+    def test_dump_model_keeps_mapped_model_intact(self):
+        """Test that saving replaces the file, so a memory-mapped model still predicts from the old one"""
+        X = np.arange(64, dtype=np.float64).reshape(-1, 1)
+        dump_model(DecisionTreeClassifier(random_state=0).fit(X, X[:, 0] > 31), self.model_file)
+        registry = ModelRegistry(self.model_file, mmap_mode="r", check_interval=0)
+        mapped = registry.load()
+        expected = mapped.predict(X)
+
+        dump_model(DecisionTreeClassifier(random_state=0).fit(X, X[:, 0] > 7), self.model_file)
+        np.testing.assert_array_equal(mapped.predict(X), expected)
+        self.assertEqual(os.listdir(self.tmp.name), [self.model_file.name])
+        self.assertEqual(registry.get().predict(X).sum(), 56)
+
+class TestTableIO(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.df = pd.DataFrame({
+            "amount": np.arange(10, dtype=np.float64),
+            "count": np.arange(10, dtype=np.int64),
+            "clause_type": ["payment", "termination"] * 5,
+        })
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_compact_dtypes(self):
+        """Test that columns are downcast to compact dtypes"""
+        compact = compact_dtypes(self.df)
+        self.assertEqual(compact["amount"].dtype, np.float32)
+        self.assertEqual(compact["count"].dtype, np.int8)
+        self.assertEqual(compact["clause_type"].dtype.name, "category")
+
+    def test_round_trip_and_chunks(self):
+        """Test that every format round-trips and streams in bounded chunks"""
+        formats = ["csv"] + (["parquet", "arrow"] if pyarrow is not None else [])
+        for fmt in formats:
+            path = Path(self.tmp.name) / f"features.{fmt}"
+            df = self.df if fmt == "csv" else compact_dtypes(self.df)
+            write_table(df, path, fmt, row_group_size=4)
+            loaded = read_table(path, fmt)
+            self.assertEqual(list(loaded["amount"]), list(df["amount"]), fmt)
+            if fmt != "csv":
+                self.assertEqual(loaded["amount"].dtype, np.float32)
+            chunks = list(iter_table(path, fmt, chunk_size=3))
+            self.assertTrue(all(len(c) <= 3 for c in chunks), fmt)
+            self.assertEqual(sum(len(c) for c in chunks), 10, fmt)
+
+    def test_skip_chunks_resumes_same_chunks(self):
+        """Test that skipping chunks yields the remaining chunks of a full pass in every format"""
+        formats = ["csv"] + (["parquet", "arrow"] if pyarrow is not None else [])
+        for fmt in formats:
+            path = Path(self.tmp.name) / f"features.{fmt}"
+            write_table(compact_dtypes(self.df) if fmt != "csv" else self.df, path, fmt, row_group_size=4)
+            full = [list(c["amount"]) for c in iter_table(path, fmt, chunk_size=3)]
+            for skip in range(len(full) + 1):
+                resumed = [list(c["amount"]) for c in iter_table(path, fmt, chunk_size=3, skip_chunks=skip)]
+                self.assertEqual(resumed, full[skip:], (fmt, skip))
+
+class TestStreamingInference(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.config = {
+            'data': {
+                'features_path': str(root / 'features'),
+                'predictions_path': str(root / 'predictions'),
+                'chunk_size': 7,
+            },
+            'model': {'name': 'model-v1', 'save_path': str(root / 'models')},
+        }
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(rng.random((50, 3)), columns=['a', 'b', 'c'])
+        (root / 'features').mkdir()
+        X.to_csv(root / 'features' / 'features.csv', index=False)
+        (root / 'models').mkdir()
+        model = DecisionTreeClassifier(random_state=0).fit(X, X['a'] > 0.5)
+        joblib.dump(model, root / 'models' / 'model-v1.pkl')
+        self.pipeline = InferencePipeline(self.config)
+        self.expected = list(self.pipeline.run())
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_predictions(self):
+        return list(pd.read_csv(Path(self.config['data']['predictions_path']) / 'predictions.csv')['predictions'])
+
+    def test_streaming_matches_in_memory(self):
+        """Test that chunked and parallel inference preserve row order"""
+        self.pipeline.run_streaming()
+        self.assertEqual(self.read_predictions(), self.expected)
+        self.pipeline.run_streaming(workers=2)
+        self.assertEqual(self.read_predictions(), self.expected)
+
+    def test_resume_skips_finished_chunks(self):
+        """Test that a rerun after a crash only predicts the missing chunks"""
+        calls = []
+        make_predictions = self.pipeline.make_predictions
+
+        def crash_on_third(model, chunk):
+            calls.append(len(chunk))
+            if len(calls) == 3:
+                raise RuntimeError("worker crashed")
+            return make_predictions(model, chunk)
+
+        self.pipeline.make_predictions = crash_on_third
+        with self.assertRaises(RuntimeError):
+            self.pipeline.run_streaming()
+        self.pipeline.make_predictions = make_predictions
+
+        resumed, read = [], []
+        self.pipeline.make_predictions = lambda model, chunk: resumed.append(len(chunk)) or make_predictions(model, chunk)
+        iter_features = self.pipeline.iter_features
+        self.pipeline.iter_features = lambda skip_chunks=0: read.append(skip_chunks) or iter_features(skip_chunks)
+        self.pipeline.run_streaming()
+        self.assertEqual(len(resumed), 8 - 2)
+        # The two finished chunks are not read again
+        self.assertEqual(read, [2])
+        self.assertEqual(self.read_predictions(), self.expected)
+
+    def test_resume_discards_parts_of_swapped_model(self):
+        """Test that parts predicted before the model file changed are not reused"""
+        calls = []
+        make_predictions = self.pipeline.make_predictions
+
+        def crash_on_third(model, chunk):
+            calls.append(len(chunk))
+            if len(calls) == 3:
+                raise RuntimeError("worker crashed")
+            return make_predictions(model, chunk)
+
+        self.pipeline.make_predictions = crash_on_third
+        with self.assertRaises(RuntimeError):
+            self.pipeline.run_streaming()
+        self.pipeline.make_predictions = make_predictions
+
+        dump_model(make_model(True), self.pipeline.model_file)
+        self.pipeline.run_streaming()
+        self.assertEqual(self.read_predictions(), [True] * 50)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from src.utils.cache import LRUCache
+from src.utils.metrics import MetricsRegistry, Histogram
+
+class TestHistogram(unittest.TestCase):
+    def test_cumulative_buckets(self):
+        """Test that bucket counts are cumulative and end with +Inf"""
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        lines = histogram.samples("latency", (("stage", "x"),))
+        self.assertEqual(lines[:3], [
+            'latency_bucket{stage="x",le="0.1"} 2',
+            'latency_bucket{stage="x",le="1.0"} 3',
+            'latency_bucket{stage="x",le="+Inf"} 4',
+        ])
+        self.assertEqual(lines[-1], 'latency_count{stage="x"} 4')
+        self.assertAlmostEqual(histogram.sum, 2.65)
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.metrics = MetricsRegistry(namespace="test")
+
+    def test_span_and_in_flight(self):
+        """Test that spans and in-flight blocks record latency and track the gauge"""
+        with self.metrics.in_flight("/predict"):
+            self.assertEqual(self.metrics.gauge("requests_in_flight", endpoint="/predict").value, 1)
+            with self.metrics.span("predict.model"):
+                pass
+        self.assertEqual(self.metrics.gauge("requests_in_flight", endpoint="/predict").value, 0)
+
+        text = self.metrics.render()
+        self.assertIn("# TYPE test_stage_seconds histogram", text)
+        self.assertIn('test_stage_seconds_count{stage="predict.model"} 1', text)
+        self.assertIn('test_request_seconds_count{endpoint="/predict"} 1', text)
+
+    def test_cache_and_model_load(self):
+        """Test that registered caches and model loads are rendered"""
+        cache = LRUCache(max_entries=2)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("b")
+        self.metrics.register_cache("results", cache)
+        self.metrics.record_model_load("classifier", 1.5)
+
+        text = self.metrics.render()
+        self.assertIn('test_cache_hit_ratio{cache="results"} 0.5', text)
+        self.assertIn('test_model_load_seconds{model="classifier"} 1.5', text)
+        self.assertIn('test_model_loads_total{model="classifier"} 1', text)
+
+    def test_type_conflict(self):
+        """Test that a name cannot be reused for a different metric type"""
+        self.metrics.counter("events")
+        with self.assertRaises(ValueError):
+            self.metrics.gauge("events")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import io
+import os
+import tempfile
+import unittest
+from benchmarks.synthetic import write_pdf
+from src.utils.clause_splitter import ClauseSplitter
+from src.utils.document_parser import DocumentParser
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+CONTRACT = """MASTER SERVICES AGREEMENT
+between Acme Corp and Globex Ltd.
+
+Article 1 Definitions
+In this Agreement the following terms apply.
+
+1. Services shall be provided as described in Schedule A.
+2. Fees are payable within 30 days of invoice.
+A. The Supplier shall maintain insurance.
+Section 12 Termination
+Either party may terminate on 30 days notice.
+"""
+
+class TestClauseSplitter(unittest.TestCase):
+    def setUp(self):
+        self.splitter = ClauseSplitter()
+
+    def test_split(self):
+        """Test that each header starts a new clause"""
+        clauses = self.splitter.split(CONTRACT)
+        self.assertEqual(len(clauses), 6)
+        self.assertTrue(clauses[0].startswith("MASTER SERVICES AGREEMENT"))
+        self.assertEqual(clauses[2], "1. Services shall be provided as described in Schedule A.")
+        self.assertEqual(clauses[5], "Section 12 Termination\nEither party may terminate on 30 days notice.")
+
+    def test_spans_are_offsets(self):
+        """Test that spans index into the source text"""
+        spans = self.splitter.spans(CONTRACT)
+        self.assertEqual([CONTRACT[s:e] for s, e in spans], self.splitter.split(CONTRACT))
+
+    def test_iter_split_matches_spans_for_any_chunking(self):
+        """Test that streaming gives the same clauses regardless of chunk boundaries"""
+        expected = [(s, e, CONTRACT[s:e]) for s, e in self.splitter.spans(CONTRACT)]
+        for size in (1, 2, 3, 7, 16, 1000):
+            chunks = [CONTRACT[i:i + size] for i in range(0, len(CONTRACT), size)]
+            self.assertEqual(list(self.splitter.iter_split(chunks)), expected, f"chunk size {size}")
+        splitter = ClauseSplitter(chunk_size=5)
+        self.assertEqual(list(splitter.iter_split(io.StringIO(CONTRACT))), expected)
+
+    def test_no_headers(self):
+        """Test that text without headers is one clause and blank text is none"""
+        self.assertEqual(self.splitter.split("  plain text  "), ["plain text"])
+        self.assertEqual(self.splitter.split("   \n "), [])
+        self.assertEqual(list(self.splitter.iter_split([])), [])
+
+class TestDocumentParser(unittest.TestCase):
+    def setUp(self):
+        self.parser = DocumentParser()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @unittest.skipIf(pypdf is None, "pypdf not installed")
+    def test_pdf_pages_sequential_and_parallel(self):
+        """Test that parallel page-range parsing yields the same pages in order"""
+        path = os.path.join(self.tmp.name, "contract.pdf")
+        write_pdf(path, [f"Section {i} clause text" for i in range(1, 11)])
+        pages = list(self.parser.iter_pdf_pages(path))
+        self.assertEqual(len(pages), 10)
+        self.assertIn("Section 3 clause text", pages[2])
+        parallel = list(self.parser.iter_pdf_pages_parallel(path, workers=2, pages_per_task=3))
+        self.assertEqual(parallel, pages)
+        self.assertEqual(self.parser.parse_pdf(path), "\n".join(pages))
+
+    def test_text_pages(self):
+        """Test that plain-text documents are paged on form feeds"""
+        path = os.path.join(self.tmp.name, "contract.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("page one\n\fpage two\nmore\n")
+        self.assertEqual(list(self.parser.iter_pages(path)), ["page one\n", "page two\nmore\n"])
+        with self.assertRaises(ValueError):
+            self.parser.iter_pages("contract.rtf")
+
+if __name__ == '__main__':
+    unittest.main()
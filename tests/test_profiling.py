@@ -0,0 +1,69 @@
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.profiling import ProfileStore, RequestProfiler, NULL_SESSION
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return seconds
+
+class TestRequestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ProfileStore(self.tmp.name, max_profiles=2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_untraced_requests_get_null_session(self):
+        """Test that requests neither triggered nor sampled get the pass-through session"""
+        profiler = RequestProfiler(self.store, sample_rate=0.0)
+        self.assertIs(profiler.session("/api/predict"), NULL_SESSION)
+        self.assertIs(NULL_SESSION.wrap(busy_wait), busy_wait)
+
+    def test_header_requires_admin_token(self):
+        """Test that the trigger header only profiles a request when it carries the admin token"""
+        profiler = RequestProfiler(self.store, admin_token="secret")
+        self.assertIs(profiler.session("/api/predict", header="1"), NULL_SESSION)
+        self.assertIsNot(profiler.session("/api/predict", header="secret"), NULL_SESSION)
+
+    def test_no_admin_token_fails_closed(self):
+        """Test that without an admin token the header is ignored and nothing is authorized"""
+        profiler = RequestProfiler(self.store, admin_token=None)
+        self.assertIs(profiler.session("/api/predict", header="1"), NULL_SESSION)
+        self.assertIs(profiler.session("/api/predict", header=""), NULL_SESSION)
+        self.assertFalse(profiler.authorized(None))
+        self.assertFalse(profiler.authorized("anything"))
+        sampled = RequestProfiler(self.store, sample_rate=1.0)
+        self.assertEqual(sampled.session("/api/predict").reason, "sampled")
+
+    def test_samples_worker_threads(self):
+        """Test that stacks of wrapped calls on worker threads are sampled into the stored profile"""
+        profiler = RequestProfiler(self.store, interval_ms=1, admin_token="secret")
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            with profiler.session("/api/predict", header="secret") as session:
+                pool.submit(session.wrap(busy_wait), 0.05).result()
+
+        profile = self.store.get(session.id)
+        self.assertEqual(profile["endpoint"], "/api/predict")
+        self.assertEqual(profile["reason"], "header")
+        self.assertGreater(profile["samples"], 0)
+        self.assertTrue(any("busy_wait" in stack for stack in profile["stacks"]))
+
+    def test_ring_keeps_most_recent(self):
+        """Test that the store keeps only the max_profiles most recent profiles"""
+        profiler = RequestProfiler(self.store, interval_ms=1, admin_token="secret")
+        ids = []
+        for _ in range(3):
+            with profiler.session("/api/rag/stream", header="secret") as session:
+                pass
+            ids.append(session.id)
+
+        self.assertEqual([p["id"] for p in self.store.list()], ids[:0:-1])
+        self.assertIsNone(self.store.get(ids[0]))
+
+if __name__ == '__main__':
+    unittest.main()
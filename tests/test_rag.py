@@ -0,0 +1,278 @@
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.rag.vector_store import VectorStore
+from src.rag.retriever import Retriever
+from src.rag.chains import RAGChain, context_label
+from src.rag.prompt_packer import PromptPacker, count_tokens
+from src.utils.cache import LRUCache, DiskCache, TieredCache
+
+class StubEncoder:
+    """Deterministic bag-of-words encoder used in place of a real embedding model"""
+
+    def __init__(self, dim=32):
+        self.dim = dim
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(len(texts))
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                out[row, sum(map(ord, word)) % self.dim] += 1.0
+        return out
+
+CLAUSES = [
+    "limitation of liability",
+    "termination for convenience",
+    "governing law and jurisdiction",
+    "confidentiality obligations",
+    "payment terms and invoicing",
+]
+
+class TestRetriever(unittest.TestCase):
+    def setUp(self):
+        self.encoder = StubEncoder()
+        store = VectorStore(embedding_dim=self.encoder.dim)
+        store.add_documents([{"text": c} for c in CLAUSES], self.encoder.encode(CLAUSES))
+        self.encoder.calls.clear()
+        self.retriever = Retriever(store, encoder=self.encoder)
+
+    def tearDown(self):
+        self.retriever.disable_batching()
+
+    def test_retrieve(self):
+        """Test that a query retrieves its matching clause first"""
+        results = self.retriever.retrieve("termination for convenience", k=2)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]["document"]["text"], "termination for convenience")
+
+    def test_retrieve_many_batches_encoder_calls(self):
+        """Test that retrieve_many encodes all queries in one call and matches retrieve"""
+        queries = ["limitation of liability", "payment terms", "confidentiality"]
+        batched = self.retriever.retrieve_many(queries, k=3)
+        self.assertEqual(self.encoder.calls, [3])
+        for query, results in zip(queries, batched):
+            single = self.retriever.retrieve(query, k=3)
+            self.assertEqual([r["document"] for r in results], [r["document"] for r in single])
+
+    def test_hybrid_retrieval(self):
+        """Test that hybrid retrieval finds exact terms and survives batching"""
+        self.retriever.enable_hybrid(candidates=10)
+        results = self.retriever.retrieve("jurisdiction", k=2)
+        self.assertEqual(results[0]["document"]["text"], "governing law and jurisdiction")
+        self.retriever.enable_batching(max_batch_size=4, max_wait_ms=10)
+        batched = self.retriever.retrieve("jurisdiction", k=2)
+        self.assertEqual([r["document"] for r in batched], [r["document"] for r in results])
+
+    def test_micro_batching(self):
+        """Test that concurrent retrieve calls are served through shared batches"""
+        self.retriever.enable_batching(max_batch_size=8, max_wait_ms=50)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda q: self.retriever.retrieve(q, k=1), CLAUSES))
+        self.assertEqual([r[0]["document"]["text"] for r in results], CLAUSES)
+        self.assertEqual(sum(self.encoder.calls), len(CLAUSES))
+        self.assertLess(len(self.encoder.calls), len(CLAUSES))
+
+    def test_batch_searches_each_k_separately(self):
+        """Test that a batch mixing k values searches each k on its own, matching direct searches"""
+        store = self.retriever.vector_store
+        searched = []
+        search_batch = store.similarity_search_batch
+
+        def recording_search(embeddings, k):
+            searched.append((len(embeddings), k))
+            return search_batch(embeddings, k=k)
+
+        store.similarity_search_batch = recording_search
+        requests = [("limitation of liability", 1), ("payment terms", 3), ("confidentiality", 1)]
+        batched = self.retriever._retrieve_batch(requests)
+        self.assertEqual(self.encoder.calls, [3])
+        self.assertEqual(searched, [(2, 1), (1, 3)])
+        del store.similarity_search_batch
+        for (query, k), results in zip(requests, batched):
+            self.assertEqual(results, self.retriever.retrieve(query, k=k))
+
+    def test_result_cache(self):
+        """Test that repeated queries hit the cache until the store changes"""
+        self.retriever.enable_cache()
+        first = self.retriever.retrieve("Limitation of  liability", k=2)
+        second = self.retriever.retrieve("limitation of liability", k=2)
+        self.assertEqual(first, second)
+        self.assertEqual(self.encoder.calls, [1])
+        self.assertEqual(self.retriever.result_cache.hits, 1)
+
+        self.retriever.vector_store.add_documents(
+            [{"text": "limitation of liability cap"}],
+            self.encoder.encode(["limitation of liability cap"]),
+        )
+        self.encoder.calls.clear()
+        self.retriever.retrieve("limitation of liability", k=2)
+        # Results were invalidated but the query embedding is still cached
+        self.assertEqual(self.encoder.calls, [])
+        self.assertEqual(self.retriever.result_cache.misses, 2)
+
+    def test_result_cache_skips_results_from_stale_version(self):
+        """Test that results searched before a store change are not cached under the new version"""
+        self.retriever.enable_cache()
+        search = self.retriever._search_many
+
+        def search_while_store_changes(queries, embeddings, k):
+            results = search(queries, embeddings, k)
+            self.retriever.vector_store.add_documents(
+                [{"text": "new clause"}], self.encoder.encode(["new clause"])
+            )
+            # Another caller observes the new version before this one caches
+            self.retriever._cached_results("payment terms", 1)
+            return results
+
+        self.retriever._search_many = search_while_store_changes
+        self.retriever.retrieve("limitation of liability", k=2)
+        self.assertIsNone(self.retriever.result_cache.get(("limitation of liability", 2)))
+
+class StubLLM:
+    """Local LLM stand-in that streams its canned answer word by word"""
+
+    def generate(self, prompt):
+        return "".join(self.stream(prompt))
+
+    def stream(self, prompt):
+        for word in ["Liability ", "is ", "capped."]:
+            yield word
+
+class TestRAGChain(unittest.TestCase):
+    def setUp(self):
+        encoder = StubEncoder()
+        store = VectorStore(embedding_dim=encoder.dim)
+        store.add_documents([{"text": c} for c in CLAUSES], encoder.encode(CLAUSES))
+        self.chain = RAGChain(Retriever(store, encoder=encoder), llm=StubLLM())
+
+    def test_stream_yields_context_before_tokens(self):
+        """Test that streaming emits context first, then tokens, then done"""
+        events = list(self.chain.stream("limitation of liability"))
+        self.assertEqual(events[0]["event"], "context")
+        self.assertEqual(events[0]["data"][0]["document"]["text"], "limitation of liability")
+        self.assertEqual([e["event"] for e in events[1:]], ["token", "token", "token", "done"])
+        tokens = "".join(e["data"] for e in events if e["event"] == "token")
+        self.assertEqual(tokens, self.chain.run("limitation of liability")["response"])
+
+    def test_format_prompt_includes_context(self):
+        """Test that the prompt carries the query and the retrieved clauses"""
+        docs = self.chain.retriever.retrieve("limitation of liability", k=2)
+        prompt = self.chain.format_prompt("What is the liability cap?", docs)
+        self.assertIn("[1] limitation of liability", prompt)
+        self.assertIn("Question: What is the liability cap?", prompt)
+
+class TestPromptPacker(unittest.TestCase):
+    BOILERPLATE = ("The Supplier shall indemnify and hold harmless the Customer against all losses "
+                   "arising from any breach of this Agreement by the Supplier or its personnel")
+
+    def test_drops_near_duplicates(self):
+        """Test that near-identical boilerplate is packed only once, best score first"""
+        packer = PromptPacker(max_tokens=1000)
+        packed, stats = packer.pack([
+            {"text": self.BOILERPLATE.replace("Customer", "Client"), "score": 0.5},
+            {"text": self.BOILERPLATE, "score": 0.9},
+            {"text": "Either party may terminate for convenience on thirty days notice", "score": 0.7},
+        ])
+        self.assertEqual([c["score"] for c in packed], [0.9, 0.7])
+        self.assertEqual(stats["duplicates"], 1)
+
+    def test_fills_budget_exactly(self):
+        """Test that the last chunk is truncated to use the remaining budget"""
+        packer = PromptPacker(max_tokens=30)
+        packed, stats = packer.pack([
+            {"text": self.BOILERPLATE, "score": 0.9},
+            {"text": "Either party may terminate for convenience on thirty days notice", "score": 0.7},
+        ])
+        self.assertEqual(sum(c["tokens"] for c in packed), 30)
+        self.assertEqual(packed[1]["text"], "Either party may terminate for")
+        self.assertEqual(stats["tokens"], 30)
+
+    def test_labels_count_against_budget(self):
+        """Test that the label before each packed chunk is charged to the budget"""
+        packer = PromptPacker(max_tokens=30)
+        chunks = [
+            {"text": self.BOILERPLATE, "score": 0.9},
+            {"text": "Either party may terminate for convenience on thirty days notice", "score": 0.7},
+        ]
+        packed, stats = packer.pack(chunks, label=context_label)
+        self.assertEqual(packed[1]["text"], "Either party may")
+        context = "".join(context_label(i) + c["text"] for i, c in enumerate(packed, 1))
+        self.assertEqual(count_tokens(context), 30)
+        self.assertEqual(stats["tokens"], 30)
+
+    def test_format_prompt_context_fits_budget(self):
+        """Test that the numbered context of a formatted prompt stays within the packer's budget"""
+        docs = [{"document": {"text": f"Clause {i} " + "term " * 20}, "score": 1.0 - i / 10} for i in range(5)]
+        chain = RAGChain(retriever=None, packer=PromptPacker(max_tokens=50, dedup_threshold=1.1))
+        prompt = chain.format_prompt("Which terms apply?", docs)
+        context = prompt.split("Context:\n", 1)[1].split("\n\nQuestion:", 1)[0]
+        self.assertEqual(count_tokens(context), 50)
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction_by_entries_and_bytes(self):
+        """Test that least recently used entries are evicted first"""
+        cache = LRUCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+
+        cache = LRUCache(max_entries=10, max_bytes=100)
+        cache.put("a", np.zeros(10, dtype=np.uint8), size=60)
+        cache.put("b", np.zeros(10, dtype=np.uint8), size=60)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.size_bytes, 60)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_ttl_expiry(self):
+        """Test that expired entries are treated as misses"""
+        cache = LRUCache(ttl_seconds=0)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.size_bytes, 0)
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache", "results.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_evicts_least_recently_accessed(self):
+        """Test that the disk tier stays under max_bytes, dropping stale entries first"""
+        cache = DiskCache(self.path, max_bytes=100)
+        cache.put("a", "x" * 40)
+        time.sleep(0.01)
+        cache.put("b", "y" * 40)
+        time.sleep(0.01)
+        cache.get("a")
+        cache.put("c", "z" * 40)
+        self.assertEqual(cache.get("a"), "x" * 40)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.evictions, 1)
+        self.assertLessEqual(cache.stats()["size_bytes"], 100)
+        cache.close()
+
+    def test_tiers_survive_restart(self):
+        """Test that disk hits after a restart are promoted to memory"""
+        cache = TieredCache(LRUCache(), DiskCache(self.path))
+        cache.put("doc", {"clauses": [{"text": "Payment", "type": "payment", "confidence": 0.9}]})
+        cache.close()
+
+        memory = LRUCache()
+        cache = TieredCache(memory, DiskCache(self.path))
+        self.assertEqual(cache.get("doc")["clauses"][0]["type"], "payment")
+        self.assertIn("doc", memory)
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
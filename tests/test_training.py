@@ -1,7 +1,10 @@
+import tempfile
 import unittest
 from pathlib import Path
+import numpy as np
+import pandas as pd
 import yaml
-from src.pipelines.training_pipeline import TrainingPipeline
+from src.pipelines.training_pipeline import TrainingPipeline, estimator_params
 
 class TestTraining(unittest.TestCase):
     def setUp(self):
@@ -34,5 +37,62 @@ class TestTraining(unittest.TestCase):
         self.assertGreater(score, 0)
         self.assertLessEqual(score, 1)
 
+class TestTrainingEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = {
+            'data': {'features_path': self.tmp.name},
+            'model': {
+                'name': 'model-v1',
+                'save_path': self.tmp.name,
+                'parameters': {'learning_rate': 0.001, 'batch_size': 32, 'epochs': 10, 'max_depth': 4},
+                'warm_start': True,
+                'incremental_estimators': 5,
+            },
+        }
+        rng = np.random.default_rng(0)
+        self.X = pd.DataFrame(rng.random((60, 3)), columns=['a', 'b', 'c'])
+        self.y = (self.X['a'] > 0.5).astype(int)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_estimator_params(self):
+        """Test that config parameters are filtered and mapped per estimator"""
+        params = estimator_params('random_forest', self.config['model']['parameters'])
+        self.assertEqual(params['max_depth'], 4)
+        self.assertEqual(params['n_jobs'], -1)
+        self.assertNotIn('learning_rate', params)
+        params = estimator_params('hist_gradient_boosting', self.config['model']['parameters'])
+        self.assertEqual(params['max_iter'], 10)
+        self.assertEqual(params['learning_rate'], 0.001)
+        with self.assertRaises(ValueError):
+            estimator_params('svm', {})
+
+    def test_warm_start_grows_saved_forest(self):
+        """Test that retraining adds trees to the saved forest"""
+        pipeline = TrainingPipeline(self.config)
+        model = pipeline.train_model(self.X, self.y)
+        self.assertEqual(len(model.estimators_), 100)
+        pipeline.save_model(model)
+
+        grown = pipeline.train_model(self.X, self.y)
+        self.assertEqual(len(grown.estimators_), 105)
+
+        # A target with new classes cannot extend the old forest
+        refit = pipeline.train_model(self.X, self.y + (self.X['b'] > 0.5))
+        self.assertEqual(len(refit.estimators_), 100)
+
+    def test_warm_start_refits_past_max_estimators(self):
+        """Test that a forest is refitted instead of grown past max_estimators"""
+        self.config['model']['max_estimators'] = 110
+        pipeline = TrainingPipeline(self.config)
+        sizes = []
+        for _ in range(4):
+            model = pipeline.train_model(self.X, self.y)
+            pipeline.save_model(model)
+            sizes.append(len(model.estimators_))
+        self.assertEqual(sizes, [100, 105, 110, 100])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,583 @@
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import numpy as np
+from src.rag.vector_store import VectorStore
+from src.rag.ann_index import IVFIndex
+from src.rag.bm25_index import BM25Index, tokenize
+from src.rag.quantization import ScalarQuantizer, ProductQuantizer
+from src.rag.retriever import Retriever
+from src.rag.sharded_store import ShardedVectorStore
+
+class TestVectorStore(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.dim = 16
+        self.embeddings = rng.standard_normal((50, self.dim)).astype(np.float32)
+        self.documents = [{"id": str(i), "text": f"clause {i}"} for i in range(50)]
+        self.store = VectorStore(embedding_dim=self.dim, initial_capacity=4)
+        self.store.add_documents(self.documents, self.embeddings)
+
+    def exact_top_k(self, query, k):
+        normed = self.embeddings / np.linalg.norm(self.embeddings, axis=1, keepdims=True)
+        scores = normed @ (query / np.linalg.norm(query))
+        return list(np.argsort(-scores)[:k])
+
+    def test_add_documents_grows_matrix(self):
+        """Test that embeddings are stored contiguously past the initial capacity"""
+        self.assertEqual(len(self.store), 50)
+        self.assertEqual(self.store.embeddings.shape, (50, self.dim))
+        self.assertEqual(self.store.embeddings.dtype, np.float32)
+        np.testing.assert_allclose(self.store.norms, np.linalg.norm(self.embeddings, axis=1), rtol=1e-5)
+
+    def test_add_documents_rejects_mismatch(self):
+        """Test that mismatched documents and embeddings are rejected"""
+        with self.assertRaises(ValueError):
+            self.store.add_documents(self.documents[:2], self.embeddings[:3])
+        with self.assertRaises(ValueError):
+            self.store.add_documents(self.documents[:1], np.zeros((1, self.dim + 1)))
+
+    def test_failed_add_leaves_ids_unclaimed(self):
+        """Test that ids of documents whose append failed can still be added, and are not deletable meanwhile"""
+        def failing_append(state, documents, matrix):
+            raise MemoryError("cannot grow the matrix")
+
+        self.store._append = failing_append
+        with self.assertRaises(MemoryError):
+            self.store.add_documents([{"id": "new", "text": "clause new"}], self.embeddings[:1])
+        del self.store._append
+        self.assertEqual(self.store.delete(["new"]), 0)
+        self.store.add_documents([{"id": "new", "text": "clause new"}], self.embeddings[:1])
+        self.assertEqual(len(self.store), 51)
+        self.assertEqual(self.store.delete(["new"]), 1)
+
+    def test_similarity_search_matches_exact(self):
+        """Test that top-k search returns the exact cosine neighbours in order"""
+        query = self.embeddings[7] + 0.01
+        results = self.store.similarity_search(query, k=5)
+        self.assertEqual(len(results), 5)
+        self.assertEqual([int(r["document"]["id"]) for r in results], self.exact_top_k(query, 5))
+        scores = [r["score"] for r in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_similarity_search_empty_store(self):
+        """Test that searching an empty store returns no results"""
+        store = VectorStore(embedding_dim=self.dim)
+        self.assertEqual(store.similarity_search(np.ones(self.dim)), [])
+
+    def test_ivf_index_full_probe_matches_exact(self):
+        """Test that probing every IVF cell reproduces exact search"""
+        self.store.build_index(IVFIndex(n_lists=8, nprobe=8))
+        query = self.embeddings[3]
+        approx = self.store.similarity_search(query, k=5)
+        exact = self.store.similarity_search(query, k=5, exact=True)
+        self.assertEqual([r["document"] for r in approx], [r["document"] for r in exact])
+
+    def test_ivf_index_tracks_new_documents(self):
+        """Test that documents added after build_index are searchable"""
+        self.store.build_index(IVFIndex(n_lists=4, nprobe=1))
+        extra = np.full((1, self.dim), 3.0, dtype=np.float32)
+        self.store.add_documents([{"id": "new", "text": "new clause"}], extra)
+        self.assertEqual(len(self.store.index), 51)
+        results = self.store.similarity_search(extra[0], k=1)
+        self.assertEqual(results[0]["document"]["id"], "new")
+
+    def test_ivf_index_merges_buffered_adds(self):
+        """Test that rows added one by one are buffered and merged into the same lists as one bulk add"""
+        bulk, incremental = IVFIndex(n_lists=4), IVFIndex(n_lists=4)
+        bulk.train(self.embeddings)
+        incremental.train(self.embeddings)
+        bulk.add(self.embeddings, 0)
+        for i, row in enumerate(self.embeddings):
+            incremental.add(row[None], i)
+        self.assertEqual(len(incremental._pending_ids), len(self.embeddings))
+        self.assertEqual(len(incremental), len(self.embeddings))
+
+        query = self.embeddings[0]
+        np.testing.assert_array_equal(incremental.candidates(query, nprobe=4), bulk.candidates(query, nprobe=4))
+        self.assertEqual(incremental._pending_ids, [])
+
+    def test_save_and_load_round_trip(self):
+        """Test that a saved store reopens memory-mapped with identical results"""
+        with tempfile.TemporaryDirectory() as tmp:
+            self.store.save(tmp)
+            loaded = VectorStore.load(tmp)
+            self.assertIsInstance(loaded.embeddings, np.memmap)
+            self.assertEqual(len(loaded), 50)
+            self.assertEqual(loaded.documents[10], self.documents[10])
+            query = self.embeddings[5]
+            self.assertEqual(loaded.similarity_search(query, k=3), self.store.similarity_search(query, k=3))
+
+            # Adding to a loaded store copies it to a private file, leaving the saved ones intact
+            loaded.add_documents([{"id": "new", "text": "new clause"}], np.ones((1, self.dim)))
+            self.assertEqual(len(loaded), 51)
+            self.assertEqual(loaded.documents[50]["id"], "new")
+            self.assertEqual(len(VectorStore.load(tmp)), 50)
+
+    def test_loaded_matrix_stays_memory_mapped_after_writes(self):
+        """Test that writes and compaction grow a loaded store's embeddings on disk instead of in memory"""
+        with tempfile.TemporaryDirectory() as tmp:
+            self.store.save(tmp)
+            loaded = VectorStore.load(tmp)
+            loaded.compaction_threshold = None
+            loaded.upsert([{"id": "5", "text": "amended"}], np.ones((1, self.dim)))
+            self.assertIsInstance(loaded.embeddings, np.memmap)
+            loaded.add_documents([{"id": f"new{i}"} for i in range(100)], self.embeddings.repeat(2, axis=0))
+            loaded.delete([str(i) for i in range(10, 20)])
+            self.assertIsInstance(loaded.embeddings, np.memmap)
+            loaded.compact()
+            self.assertIsInstance(loaded.embeddings, np.memmap)
+            self.assertEqual(len(loaded), 140)
+            np.testing.assert_array_equal(loaded.embeddings[-100:], self.embeddings.repeat(2, axis=0))
+            self.assertEqual(loaded.similarity_search(np.ones(self.dim), k=1)[0]["document"]["id"], "5")
+            self.assertEqual(len(VectorStore.load(tmp)), 50)
+
+class TestUpsertAndDelete(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self.dim = 16
+        self.embeddings = rng.standard_normal((50, self.dim)).astype(np.float32)
+        self.documents = [{"id": i, "text": f"clause {i}"} for i in range(50)]
+        self.store = VectorStore(embedding_dim=self.dim, lexical_index=BM25Index(), compaction_threshold=None)
+        self.store.add_documents(self.documents, self.embeddings)
+
+    def ids(self, results):
+        return [r["document"]["id"] for r in results]
+
+    def test_delete_masks_every_search_path(self):
+        """Test that deleted documents are skipped by exact, batch, IVF and lexical search"""
+        self.assertEqual(self.store.delete([7, 8, 999]), 2)
+        self.assertEqual(len(self.store), 48)
+        query = self.embeddings[7]
+        self.assertNotIn(7, self.ids(self.store.similarity_search(query, k=5)))
+        self.assertNotIn(7, self.ids(self.store.similarity_search_batch(query, k=5)[0]))
+        self.assertEqual(self.store.lexical_search("7", k=5), [])
+        self.assertEqual(len(self.store.similarity_search(query, k=100)), 48)
+
+        self.store.build_index(IVFIndex(n_lists=4, nprobe=4))
+        self.assertNotIn(7, self.ids(self.store.similarity_search(query, k=5)))
+
+    def test_upsert_replaces_document(self):
+        """Test that an upsert hides the old version and serves the new one"""
+        amended = np.full((1, self.dim), 2.0, dtype=np.float32)
+        self.store.upsert([{"id": 3, "text": "amended clause"}], amended)
+        self.assertEqual(len(self.store), 50)
+        results = self.store.similarity_search(amended[0], k=2)
+        self.assertEqual(results[0]["document"]["text"], "amended clause")
+        self.assertNotIn("clause 3", [r["document"]["text"] for r in results])
+        self.assertEqual(self.ids(self.store.lexical_search("amended", k=1)), [3])
+
+        with self.assertRaises(ValueError):
+            self.store.add_documents([{"id": 3}], amended)
+        with self.assertRaises(ValueError):
+            self.store.upsert([{"text": "no id"}], amended)
+
+    def test_compact_preserves_results(self):
+        """Test that compaction drops deleted rows without changing search results"""
+        self.store.build_index(IVFIndex(n_lists=4, nprobe=4))
+        self.store.delete(range(0, 50, 3))
+        query = self.embeddings[10]
+        before = self.store.similarity_search(query, k=5)
+        lexical_before = self.ids(self.store.lexical_search("clause 10", k=1))
+
+        self.assertEqual(self.store.compact(), 17)
+        self.assertEqual(self.store.embeddings.shape, (33, self.dim))
+        self.assertEqual(self.store.deleted_fraction, 0.0)
+        self.assertEqual(self.store.similarity_search(query, k=5), before)
+        self.assertEqual(self.ids(self.store.lexical_search("clause 10", k=1)), lexical_before)
+        self.assertEqual(len(self.store.index), 33)
+
+        # Ids still resolve to their renumbered rows
+        self.assertEqual(self.store.delete([10]), 1)
+        self.assertNotIn(10, self.ids(self.store.similarity_search(query, k=5)))
+
+    def test_background_compaction(self):
+        """Test that passing the deleted fraction threshold compacts in the background"""
+        self.store.compaction_threshold = 0.2
+        self.store.delete(range(5))
+        self.assertEqual(self.store.embeddings.shape[0], 50)
+        self.store.delete(range(5, 10))
+        self.assertTrue(self.store.wait_for_compaction(timeout=10))
+        self.assertEqual(self.store.embeddings.shape[0], 40)
+        self.assertEqual(len(self.store), 40)
+
+    def test_concurrent_writes_during_compaction(self):
+        """Test that searches and writes racing background compactions stay consistent"""
+        self.store.compaction_threshold = 0.1
+        rng = np.random.default_rng(3)
+        expected = {doc["id"]: doc["text"] for doc in self.documents}
+        errors = []
+
+        def search():
+            try:
+                for _ in range(200):
+                    for result in self.store.similarity_search(rng.standard_normal(self.dim), k=10):
+                        self.assertIsNotNone(result["document"])
+            except Exception as e:
+                errors.append(e)
+
+        reader = threading.Thread(target=search)
+        reader.start()
+        for step in range(300):
+            doc_id = int(rng.integers(80))
+            if step % 3 == 0:
+                self.store.delete([doc_id])
+                expected.pop(doc_id, None)
+            else:
+                text = f"clause {doc_id} v{step}"
+                self.store.upsert([{"id": doc_id, "text": text}], rng.standard_normal((1, self.dim)))
+                expected[doc_id] = text
+        reader.join()
+        self.store.wait_for_compaction(timeout=10)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.store), len(expected))
+        found = self.store.similarity_search(np.ones(self.dim), k=1000)
+        self.assertEqual({r["document"]["id"]: r["document"]["text"] for r in found}, expected)
+        self.store.compact()
+        found = self.store.similarity_search(np.ones(self.dim), k=1000)
+        self.assertEqual({r["document"]["id"]: r["document"]["text"] for r in found}, expected)
+
+    def test_save_skips_deleted_and_load_supports_delete(self):
+        """Test that saves drop tombstoned rows and loaded stores accept id-keyed writes"""
+        self.store.delete([0, 1])
+        with tempfile.TemporaryDirectory() as tmp:
+            self.store.save(tmp)
+            loaded = VectorStore.load(tmp)
+            self.assertEqual(len(loaded), 48)
+            self.assertEqual(loaded.documents[0]["id"], 2)
+            self.assertEqual(loaded.delete([2, 3]), 2)
+            loaded.upsert([{"id": 4, "text": "amended"}], np.ones((1, self.dim)))
+            self.assertEqual(len(loaded), 46)
+            self.assertEqual(loaded.compact(), 3)
+            self.assertEqual(loaded.documents[0]["id"], 5)
+            self.assertEqual(loaded.documents[-1]["text"], "amended")
+
+class TestQuantization(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        self.dim = 32
+        centers = rng.standard_normal((20, self.dim)).astype(np.float32)
+        self.embeddings = centers[rng.integers(0, 20, 2000)] + 0.3 * rng.standard_normal((2000, self.dim)).astype(np.float32)
+        self.queries = self.embeddings[rng.choice(2000, 20)] + 0.1 * rng.standard_normal((20, self.dim)).astype(np.float32)
+        self.store = VectorStore(embedding_dim=self.dim)
+        self.store.add_documents([{"id": i} for i in range(2000)], self.embeddings)
+
+    def recall(self, k=10):
+        found = 0
+        for query in self.queries:
+            exact = {r["document"]["id"] for r in self.store.similarity_search(query, k=k, exact=True)}
+            found += len(exact & {r["document"]["id"] for r in self.store.similarity_search(query, k=k)})
+        return found / (k * len(self.queries))
+
+    def test_int8_codes(self):
+        """Test that int8 codes are 4x smaller and keep top-k recall with re-ranking"""
+        self.store.quantize(ScalarQuantizer())
+        self.assertEqual(self.store.codes.nbytes * 4, self.store.embeddings.nbytes)
+        decoded = self.store.quantizer.decode(self.store.codes[:5])
+        np.testing.assert_allclose(decoded, self.embeddings[:5], atol=0.05)
+        self.assertGreaterEqual(self.recall(), 0.95)
+
+    def test_product_quantization(self):
+        """Test that PQ codes are 16x smaller and re-ranking restores recall"""
+        self.store.quantize(ProductQuantizer(n_subvectors=8))
+        self.assertEqual(self.store.codes.nbytes * 16, self.store.embeddings.nbytes)
+        self.store.rerank_factor = 1
+        raw = self.recall()
+        self.store.rerank_factor = 10
+        reranked = self.recall()
+        self.assertGreaterEqual(reranked, 0.9)
+        self.assertGreaterEqual(reranked, raw)
+
+        # Scores come from the full-precision embeddings
+        query = self.queries[0]
+        self.assertEqual(
+            self.store.similarity_search(query, k=1)[0]["score"],
+            self.store.similarity_search(query, k=1, exact=True)[0]["score"],
+        )
+
+    def test_quantized_matrix_stays_on_disk(self):
+        """Test that quantizing moves the embeddings to disk and writes and compaction keep them there"""
+        self.store.quantize(ScalarQuantizer())
+        self.assertIsInstance(self.store.embeddings, np.memmap)
+        self.store.add_documents([{"id": i} for i in range(2000, 4000)], self.embeddings)
+        self.store.upsert([{"id": 5}], self.queries[:1])
+        self.store.delete(range(100, 1100))
+        self.store.compact()
+        self.assertIsInstance(self.store.embeddings, np.memmap)
+        self.assertNotIsInstance(self.store.codes, np.memmap)
+        self.assertEqual(len(self.store.embeddings), 3000)
+        np.testing.assert_array_equal(self.store.embeddings[-1], self.queries[0])
+        np.testing.assert_array_equal(self.store.codes, self.store.quantizer.encode(self.store.embeddings))
+        self.assertEqual(self.store.similarity_search(self.queries[0], k=1)[0]["document"]["id"], 5)
+
+    def test_rerank_factor_defaults_per_quantizer(self):
+        """Test that an unset rerank_factor follows the quantizer, with enough PQ candidates for recall"""
+        self.store.quantize(ProductQuantizer(n_subvectors=8))
+        self.assertIsNone(self.store.rerank_factor)
+        self.assertGreater(ProductQuantizer.rerank_factor, ScalarQuantizer.rerank_factor)
+        self.assertGreaterEqual(self.recall(), 0.95)
+
+    def test_writes_keep_codes_in_sync(self):
+        """Test that added, upserted and compacted rows are encoded"""
+        self.store.quantize(ScalarQuantizer())
+        self.store.build_index(IVFIndex(n_lists=8, nprobe=8))
+        self.store.upsert([{"id": 5, "text": "amended"}], self.queries[:1])
+        self.store.delete(range(100, 600))
+        self.store.wait_for_compaction(timeout=10)
+        self.assertEqual(len(self.store.codes), len(self.store))
+        self.assertEqual(self.store.similarity_search(self.queries[0], k=1)[0]["document"]["id"], 5)
+        np.testing.assert_array_equal(self.store.codes, self.store.quantizer.encode(self.store.embeddings))
+
+    def test_save_and_load_quantized(self):
+        """Test that a loaded quantized store searches its saved codes"""
+        self.store.quantize(ProductQuantizer(n_subvectors=8))
+        with tempfile.TemporaryDirectory() as tmp:
+            self.store.save(tmp)
+            loaded = VectorStore.load(tmp)
+            self.assertIsInstance(loaded.codes, np.memmap)
+            np.testing.assert_array_equal(loaded.quantizer.codebooks, self.store.quantizer.codebooks)
+            for query in self.queries[:5]:
+                self.assertEqual(loaded.similarity_search(query, k=5), self.store.similarity_search(query, k=5))
+
+class TestShardedVectorStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(5)
+        cls.dim = 16
+        cls.embeddings = rng.standard_normal((300, cls.dim)).astype(np.float32)
+        cls.documents = [{"id": i, "text": f"clause {i}"} for i in range(300)]
+        cls.reference = VectorStore(embedding_dim=cls.dim)
+        cls.reference.add_documents(cls.documents, cls.embeddings)
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.store = ShardedVectorStore.create(cls.tmp.name, cls.documents, cls.embeddings, n_shards=3)
+        cls.store.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.store.close()
+        cls.tmp.cleanup()
+
+    def test_merged_results_match_single_store(self):
+        """Test that the merged shard results equal a search over one store"""
+        self.assertEqual(len(self.store.shard_paths), 3)
+        self.assertEqual(len(self.store), 300)
+        for query in self.embeddings[:5] + 0.01:
+            sharded = self.store.similarity_search(query, k=7)
+            single = self.reference.similarity_search(query, k=7)
+            self.assertEqual([r["document"] for r in sharded], [r["document"] for r in single])
+            np.testing.assert_allclose([r["score"] for r in sharded], [r["score"] for r in single], rtol=1e-5)
+
+    def test_batch_and_concurrent_searches(self):
+        """Test that batched and concurrent searches return per-query results"""
+        queries = self.embeddings[10:18]
+        expected = [[r["document"]["id"] for r in results] for results in self.reference.similarity_search_batch(queries, k=3)]
+        batched = self.store.similarity_search_batch(queries, k=3)
+        self.assertEqual([[r["document"]["id"] for r in results] for results in batched], expected)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            concurrent = list(pool.map(lambda q: self.store.similarity_search(q, k=3), queries))
+        self.assertEqual([[r["document"]["id"] for r in results] for results in concurrent], expected)
+
+    def test_worker_errors_are_raised(self):
+        """Test that a failing shard search raises in the caller and leaves the workers usable"""
+        with self.assertRaises(RuntimeError):
+            self.store.similarity_search(np.ones(self.dim + 1))
+        self.assertEqual(len(self.store.similarity_search(self.embeddings[0], k=2)), 2)
+
+    def test_dead_worker_is_restarted(self):
+        """Test that a killed shard worker is restarted on the next search"""
+        expected = self.store.similarity_search(self.embeddings[5], k=4)
+        process = self.store._shards[1].process
+        process.kill()
+        process.join()
+        self.assertEqual(self.store.similarity_search(self.embeddings[5], k=4), expected)
+        self.assertNotEqual(self.store._shards[1].process.pid, process.pid)
+        self.assertEqual(len(self.store), 300)
+
+    def test_worker_exit_mid_request_raises_runtime_error(self):
+        """Test that a worker exiting before it replies raises RuntimeError, not a pipe error"""
+        # A shard worker exits on "close" without replying
+        with self.assertRaises(RuntimeError):
+            self.store._fan_out("close")
+        self.assertFalse(any(shard.lock.locked() for shard in self.store._shards))
+        self.assertEqual(len(self.store.similarity_search(self.embeddings[0], k=2)), 2)
+
+    def test_interrupted_collection_releases_locks(self):
+        """Test that any exception while collecting replies releases every shard lock"""
+        receive = self.store._receive
+
+        def interrupted(shard):
+            raise KeyboardInterrupt
+
+        self.store._receive = interrupted
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                self.store.similarity_search(self.embeddings[0], k=2)
+        finally:
+            self.store._receive = receive
+        self.assertFalse(any(shard.lock.locked() for shard in self.store._shards))
+        # Shards whose replies went unread are restarted rather than answering the wrong caller
+        expected = self.reference.similarity_search(self.embeddings[3], k=3)
+        results = self.store.similarity_search(self.embeddings[3], k=3)
+        self.assertEqual([r["document"] for r in results], [r["document"] for r in expected])
+
+    def test_concurrent_searches_overlap(self):
+        """Test that a shard is released once it has replied, so a second search starts before the first ends"""
+        receive = self.store._receive
+        last = self.store._shards[-1]
+        waiting, proceed = threading.Event(), threading.Event()
+
+        def slow_last_reply(shard):
+            if shard is last and threading.current_thread().name == "first":
+                waiting.set()
+                proceed.wait(timeout=10)
+            return receive(shard)
+
+        results = {}
+
+        def search(name, row):
+            results[name] = self.store.similarity_search(self.embeddings[row], k=3)
+
+        self.store._receive = slow_last_reply
+        first = threading.Thread(target=search, args=("first", 1), name="first")
+        second = threading.Thread(target=search, args=("second", 2), name="second")
+        try:
+            first.start()
+            self.assertTrue(waiting.wait(timeout=10))
+            # The first search still waits on the last shard but has released the others
+            self.assertFalse(self.store._shards[0].lock.locked())
+            second.start()
+            deadline = time.monotonic() + 10
+            while not self.store._shards[0].lock.locked() and time.monotonic() < deadline:
+                time.sleep(0.001)
+            self.assertTrue(self.store._shards[0].lock.locked())
+            self.assertTrue(first.is_alive())
+        finally:
+            proceed.set()
+            first.join()
+            second.join()
+            self.store._receive = receive
+        for name, row in (("first", 1), ("second", 2)):
+            expected = self.reference.similarity_search(self.embeddings[row], k=3)
+            self.assertEqual([r["document"] for r in results[name]], [r["document"] for r in expected])
+
+    def test_backs_a_retriever(self):
+        """Test that a retriever can search the sharded store"""
+        encoder = SimpleNamespace(encode=lambda texts: self.embeddings[[42] * len(texts)])
+        results = Retriever(self.store, encoder=encoder).retrieve("indemnity", k=1)
+        self.assertEqual(results[0]["document"]["id"], 42)
+
+class TestBM25Index(unittest.TestCase):
+    def setUp(self):
+        self.texts = [
+            "The Supplier shall indemnify the Customer.",
+            "Either party may terminate under Section 12.3.",
+            "Payment is due within 30 days of invoice.",
+            "The Customer shall indemnify and hold harmless the Supplier's affiliates.",
+        ]
+        self.index = BM25Index()
+        self.index.add(self.texts[:2], 0)
+        self.index.add(self.texts[2:], 2)
+
+    def test_tokenize_keeps_section_numbers(self):
+        """Test that section numbers and hyphenated terms stay single tokens"""
+        self.assertEqual(tokenize("See Section 12.3(b), non-compete"), ["see", "section", "12.3", "b", "non-compete"])
+
+    def test_scores_match_reference(self):
+        """Test postings-based scores against a direct BM25 computation"""
+        ids, scores = self.index.scores("indemnify the supplier")
+        self.assertEqual(list(ids), [0, 3])
+
+        docs = [tokenize(t) for t in self.texts]
+        avg = sum(map(len, docs)) / len(docs)
+        expected = []
+        for doc in (docs[0], docs[3]):
+            total = 0.0
+            for term in ("indemnify", "the", "supplier"):
+                df = sum(term in d for d in docs)
+                tf = doc.count(term)
+                idf = np.log1p((len(docs) - df + 0.5) / (df + 0.5))
+                total += idf * tf * 2.5 / (tf + 1.5 * (0.25 + 0.75 * len(doc) / avg))
+            expected.append(total)
+        np.testing.assert_allclose(scores, expected, rtol=1e-5)
+
+    def test_add_requires_contiguous_rows(self):
+        """Test that documents must be indexed in store row order"""
+        with self.assertRaises(ValueError):
+            self.index.add(["late clause"], 10)
+
+    def test_concurrent_add_and_score(self):
+        """Test that scoring while documents are added always reads postings from one merge"""
+        index = BM25Index()
+        index.add([f"supplier clause {i} with new term{i} and shared words here" for i in range(2000)], 0)
+        errors = []
+        done = threading.Event()
+
+        def score():
+            while not done.is_set():
+                try:
+                    ids, scores = index.scores("supplier clause")
+                    self.assertEqual(len(ids), len(scores))
+                except Exception as e:
+                    errors.append(e)
+
+        # Two readers, so one reads while the other merges the latest adds
+        readers = [threading.Thread(target=score) for _ in range(2)]
+        for reader in readers:
+            reader.start()
+        try:
+            for i in range(2000, 3000):
+                index.add([f"supplier clause {i}"], i)
+                time.sleep(0.001)
+        finally:
+            done.set()
+            for reader in readers:
+                reader.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(index.scores("supplier")[0]), 3000)
+
+class TestHybridSearch(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.dim = 8
+        self.documents = [{"id": i, "text": f"boilerplate clause number {i}"} for i in range(40)]
+        self.documents[17]["text"] = "The Supplier shall indemnify the Customer"
+        self.embeddings = rng.standard_normal((40, self.dim)).astype(np.float32)
+        self.store = VectorStore(embedding_dim=self.dim, lexical_index=BM25Index())
+        self.store.add_documents(self.documents, self.embeddings)
+
+    def test_lexical_search(self):
+        """Test that an exact term finds its document"""
+        results = self.store.lexical_search("indemnify", k=3)
+        self.assertEqual([r["document"]["id"] for r in results], [17])
+
+    def test_fusion_ranks_documents_strong_in_both(self):
+        """Test that a document ranked high lexically and by vector comes first"""
+        query = self.embeddings[17] + 0.01
+        results = self.store.hybrid_search("indemnify", query, k=5)
+        self.assertEqual(results[0]["document"]["id"], 17)
+        self.assertEqual(len(results), 5)
+        scores = [r["score"] for r in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_prefilter_limits_vector_scoring(self):
+        """Test that with enough lexical matches only they are vector-scored"""
+        query = self.embeddings[3]
+        results = self.store.hybrid_search("clause number", query, k=3, candidates=5)
+        vector_only = {r["document"]["id"] for r in self.store.similarity_search(query, k=5, exact=True)}
+        self.assertTrue(all(r["document"]["id"] != 17 for r in results))
+        self.assertTrue(vector_only & {r["document"]["id"] for r in results})
+
+    def test_lexical_index_built_after_load(self):
+        """Test that a loaded store can be given a lexical index"""
+        with tempfile.TemporaryDirectory() as tmp:
+            self.store.save(tmp)
+            loaded = VectorStore.load(tmp, lexical_index=BM25Index())
+            self.assertEqual(loaded.lexical_search("indemnify", k=1)[0]["document"]["id"], 17)
+
+if __name__ == '__main__':
+    unittest.main()